@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""Capture latency of MIT-SHM, plain X protocol and scrot on Xvfb.
+
+Usage: python3 benchmarks/bench_capture.py [--resolutions 1920x1080,...]
+       [--region 800x600] [--repeat N] [--json results.json]
+
+For each resolution a private Xvfb is started and the full screen and a
+centred region are grabbed by each method:
+
+  xshm        snipaster.xshm, raw RGB pixels in this process
+  xshm+png    the same plus the PNG encode the clipboard path does
+  xlib        python-xlib GetImage over the X socket (if installed)
+  scrot       scrot writing a PNG file, as the wrapper script runs it
+
+Needs Xvfb; scrot and python-xlib are measured when present.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from headless import HeadlessError, xvfb  # noqa: E402
+
+from snipaster import png  # noqa: E402
+from snipaster.xshm import ShmGrabber, XShmError  # noqa: E402
+
+try:
+    from Xlib import X, display
+except ImportError:
+    X = None
+
+DEFAULT_RESOLUTIONS = "1280x720,1920x1080,2560x1440,3840x2160"
+
+
+def parse_size(text):
+    width, height = text.split("x")
+    return int(width), int(height)
+
+
+def timed(function, repeat):
+    """Median and minimum milliseconds of repeat calls to function."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(times), 2), round(min(times), 2)
+
+
+def methods(display_name, scratch):
+    """Return {name: grab(x, y, width, height)} for the available methods."""
+    grabber = ShmGrabber(display_name)
+
+    def xshm_png(*region):
+        raw = grabber.grab(*region)
+        png.encode(raw.width, raw.height, raw.channels, raw.pixels, level=1)
+
+    found = {"xshm": lambda *region: grabber.grab(*region), "xshm+png": xshm_png}
+    if X is not None:
+        conn = display.Display(display_name)
+        root = conn.screen().root
+
+        def xlib(x, y, width, height):
+            root.get_image(x, y, width, height, X.ZPixmap, 0xFFFFFFFF)
+
+        found["xlib"] = xlib
+    scrot = shutil.which("scrot")
+    if scrot is not None:
+        env = dict(os.environ, DISPLAY=display_name)
+        out = os.path.join(scratch, "shot.png")
+
+        def run_scrot(x, y, width, height):
+            subprocess.run(
+                [scrot, "-o", "-a", f"{x},{y},{width},{height}", out],
+                env=env,
+                check=True,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+
+        found["scrot"] = run_scrot
+    return grabber, found
+
+
+def measure(resolution, region, repeat):
+    """Results for every method at one resolution."""
+    width, height = parse_size(resolution)
+    region_width, region_height = min(region[0], width), min(region[1], height)
+    areas = {
+        "full": (0, 0, width, height),
+        "region": (
+            (width - region_width) // 2,
+            (height - region_height) // 2,
+            region_width,
+            region_height,
+        ),
+    }
+    results = []
+    with xvfb(resolution) as display_name, tempfile.TemporaryDirectory() as scratch:
+        grabber, found = methods(display_name, scratch)
+        try:
+            for name, grab in found.items():
+                for area, rect in areas.items():
+                    median, fastest = timed(lambda: grab(*rect), repeat)
+                    results.append(
+                        {
+                            "resolution": resolution,
+                            "area": area,
+                            "size": f"{rect[2]}x{rect[3]}",
+                            "method": name,
+                            "median_ms": median,
+                            "min_ms": fastest,
+                        }
+                    )
+        finally:
+            grabber.close()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--resolutions", default=DEFAULT_RESOLUTIONS)
+    parser.add_argument("--region", type=parse_size, default="800x600")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args(argv)
+
+    results = []
+    try:
+        for resolution in args.resolutions.split(","):
+            results += measure(resolution, args.region, args.repeat)
+    except (HeadlessError, XShmError) as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    print(f"{'resolution':<12}{'area':<8}{'size':<11}{'method':<10}{'median ms':>10}")
+    for result in results:
+        print(
+            f"{result['resolution']:<12}{result['area']:<8}{result['size']:<11}"
+            f"{result['method']:<10}{result['median_ms']:>10.2f}"
+        )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""End-to-end latency and throughput of snipaster_shot on headless sessions.
+
+Usage: python3 benchmarks/bench_e2e.py [--resolutions 1280x720,...]
+       [--sessions x11,wayland] [--paths script,daemon] [--region 800x600]
+       [--repeat N] [--json results.json] [--baseline old.json]
+
+For each session and resolution a private display server is started: Xvfb
+for X11 and, when sway is installed, sway on the wlroots headless backend
+for Wayland. In a scratch home directory the installer's wrapper script and
+backend manifest are generated for every capture tool and clipboard tool the
+session can use, plus no clipboard as a baseline. snipaster_shot is then run
+repeatedly with SNIPASTER_FAKE_REGION standing in for the interactive
+selection. On the "daemon" path snipaster-daemon runs in the scratch session
+and the script hands each capture to it over the socket; on X11 with
+python-xlib the daemon's own clipboard owner is measured as well.
+
+Reported per combination: median/p95/p99 wall time of the script (what the
+user waits for after F1), captures per second, and the per-stage timings
+the captures wrote to their trace log (see snipaster.trace). --json keeps
+the results, and --baseline compares medians with an earlier run.
+Notifications are left out, as there is no notification daemon.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from headless import HeadlessError, sway, xvfb  # noqa: E402
+
+from snipaster.backend import detect_backend, write_manifest  # noqa: E402
+from snipaster.daemon import daemon_running, stop_daemon  # noqa: E402
+from snipaster.fsutil import atomic_write  # noqa: E402
+from snipaster.trace import percentile, read_traces, summarise  # noqa: E402
+from snipaster.wrapper import wrapper_script  # noqa: E402
+
+DEFAULT_RESOLUTIONS = "1280x720,1920x1080,3840x2160"
+# Capture and clipboard tools each session type is benchmarked with
+SESSIONS = {
+    "x11": (("scrot",), ("xclip",)),
+    "wayland": (("grim",), ("wl-copy",)),
+}
+PATHS = ("script", "daemon")
+# Clipboard label for the daemon serving the X11 clipboard itself
+OWNER = "snipaster-daemon"
+# How long to wait for the daemon to listen and for background trace writes
+TIMEOUT = 10.0
+
+
+def parse_size(text):
+    width, height = text.split("x")
+    return int(width), int(height)
+
+
+def centred_region(resolution, region):
+    """SNIPASTER_FAKE_REGION value for region centred on the screen."""
+    width, height = parse_size(resolution)
+    w, h = parse_size(region)
+    w, h = min(w, width), min(h, height)
+    return f"{(width - w) // 2},{(height - h) // 2},{w},{h}"
+
+
+def scratch_env(home, runtime_dir, session, display_value):
+    """Environment of a fresh session of the given type rooted at home."""
+    env = dict(os.environ)
+    for name in ("DISPLAY", "WAYLAND_DISPLAY"):
+        env.pop(name, None)
+    env.update(
+        HOME=home,
+        XDG_SESSION_TYPE=session,
+        XDG_CONFIG_HOME=os.path.join(home, ".config"),
+        XDG_DATA_HOME=os.path.join(home, ".local", "share"),
+        XDG_STATE_HOME=os.path.join(home, ".local", "state"),
+        XDG_RUNTIME_DIR=runtime_dir,
+        PYTHONPATH=ROOT,
+    )
+    env["DISPLAY" if session == "x11" else "WAYLAND_DISPLAY"] = display_value
+    return env
+
+
+def combinations(session, paths, env):
+    """Yield (path, capture, clipboard) for the tools installed here."""
+    backend = detect_backend(env)
+    captures, clipboards = SESSIONS[session]
+    captures = [tool for tool in captures if tool in backend["tools"]]
+    clipboards = [tool for tool in clipboards if tool in backend["tools"]]
+    for path in paths:
+        owners = clipboards + [None]
+        if path == "daemon" and session == "x11" and importlib.util.find_spec("Xlib"):
+            owners.append(OWNER)
+        for capture in captures:
+            for clipboard in owners:
+                yield path, capture, clipboard
+
+
+def start_daemon(env, own_clipboard):
+    """Start snipaster-daemon in the scratch session; return the process."""
+    sock = os.path.join(env["XDG_RUNTIME_DIR"], "snipaster.sock")
+    args = [sys.executable, "-m", "snipaster.daemon", "--socket", sock]
+    if not own_clipboard:
+        args.append("--no-own-clipboard")
+    process = subprocess.Popen(
+        args, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + TIMEOUT
+    while not daemon_running(sock):
+        if process.poll() is not None or time.monotonic() > deadline:
+            process.kill()
+            raise RuntimeError("snipaster-daemon did not start")
+        time.sleep(0.01)
+    return process, sock
+
+
+def wait_for_traces(log, count):
+    """Return the traces in log once count of them are there (or on timeout)."""
+    deadline = time.monotonic() + TIMEOUT
+    traces = read_traces(log)
+    while len(traces) < count and time.monotonic() < deadline:
+        time.sleep(0.05)
+        traces = read_traces(log)
+    return traces
+
+
+def measure(session, runtime_dir, display_value, combination, region, repeat):
+    """Run snipaster_shot repeat times in a scratch home; return a result."""
+    path, capture, clipboard = combination
+    with tempfile.TemporaryDirectory(prefix="snipaster-bench-") as home:
+        env = scratch_env(home, runtime_dir, session, display_value)
+        env["SNIPASTER_FAKE_REGION"] = region
+        backend = detect_backend(env)
+        backend["tools"].pop("notify-send", None)
+        backend["capture"] = capture
+        backend["clipboard"] = None if clipboard == OWNER else clipboard
+        write_manifest(
+            backend, os.path.join(env["XDG_CONFIG_HOME"], "snipaster", "backend.json")
+        )
+        script = os.path.join(home, "snipaster_shot")
+        atomic_write(script, wrapper_script(), 0o755)
+
+        daemon = sock = None
+        if path == "daemon":
+            daemon, sock = start_daemon(env, clipboard == OWNER)
+        latencies = []
+        try:
+            began = time.perf_counter()
+            for _ in range(repeat):
+                start = time.perf_counter()
+                result = subprocess.run(
+                    [script],
+                    env=env,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                )
+                latencies.append((time.perf_counter() - start) * 1000)
+                if result.returncode != 0:
+                    raise RuntimeError(
+                        f"{path}/{capture}/{clipboard}: snipaster_shot exited "
+                        f"with {result.returncode}"
+                    )
+            elapsed = time.perf_counter() - began
+        finally:
+            if daemon is not None:
+                # The daemon writes its last traces while shutting down
+                stop_daemon(sock)
+                daemon.terminate()
+                daemon.wait()
+        log = os.path.join(env["XDG_STATE_HOME"], "snipaster", "trace.log")
+        traces = wait_for_traces(log, repeat)
+
+    latencies.sort()
+    stages = {
+        row["stage"]: {q: row[q] for q in ("p50_ms", "p95_ms", "p99_ms")}
+        for row in summarise(traces, by="via")
+    }
+    return {
+        "session": session,
+        "path": path,
+        "capture": capture,
+        "clipboard": clipboard or "none",
+        "runs": repeat,
+        "median_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "per_second": round(repeat / elapsed, 2),
+        "stages": stages,
+    }
+
+
+def server(session, runtime_dir, resolution):
+    """Context manager running the headless server for session."""
+    if session == "x11":
+        return xvfb(resolution)
+    return sway(runtime_dir, resolution)
+
+
+def run_session(session, resolution, paths, region, repeat):
+    results = []
+    with tempfile.TemporaryDirectory(prefix="snipaster-run-") as runtime_dir:
+        os.chmod(runtime_dir, 0o700)
+        with server(session, runtime_dir, resolution) as display_value:
+            probe = scratch_env(runtime_dir, runtime_dir, session, display_value)
+            for combination in combinations(session, paths, probe):
+                fake = centred_region(resolution, region)
+                result = measure(
+                    session, runtime_dir, display_value, combination, fake, repeat
+                )
+                result["resolution"] = resolution
+                results.append(result)
+    return results
+
+
+def key(result):
+    return tuple(
+        result[name]
+        for name in ("session", "resolution", "path", "capture", "clipboard")
+    )
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "-C", ROOT, "describe", "--always", "--dirty"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, baseline):
+    print(
+        f"{'session':<9}{'resolution':<11}{'path':<8}{'capture':<9}"
+        f"{'clipboard':<18}{'median ms':>10}{'p95 ms':>9}{'p99 ms':>9}{'/s':>7}"
+        + ("  vs baseline" if baseline else "")
+    )
+    for result in results:
+        line = (
+            f"{result['session']:<9}{result['resolution']:<11}{result['path']:<8}"
+            f"{result['capture']:<9}{result['clipboard']:<18}"
+            f"{result['median_ms']:>10.1f}{result['p95_ms']:>9.1f}"
+            f"{result['p99_ms']:>9.1f}{result['per_second']:>7.1f}"
+        )
+        before = baseline.get(key(result))
+        if before is not None:
+            ratio = result["median_ms"] / max(before["median_ms"], 0.01)
+            line += f"  {ratio:.2f}x"
+        print(line)
+        stages = " ".join(
+            f"{stage}={values['p50_ms']:.1f}"
+            for stage, values in result["stages"].items()
+        )
+        if stages:
+            print(f"    stage p50 ms: {stages}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--resolutions", default=DEFAULT_RESOLUTIONS)
+    parser.add_argument("--sessions", default=",".join(SESSIONS))
+    parser.add_argument("--paths", default=",".join(PATHS))
+    parser.add_argument("--region", default="800x600", help="selection size")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", help="also write results to this file")
+    parser.add_argument("--baseline", help="results file of an earlier run")
+    args = parser.parse_args(argv)
+
+    sessions = args.sessions.split(",")
+    paths = args.paths.split(",")
+    for session in sessions:
+        if session not in SESSIONS:
+            parser.error(f"unknown session {session!r}")
+    for path in paths:
+        if path not in PATHS:
+            parser.error(f"unknown path {path!r}")
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = {key(result): result for result in json.load(f)["results"]}
+
+    results = []
+    for session in sessions:
+        server_binary = "Xvfb" if session == "x11" else "sway"
+        if shutil.which(server_binary) is None:
+            print(f"{server_binary} not installed; skipping {session}", file=sys.stderr)
+            continue
+        for resolution in args.resolutions.split(","):
+            try:
+                results += run_session(
+                    session, resolution, paths, args.region, args.repeat
+                )
+            except HeadlessError as e:
+                print(f"{session} {resolution}: {e}", file=sys.stderr)
+    if not results:
+        print("nothing could be measured (needs Xvfb or sway)", file=sys.stderr)
+        return 2
+
+    print_results(results, baseline)
+    if args.json:
+        report = {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "region": args.region,
+            "results": results,
+        }
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
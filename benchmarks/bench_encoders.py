@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""Encode time and size of the Snipaster encoders on synthetic screenshots.
+
+Usage: python3 benchmarks/bench_encoders.py [--resolutions 1920x1080,...]
+       [--encoders png-fast,qoi] [--repeat N] [--json results.json]
+
+The synthetic frames mimic desktop content: flat window backgrounds, title
+bars, rows of text-like glyph noise and a gradient "photo" panel.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from snipaster import png  # noqa: E402
+from snipaster.encode import ENCODERS, ImageSource, RawImage  # noqa: E402
+
+DEFAULT_RESOLUTIONS = "1280x720,1920x1080,2560x1440,3840x2160"
+
+
+def synthetic_screenshot(width, height, seed=0):
+    """Return RGBA pixels of a desktop-like frame."""
+    rng = random.Random(seed)
+    background = bytes((236, 236, 236, 255)) * width
+    title_bar = bytes((48, 48, 56, 255)) * width
+
+    # A few dozen distinct "text" rows, reused down the page
+    text_rows = []
+    for _ in range(48):
+        row = bytearray(background)
+        x = 16
+        while x < width - 16:
+            word = rng.randint(3, 12) * 6
+            for px in range(x, min(x + word, width - 16)):
+                if rng.random() < 0.35:
+                    row[px * 4 : px * 4 + 3] = b"\x20\x20\x20"
+            x += word + 6
+        text_rows.append(bytes(row))
+
+    panel_left, panel_right = width * 3 // 5, width - 24
+    panel_top, panel_bottom = height // 5, height * 3 // 5
+    rows = []
+    for y in range(height):
+        if y < 32:
+            rows.append(title_bar)
+        elif panel_top <= y < panel_bottom:
+            text = text_rows[y % len(text_rows)] if y % 18 < 12 else background
+            row = bytearray(text)
+            shade = (y - panel_top) * 255 // max(1, panel_bottom - panel_top)
+            panel = bytearray()
+            for x in range(panel_left, panel_right):
+                noise = rng.randint(0, 7)
+                red = (x * 255 // width + noise) & 0xFF
+                blue = (255 - shade + noise) & 0xFF
+                panel += bytes((red, shade, blue, 255))
+            row[panel_left * 4 : panel_right * 4] = panel
+            rows.append(bytes(row))
+        elif y % 18 < 12:
+            rows.append(text_rows[(y // 18) % len(text_rows)])
+        else:
+            rows.append(background)
+    return b"".join(rows)
+
+
+def bench(encoder, make_source, repeat):
+    """Return (best seconds, output bytes) over repeat runs."""
+    best = None
+    size = 0
+    for _ in range(repeat):
+        source = make_source()
+        start = time.perf_counter()
+        size = len(encoder.encode(source))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, size
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--resolutions", default=DEFAULT_RESOLUTIONS)
+    parser.add_argument(
+        "--encoders", default=",".join(ENCODERS), help="comma-separated names"
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args(argv)
+
+    results = []
+    print(f"{'resolution':>10} {'encoder':>9} {'ms':>9} {'bytes':>11} {'of raw':>7}")
+    for resolution in args.resolutions.split(","):
+        width, height = (int(n) for n in resolution.lower().split("x"))
+        pixels = synthetic_screenshot(width, height)
+        # What a capture tool hands over: a PNG at zlib's default level
+        tool_png = png.encode(width, height, 4, pixels, level=6)
+
+        for name in args.encoders.split(","):
+            encoder = ENCODERS[name]
+            if not encoder.available():
+                print(f"{resolution:>10} {name:>9} {'unavailable':>9}")
+                continue
+            if name in ("png", "png-max"):
+                # These work on the encoded PNG without decoding it
+                def make_source():
+                    return ImageSource(tool_png)
+            else:
+                def make_source():
+                    return ImageSource(raw=RawImage(width, height, 4, pixels))
+
+            seconds, size = bench(encoder, make_source, args.repeat)
+            ratio = size / len(pixels)
+            print(
+                f"{resolution:>10} {name:>9} {seconds * 1000:9.1f} "
+                f"{size:11d} {ratio:7.1%}"
+            )
+            results.append(
+                {
+                    "resolution": resolution,
+                    "encoder": name,
+                    "seconds": seconds,
+                    "bytes": size,
+                    "raw_bytes": len(pixels),
+                }
+            )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
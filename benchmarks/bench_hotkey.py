@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""Keypress-to-selector latency: snipaster-daemon --hotkey vs xbindkeys.
+
+Usage: python3 benchmarks/bench_hotkey.py [--key F12] [--repeat N]
+       [--methods listener,xbindkeys] [--json results.json]
+
+Runs on a private Xvfb. Each method is started in a scratch home directory:
+"listener" is snipaster-daemon grabbing the key itself, "xbindkeys" is the
+generated snipaster_shot script bound through xbindkeys, which ends in
+scrot -s. The key is pressed through XTEST and the clock stops when the
+selector holds the pointer grab (our own grab attempts start failing with
+AlreadyGrabbed). Escape then cancels the selection. Needs python-xlib,
+Xvfb, scrot and, for the second method, xbindkeys.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from headless import HeadlessError, xvfb  # noqa: E402
+
+from snipaster import xbindkeys  # noqa: E402
+from snipaster.backend import detect_backend, write_manifest  # noqa: E402
+from snipaster.fsutil import atomic_write  # noqa: E402
+from snipaster.keybinding import xbindkeys_keys  # noqa: E402
+from snipaster.wrapper import wrapper_script  # noqa: E402
+
+try:
+    from Xlib import XK, X, display, error
+    from Xlib.ext import xtest
+except ImportError:
+    X = None
+
+METHODS = ("listener", "xbindkeys")
+# How long to wait for a method to grab the key or show its selector
+TIMEOUT = 10.0
+
+
+def scratch_env(home, display_name):
+    """Environment of a fresh X11 session rooted at home."""
+    env = dict(os.environ)
+    runtime_dir = os.path.join(home, "run")
+    os.makedirs(runtime_dir, mode=0o700, exist_ok=True)
+    env.update(
+        HOME=home,
+        DISPLAY=display_name,
+        XDG_SESSION_TYPE="x11",
+        XDG_CONFIG_HOME=os.path.join(home, ".config"),
+        XDG_DATA_HOME=os.path.join(home, ".local", "share"),
+        XDG_RUNTIME_DIR=runtime_dir,
+        PYTHONPATH=ROOT,
+    )
+    return env
+
+
+def start_listener(home, env, key):
+    """Start snipaster-daemon with the hotkey listener."""
+    return subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "snipaster.daemon",
+            "--socket",
+            os.path.join(env["XDG_RUNTIME_DIR"], "snipaster.sock"),
+            "--hotkey",
+            key,
+        ],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def start_xbindkeys(home, env, key):
+    """Start xbindkeys bound to a generated snipaster_shot."""
+    script = os.path.join(home, "snipaster_shot")
+    atomic_write(script, wrapper_script(), 0o755)
+    write_manifest(
+        detect_backend(env),
+        os.path.join(env["XDG_CONFIG_HOME"], "snipaster", "backend.json"),
+    )
+    config = os.path.join(home, ".xbindkeysrc")
+    with open(config, "w") as f:
+        f.write(xbindkeys.merge("", script, xbindkeys_keys(key)))
+    return subprocess.Popen(
+        ["xbindkeys", "-n", "-f", config],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def key_grabbed(conn, root, keycode):
+    """Whether another client holds a grab on keycode."""
+    catcher = error.CatchError(error.BadAccess)
+    root.grab_key(keycode, 0, False, X.GrabModeAsync, X.GrabModeAsync, catcher)
+    conn.sync()
+    if catcher.get_error():
+        return True
+    root.ungrab_key(keycode, 0)
+    conn.sync()
+    return False
+
+
+def pointer_grabbed(conn, root):
+    """Whether another client holds the pointer grab."""
+    status = root.grab_pointer(
+        False, 0, X.GrabModeAsync, X.GrabModeAsync, X.NONE, X.NONE, X.CurrentTime
+    )
+    if status == X.GrabSuccess:
+        conn.ungrab_pointer(X.CurrentTime)
+        conn.sync()
+        return False
+    return True
+
+
+def wait_for(predicate, timeout=TIMEOUT):
+    """Poll predicate until it holds; return False on timeout."""
+    deadline = time.perf_counter() + timeout
+    while not predicate():
+        if time.perf_counter() > deadline:
+            return False
+        time.sleep(0.0005)
+    return True
+
+
+def tap(conn, keycode):
+    xtest.fake_input(conn, X.KeyPress, keycode)
+    xtest.fake_input(conn, X.KeyRelease, keycode)
+    conn.sync()
+
+
+def measure(method, display_name, key, repeat):
+    """Return keypress-to-selector latencies in ms for one method."""
+    conn = display.Display(display_name)
+    root = conn.screen().root
+    keycode = conn.keysym_to_keycode(XK.string_to_keysym(key))
+    escape = conn.keysym_to_keycode(XK.string_to_keysym("Escape"))
+    with tempfile.TemporaryDirectory(prefix="snipaster-bench-") as home:
+        env = scratch_env(home, display_name)
+        start = start_listener if method == "listener" else start_xbindkeys
+        process = start(home, env, key)
+        latencies = []
+        try:
+            if not wait_for(lambda: key_grabbed(conn, root, keycode)):
+                raise RuntimeError(f"{method} never grabbed {key}")
+            for _ in range(repeat):
+                began = time.perf_counter()
+                tap(conn, keycode)
+                if not wait_for(lambda: pointer_grabbed(conn, root)):
+                    raise RuntimeError(f"{method}: no selector after {key}")
+                latencies.append((time.perf_counter() - began) * 1000)
+                tap(conn, escape)
+                if not wait_for(lambda: not pointer_grabbed(conn, root)):
+                    raise RuntimeError(f"{method}: selector did not close")
+                # Let the cancelled capture finish before the next press
+                time.sleep(0.2)
+        finally:
+            process.terminate()
+            process.wait()
+            conn.close()
+    return latencies
+
+
+def summarise(method, latencies):
+    ordered = sorted(latencies)
+    return {
+        "method": method,
+        "runs": len(ordered),
+        "median_ms": round(statistics.median(ordered), 2),
+        "p95_ms": round(ordered[int(0.95 * (len(ordered) - 1))], 2),
+        "min_ms": round(ordered[0], 2),
+        "max_ms": round(ordered[-1], 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--key", default="F12", help="key to bind (default F12)")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--methods", default=",".join(METHODS))
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args(argv)
+
+    if X is None:
+        print("python-xlib is required", file=sys.stderr)
+        return 2
+    methods = args.methods.split(",")
+    for method in methods:
+        if method not in METHODS:
+            parser.error(f"unknown method {method!r}")
+    needed = ["scrot"] + (["xbindkeys"] if "xbindkeys" in methods else [])
+    missing = [tool for tool in needed if shutil.which(tool) is None]
+    if missing:
+        print(f"missing tools: {', '.join(missing)}", file=sys.stderr)
+        return 2
+
+    results = []
+    try:
+        with xvfb() as display_name:
+            for method in methods:
+                latencies = measure(method, display_name, args.key, args.repeat)
+                results.append(summarise(method, latencies))
+    except HeadlessError as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    print(f"{'method':<12}{'median ms':>10}{'p95 ms':>9}{'min ms':>9}{'max ms':>9}")
+    for result in results:
+        print(
+            f"{result['method']:<12}{result['median_ms']:>10.2f}"
+            f"{result['p95_ms']:>9.2f}{result['min_ms']:>9.2f}{result['max_ms']:>9.2f}"
+        )
+    medians = {result["method"]: result["median_ms"] for result in results}
+    if len(medians) == 2:
+        speedup = medians["xbindkeys"] / max(medians["listener"], 0.01)
+        print(f"listener reaches the selector {speedup:.1f}x faster than xbindkeys")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
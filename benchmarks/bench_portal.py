@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""Portal capture latency against a stand-in portal on a private session bus.
+
+Usage: python3 benchmarks/bench_portal.py [--resolution 1920x1080]
+       [--region 800x600] [--repeat N] [--json results.json]
+
+Starts a private dbus-daemon and a stand-in for xdg-desktop-portal. The
+stand-in owns org.freedesktop.portal.Desktop and answers Screenshot calls
+the way the real portal does: it replies with a request handle, writes a
+synthetic screen as PNG and emits Request.Response with its file:// URI.
+snipaster.portal then takes captures through it:
+
+  portal         interactive request, the file moved into place
+  portal+crop    non-interactive full-screen grab cropped to the region
+  cancelled      the stand-in answers "cancelled" (checks the None path)
+
+The times cover the D-Bus round trips, the file handling and, for the
+crop, a PNG decode and encode; a real portal adds its own capture time.
+Needs dbus-daemon and jeepney.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import quote
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from headless import HeadlessError, session_bus  # noqa: E402
+
+from snipaster import png  # noqa: E402
+from snipaster.portal import (  # noqa: E402
+    BUS_NAME,
+    CANCELLED,
+    INTERFACE,
+    OBJECT_PATH,
+    REQUEST_INTERFACE,
+    SUCCESS,
+    PortalCapture,
+    available,
+)
+
+try:
+    from jeepney import (
+        DBusAddress,
+        HeaderFields,
+        MessageType,
+        message_bus,
+        new_error,
+        new_method_return,
+        new_signal,
+    )
+    from jeepney.io.blocking import Proxy, open_dbus_connection
+except ImportError:
+    pass
+
+
+def parse_size(text):
+    width, height = text.split("x")
+    return int(width), int(height)
+
+
+def synthetic_screen(width, height):
+    """A PNG with some structure, so it compresses like a real screen."""
+    rows = []
+    for y in range(height):
+        shade = (y * 255) // max(height - 1, 1)
+        row = bytearray()
+        for x in range(width):
+            row += bytes((x & 0xFF, shade, (x >> 4 ^ y >> 4) & 0xFF))
+        rows.append(bytes(row))
+    return png.encode(width, height, 3, b"".join(rows), level=1)
+
+
+class StandinPortal:
+    """Answer Screenshot calls like xdg-desktop-portal, with a fixed screen."""
+
+    def __init__(self, address, screen, directory):
+        self.connection = open_dbus_connection(address)
+        reply = Proxy(message_bus, self.connection).RequestName(BUS_NAME)
+        if reply != (1,):
+            raise RuntimeError(f"could not own {BUS_NAME}")
+        self.screen = screen
+        self.directory = directory
+        self.response = SUCCESS
+        self.count = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self.run, daemon=True)
+
+    def handle(self, message):
+        fields = message.header.fields
+        interface = fields.get(HeaderFields.interface)
+        member = fields.get(HeaderFields.member)
+        if interface == "org.freedesktop.DBus.Properties" and member == "Get":
+            return new_method_return(message, "v", (("u", 1),))
+        if interface != INTERFACE or member != "Screenshot":
+            return new_error(message, "org.freedesktop.DBus.Error.UnknownMethod")
+        _, options = message.body
+        sender = fields[HeaderFields.sender][1:].replace(".", "_")
+        handle = f"{OBJECT_PATH}/request/{sender}/{options['handle_token'][1]}"
+        self.connection.send(new_method_return(message, "o", (handle,)))
+        results = {}
+        if self.response == SUCCESS:
+            self.count += 1
+            path = os.path.join(self.directory, f"Screenshot-{self.count}.png")
+            with open(path, "wb") as f:
+                f.write(self.screen)
+            results["uri"] = ("s", "file://" + quote(path))
+        emitter = DBusAddress(handle, interface=REQUEST_INTERFACE)
+        return new_signal(emitter, "Response", "ua{sv}", (self.response, results))
+
+    def run(self):
+        while not self._stop.is_set():
+            try:
+                message = self.connection.receive(timeout=0.2)
+            except TimeoutError:
+                continue
+            if message.header.message_type == MessageType.method_call:
+                self.connection.send(self.handle(message))
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.connection.close()
+
+
+def timed(function, repeat):
+    """Run function repeat times; return sorted latencies in ms."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append((time.perf_counter() - start) * 1000)
+    return sorted(times)
+
+
+def summarise(method, times):
+    return {
+        "method": method,
+        "runs": len(times),
+        "median_ms": round(statistics.median(times), 2),
+        "p95_ms": round(times[int(0.95 * (len(times) - 1))], 2),
+        "min_ms": round(times[0], 2),
+    }
+
+
+def measure(address, resolution, region, repeat):
+    width, height = parse_size(resolution)
+    w, h = parse_size(region)
+    box = ((width - w) // 2, (height - h) // 2, w, h)
+    results = []
+    with tempfile.TemporaryDirectory(prefix="snipaster-portal-") as scratch:
+        portal = StandinPortal(address, synthetic_screen(width, height), scratch)
+        portal.start()
+        out = os.path.join(scratch, "out.png")
+        try:
+            with PortalCapture(address) as client:
+
+                def interactive():
+                    if not client.capture(out):
+                        raise RuntimeError("interactive capture was cancelled")
+
+                def cropped():
+                    client.capture(out, box)
+
+                results.append(summarise("portal", timed(interactive, repeat)))
+                results.append(summarise("portal+crop", timed(cropped, repeat)))
+                with open(out, "rb") as f:
+                    if png.dimensions(f.read()) != (w, h):
+                        raise RuntimeError("the cropped capture has the wrong size")
+
+                portal.response = CANCELLED
+
+                def cancelled():
+                    if client.capture(out) is not False:
+                        raise RuntimeError("a cancelled capture was not reported")
+
+                results.append(summarise("cancelled", timed(cancelled, repeat)))
+            if os.listdir(scratch) != ["out.png"]:
+                raise RuntimeError("portal files were left behind")
+        finally:
+            portal.stop()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--resolution", default="1920x1080")
+    parser.add_argument("--region", default="800x600")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args(argv)
+
+    if not available():
+        print("jeepney is required", file=sys.stderr)
+        return 2
+    try:
+        with session_bus() as address:
+            results = measure(address, args.resolution, args.region, args.repeat)
+    except HeadlessError as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    print(f"{'method':<14}{'median ms':>10}{'p95 ms':>9}{'min ms':>9}")
+    for result in results:
+        print(
+            f"{result['method']:<14}{result['median_ms']:>10.2f}"
+            f"{result['p95_ms']:>9.2f}{result['min_ms']:>9.2f}"
+        )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
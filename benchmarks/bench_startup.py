@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Import-time cost of the Snipaster entry points, measured with -X importtime.
+
+Usage: python3 benchmarks/bench_startup.py [--modules install_snipaster,...]
+       [--repeat N] [--max-ms MS] [--json results.json]
+
+Each module is imported in a fresh interpreter. The report gives the median
+cumulative import time and the slowest imports it pulled in. The run fails
+when a module drags in one of the UI-only packages (asciimatics, pyfiglet)
+or, with --max-ms, when its median exceeds the limit.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MODULES = "install_snipaster,screenshot_setup,snipaster.install"
+# Packages that only the animated UI may load.
+UI_ONLY = ("asciimatics", "pyfiglet")
+
+
+def import_profile(module):
+    """Import module in a fresh interpreter.
+
+    Returns (cumulative ms for module, [(import, cumulative ms)] for the
+    imports it made directly, every module name loaded along the way).
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    # Children are printed before their parent and indented two spaces per
+    # level, so module's direct imports are the depth-1 lines just above it.
+    names, children = [], []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line.split("|")
+        name = name[1:].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        name = name.strip()
+        names.append(name)
+        ms = int(cumulative_us) / 1000
+        if depth == 1:
+            children.append((name, ms))
+        elif depth == 0:
+            if name == module.split(".")[0] or name == module:
+                total, direct = ms, children
+            children = []
+    return total, direct, names
+
+
+def measure(module, repeat):
+    """Summarise repeat fresh imports of module."""
+    totals = []
+    for _ in range(repeat):
+        total, direct, names = import_profile(module)
+        totals.append(total)
+    slowest = sorted(direct, key=lambda item: -item[1])[:5]
+    return {
+        "module": module,
+        "median_ms": round(statistics.median(totals), 2),
+        "min_ms": round(min(totals), 2),
+        "imports": len(set(names)),
+        "ui_only": sorted({name.split(".")[0] for name in names} & set(UI_ONLY)),
+        "slowest": [(name, round(ms, 2)) for name, ms in slowest],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modules", default=DEFAULT_MODULES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--max-ms", type=float, help="fail when a median import exceeds this"
+    )
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args(argv)
+
+    results = [measure(module, args.repeat) for module in args.modules.split(",")]
+    failed = False
+    print(f"{'module':<24}{'median ms':>10}{'min ms':>9}{'imports':>9}  slowest")
+    for result in results:
+        slowest = ", ".join(f"{name} {ms}" for name, ms in result["slowest"][:3])
+        print(
+            f"{result['module']:<24}{result['median_ms']:>10.2f}"
+            f"{result['min_ms']:>9.2f}{result['imports']:>9}  {slowest}"
+        )
+        if result["ui_only"]:
+            print(f"  FAIL: imports UI-only modules: {', '.join(result['ui_only'])}")
+            failed = True
+        if args.max_ms is not None and result["median_ms"] > args.max_ms:
+            print(f"  FAIL: median above {args.max_ms} ms")
+            failed = True
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""Headless display servers and a private session bus for the benchmarks.
+
+Starts Xvfb on a display number it picks itself (-displayfd), or sway on
+the wlroots headless backend in a private runtime directory, so benchmarks
+never grab keys or the pointer on the desktop they are started from. The
+private D-Bus bus keeps stand-in services off the desktop's session bus.
+"""
+import os
+import shutil
+import subprocess
+import time
+from contextlib import contextmanager
+
+# How long sway may take to create its Wayland socket
+SWAY_TIMEOUT = 10.0
+
+
+class HeadlessError(Exception):
+    """Raised when no headless server can be started."""
+
+
+@contextmanager
+def xvfb(resolution="1920x1080", depth=24):
+    """Run Xvfb for the duration of the block; yield its DISPLAY value."""
+    binary = shutil.which("Xvfb")
+    if binary is None:
+        raise HeadlessError("Xvfb is not installed (apt install xvfb)")
+    read_fd, write_fd = os.pipe()
+    server = subprocess.Popen(
+        [
+            binary,
+            "-displayfd",
+            str(write_fd),
+            "-screen",
+            "0",
+            f"{resolution}x{depth}",
+            "-nolisten",
+            "tcp",
+        ],
+        pass_fds=(write_fd,),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    os.close(write_fd)
+    try:
+        # Xvfb writes the display number once it accepts connections
+        with os.fdopen(read_fd) as f:
+            number = f.readline().strip()
+        if not number:
+            raise HeadlessError("Xvfb exited before it was ready")
+        yield f":{number}"
+    finally:
+        server.terminate()
+        server.wait()
+
+
+@contextmanager
+def sway(runtime_dir, resolution="1920x1080"):
+    """Run a headless sway for the block; yield its WAYLAND_DISPLAY value.
+
+    runtime_dir is used as XDG_RUNTIME_DIR, so clients must share it.
+    """
+    binary = shutil.which("sway")
+    if binary is None:
+        raise HeadlessError("sway is not installed (apt install sway)")
+    config = os.path.join(runtime_dir, "sway-headless.conf")
+    with open(config, "w") as f:
+        f.write(f"xwayland disable\noutput * mode --custom {resolution}\n")
+    env = dict(
+        os.environ,
+        XDG_RUNTIME_DIR=runtime_dir,
+        WLR_BACKENDS="headless",
+        WLR_LIBINPUT_NO_DEVICES="1",
+        WLR_RENDERER="pixman",
+    )
+    for name in ("DISPLAY", "WAYLAND_DISPLAY", "SWAYSOCK"):
+        env.pop(name, None)
+    before = set(os.listdir(runtime_dir))
+    server = subprocess.Popen(
+        [binary, "--config", config],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        # sway creates wayland-N (and wayland-N.lock) once it accepts clients
+        deadline = time.monotonic() + SWAY_TIMEOUT
+        while True:
+            sockets = [
+                name
+                for name in set(os.listdir(runtime_dir)) - before
+                if name.startswith("wayland-") and not name.endswith(".lock")
+            ]
+            if sockets:
+                break
+            if server.poll() is not None:
+                raise HeadlessError("sway exited before it was ready")
+            if time.monotonic() > deadline:
+                raise HeadlessError("sway did not create a Wayland socket")
+            time.sleep(0.01)
+        yield sockets[0]
+    finally:
+        server.terminate()
+        server.wait()
+
+
+@contextmanager
+def session_bus():
+    """Run a private D-Bus session bus for the block; yield its address."""
+    binary = shutil.which("dbus-daemon")
+    if binary is None:
+        raise HeadlessError("dbus-daemon is not installed (apt install dbus)")
+    bus = subprocess.Popen(
+        [binary, "--session", "--nofork", "--nopidfile", "--print-address=1"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+    )
+    try:
+        # The address is printed once the bus accepts connections
+        address = bus.stdout.readline().strip()
+        if not address:
+            raise HeadlessError("dbus-daemon exited before it was ready")
+        yield address
+    finally:
+        bus.terminate()
+        bus.wait()
+        bus.stdout.close()
@@ -0,0 +1 @@
+"""Shared building blocks for the Snipaster installers and capture tools."""
@@ -0,0 +1,31 @@
+"""snipaster: command-line entry point, installed as ~/.local/bin/snipaster.
+
+    snipaster stats [--by capture|clipboard|via|session] [--json]
+        p50/p95/p99 latency per capture stage and backend (snipaster.trace)
+    snipaster recopy [N]
+        put the Nth most recent capture back on the clipboard (snipaster.recent)
+"""
+import sys
+
+from snipaster import trace
+
+
+def recopy(argv):
+    from snipaster import recent
+
+    return recent.main(argv[1:])
+
+
+COMMANDS = {"stats": trace.main, "recopy": recopy}
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] not in COMMANDS:
+        print(__doc__.strip(), file=sys.stderr)
+        return 2
+    return COMMANDS[argv[0]](argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
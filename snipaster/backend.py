@@ -0,0 +1,234 @@
+"""Detection of the screenshot, clipboard and notification tools in use.
+
+The installer resolves the backend once and records it in a manifest
+(backend.json, plus a shell-sourceable backend.env for the wrapper script),
+so captures do not have to probe for tools again.
+"""
+import argparse
+import json
+import os
+import shlex
+import shutil
+import sys
+
+from snipaster.fsutil import atomic_write
+from snipaster.naming import SHARD_FORMATS
+
+MANIFEST_VERSION = 1
+CONFIG_DIR = os.path.join(
+    os.environ.get("XDG_CONFIG_HOME") or os.path.expanduser("~/.config"),
+    "snipaster",
+)
+MANIFEST_PATH = os.path.join(CONFIG_DIR, "backend.json")
+
+# Manifest keys chosen by the user at install time rather than detected.
+SETTINGS_KEYS = (
+    "encoder",
+    "archive",
+    "shard",
+    "retention_days",
+    "retention_bytes",
+    "directory",
+    "prefer_capture",
+    "prefer_clipboard",
+)
+
+# Every external tool the capture path may call.
+TOOLS = (
+    "gnome-screenshot",
+    "grim",
+    "slurp",
+    "scrot",
+    "wl-copy",
+    "xclip",
+    "notify-send",
+)
+
+# Capture strategy -> the tools it runs.
+CAPTURE_TOOLS = {
+    "gnome-screenshot": ("gnome-screenshot",),
+    "grim": ("grim", "slurp"),
+    "scrot": ("scrot",),
+}
+CLIPBOARD_TOOLS = ("wl-copy", "xclip")
+
+
+def detect_backend(env=None):
+    """Resolve the capture and clipboard strategy for the current session.
+
+    Mirrors the checks the wrapper script makes, but returns absolute tool
+    paths so callers can run the tools without probing again.
+    """
+    env = os.environ if env is None else env
+    session = env.get("XDG_SESSION_TYPE", "")
+    path = env.get("PATH")
+    tools = {}
+    for name in TOOLS:
+        found = shutil.which(name, path=path)
+        if found:
+            tools[name] = found
+
+    if session == "wayland":
+        if "gnome-screenshot" in tools:
+            capture = "gnome-screenshot"
+        elif "grim" in tools and "slurp" in tools:
+            capture = "grim"
+        else:
+            capture = None
+    else:
+        capture = "scrot" if "scrot" in tools else None
+
+    if session == "wayland" and "wl-copy" in tools:
+        clipboard = "wl-copy"
+    elif "xclip" in tools:
+        clipboard = "xclip"
+    else:
+        clipboard = None
+
+    return {
+        "session": session,
+        "capture": capture,
+        "clipboard": clipboard,
+        "tools": tools,
+        "encoder": "png",
+        "archive": None,
+        "shard": "none",
+        "retention_days": None,
+        "retention_bytes": None,
+        "directory": None,
+        "prefer_capture": None,
+        "prefer_clipboard": None,
+    }
+
+
+def keep_settings(backend, recorded):
+    """Copy user choices (not detection results) from a recorded manifest."""
+    for key in SETTINGS_KEYS:
+        if key in recorded:
+            backend[key] = recorded[key]
+    return backend
+
+
+def apply_preferences(backend):
+    """Switch to the configured capture/clipboard tools when they are installed."""
+    tools = backend["tools"]
+    capture = backend.get("prefer_capture")
+    if capture in CAPTURE_TOOLS and all(t in tools for t in CAPTURE_TOOLS[capture]):
+        backend["capture"] = capture
+    clipboard = backend.get("prefer_clipboard")
+    if clipboard in CLIPBOARD_TOOLS and clipboard in tools:
+        backend["clipboard"] = clipboard
+    return backend
+
+
+def required_tools(backend):
+    """Return the tool paths the chosen strategy depends on."""
+    tools = backend["tools"]
+    names = list(CAPTURE_TOOLS.get(backend["capture"], ()))
+    if backend["clipboard"]:
+        names.append(backend["clipboard"])
+    if "notify-send" in tools:
+        names.append("notify-send")
+    return [tools[name] for name in names if name in tools]
+
+
+def env_name(tool):
+    """Shell variable holding the path of tool, e.g. SNIPASTER_WL_COPY."""
+    return "SNIPASTER_" + tool.upper().replace("-", "_")
+
+
+def render_env(backend):
+    """Render the backend as shell assignments for the wrapper script."""
+    values = {
+        "SNIPASTER_SESSION": backend["session"],
+        "SNIPASTER_CAPTURE": backend["capture"] or "",
+        "SNIPASTER_CLIPBOARD": backend["clipboard"] or "",
+        "SNIPASTER_ENCODER": backend.get("encoder") or "png",
+        "SNIPASTER_ARCHIVE": backend.get("archive") or "",
+        "SNIPASTER_SHARD": SHARD_FORMATS[backend.get("shard") or "none"],
+        "SNIPASTER_DIR": backend.get("directory") or "",
+        "SNIPASTER_REQUIRED": " ".join(required_tools(backend)),
+    }
+    for tool in TOOLS:
+        values[env_name(tool)] = backend["tools"].get(tool, "")
+    lines = ["# Generated by Snipaster; re-run the installer to refresh"]
+    lines += [f"{name}={shlex.quote(value)}" for name, value in values.items()]
+    return "\n".join(lines) + "\n"
+
+
+def env_path(path=MANIFEST_PATH):
+    """Path of the backend.env that accompanies the manifest at path."""
+    return os.path.splitext(path)[0] + ".env"
+
+
+def render_manifest(backend):
+    """Render the backend as the JSON text of backend.json."""
+    manifest = dict(backend, version=MANIFEST_VERSION)
+    return json.dumps(manifest, indent=2, sort_keys=True) + "\n"
+
+
+def write_manifest(backend, path=MANIFEST_PATH):
+    """Write backend.json and the matching backend.env next to it."""
+    atomic_write(path, render_manifest(backend))
+    atomic_write(env_path(path), render_env(backend))
+
+
+def load_manifest(path=MANIFEST_PATH):
+    """Return the recorded backend, or None if missing or unreadable."""
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+    manifest.pop("version")
+    return manifest
+
+
+def manifest_valid(backend, env=None):
+    """Cheap staleness check: same session type and every tool still there."""
+    env = os.environ if env is None else env
+    if backend.get("session") != env.get("XDG_SESSION_TYPE", ""):
+        return False
+    return all(os.access(tool, os.X_OK) for tool in required_tools(backend))
+
+
+def load_or_detect(path=MANIFEST_PATH, env=None):
+    """Use the manifest when it is still valid, otherwise re-detect and save it."""
+    recorded = load_manifest(path)
+    if recorded is not None and manifest_valid(recorded, env):
+        return recorded
+    backend = detect_backend(env)
+    if recorded is not None:
+        apply_preferences(keep_settings(backend, recorded))
+    try:
+        write_manifest(backend, path)
+    except OSError:
+        pass
+    return backend
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Show or refresh the Snipaster backend."
+    )
+    parser.add_argument(
+        "--write", action="store_true", help="re-detect and rewrite the manifest"
+    )
+    parser.add_argument("--manifest", default=MANIFEST_PATH, help="manifest path")
+    args = parser.parse_args(argv)
+
+    if args.write:
+        backend = keep_settings(detect_backend(), load_manifest(args.manifest) or {})
+        apply_preferences(backend)
+        write_manifest(backend, args.manifest)
+    else:
+        backend = load_or_detect(args.manifest)
+    json.dump(backend, sys.stdout, indent=2, sort_keys=True)
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+"""Minimal client used by the wrapper script to reach snipaster-daemon.
+
+Kept free of package imports so it can run as `python3 -IS client.py SOCKET`
+with the shortest possible interpreter startup.
+
+Exit codes: 0 screenshot taken, 1 cancelled or failed, 75 (EX_TEMPFAIL)
+daemon unreachable, in which case the wrapper captures by itself.
+"""
+import os
+import socket
+import stat
+import sys
+
+EX_TEMPFAIL = 75
+
+
+def check_private_dir(directory):
+    """Raise PermissionError unless directory is a real 0700 directory of ours.
+
+    The socket falls back to /tmp/snipaster-UID when XDG_RUNTIME_DIR is
+    unset, a name anyone can create first.
+    """
+    st = os.lstat(directory)
+    if not stat.S_ISDIR(st.st_mode):
+        raise PermissionError(f"{directory} is not a directory")
+    if st.st_uid != os.getuid():
+        raise PermissionError(f"{directory} is not owned by uid {os.getuid()}")
+    if stat.S_IMODE(st.st_mode) != 0o700:
+        raise PermissionError(f"{directory} does not have mode 0700")
+
+
+def request(sock_path, command="capture"):
+    """Send one command to the daemon and return its reply line."""
+    check_private_dir(os.path.dirname(sock_path) or ".")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(sock_path)
+        sock.sendall(command.encode() + b"\n")
+        with sock.makefile("r", encoding="utf-8") as reply:
+            return reply.readline().strip()
+
+
+def main(argv):
+    if len(argv) < 2:
+        print("usage: client.py SOCKET [COMMAND]", file=sys.stderr)
+        return 2
+    command = " ".join(argv[2:]) or "capture"
+    try:
+        reply = request(argv[1], command)
+    except OSError:
+        return EX_TEMPFAIL
+    if not reply:
+        # The daemon went away mid-request
+        return EX_TEMPFAIL
+    status, _, detail = reply.partition(" ")
+    if detail:
+        print(detail)
+    return 0 if status == "ok" else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
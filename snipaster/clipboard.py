@@ -0,0 +1,316 @@
+"""Resident X11 clipboard owner for snipaster-daemon (needs python-xlib).
+
+Instead of encoding a PNG and handing it to xclip, the daemon takes the
+CLIPBOARD selection itself as soon as the pixels are captured and offers
+several targets:
+
+    image/png      the PNG the save stage produces anyway
+    image/bmp      24-bit BMP built straight from the raw pixels
+    image/webp     lossless WebP (when Pillow has WebP support)
+    text/uri-list  file:// URI of the saved capture
+
+Nothing is encoded until a paste asks for that target, and each encoding
+is kept for later pastes; an application that takes image/bmp never waits
+for a PNG. Transfers larger than one X request use the INCR protocol.
+Only the owner's thread talks to its X connection: offer() hands the
+capture over through a queue and waits until the selection is taken.
+X11 only: on Wayland the selection belongs to the compositor, and wl-copy
+is used as before.
+"""
+import os
+import queue
+import select
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from urllib.parse import quote
+
+from snipaster.encode import encode_bmp, encode_webp, webp_available
+
+try:
+    from Xlib import X, Xatom, display, error
+    from Xlib.protocol import event as xevent
+except ImportError:
+    X = None
+
+# Largest single property write; bigger transfers go through INCR
+MAX_CHUNK = 1 << 20
+# How long a text/uri-list request waits for the file to be saved
+SAVE_TIMEOUT = 5.0
+# How long offer() waits for the owner thread to take the selection
+OFFER_TIMEOUT = 2.0
+
+
+class ClipboardError(Exception):
+    """Raised when the clipboard owner cannot be set up."""
+
+
+def available():
+    """Whether python-xlib is installed."""
+    return X is not None
+
+
+def encoders():
+    """Clipboard target -> encode(source), for the targets offered."""
+    targets = {
+        "image/png": lambda source: source.png,
+        "image/bmp": encode_bmp,
+    }
+    if webp_available():
+        targets["image/webp"] = encode_webp
+    return targets
+
+
+class Offer:
+    """One capture on the clipboard and the encodings made of it so far."""
+
+    def __init__(self, source, saved):
+        self.source = source
+        # Future (or anything with result(timeout)) giving the saved path
+        self.saved = saved
+        self.cache = {}
+
+
+class ClipboardOwner:
+    """Own the CLIPBOARD selection on a private X connection and thread.
+
+    offer() may be called from any thread; everything else, including every
+    request on the X connection, runs on the owner's own thread.
+    """
+
+    def __init__(self, display_name=None, selection="CLIPBOARD"):
+        if X is None:
+            raise ClipboardError("the clipboard owner needs python-xlib")
+        try:
+            self.display = display.Display(display_name)
+        except (error.DisplayError, error.ConnectionClosedError) as e:
+            raise ClipboardError(f"cannot open display: {e}")
+        # A requestor may vanish mid-transfer; ignore the resulting errors
+        self.display.set_error_handler(lambda err, request: None)
+        # PropertyNotify on this window supplies the server timestamps
+        self.window = self.display.screen().root.create_window(
+            0, 0, 1, 1, 0, X.CopyFromParent, event_mask=X.PropertyChangeMask
+        )
+        self.selection = self.display.intern_atom(selection)
+        self.atoms = {
+            name: self.display.intern_atom(name)
+            for name in ("TARGETS", "TIMESTAMP", "INCR", "text/uri-list")
+        }
+        self.stamp = self.display.intern_atom("_SNIPASTER_TIMESTAMP")
+        self.encoders = {
+            self.display.intern_atom(name): encode
+            for name, encode in encoders().items()
+        }
+        self.max_chunk = min(MAX_CHUNK, self.display.info.max_request_length * 4 - 64)
+        self.current = None
+        # Server time at which the selection was taken for current
+        self.acquired = X.CurrentTime
+        # (Offer, Future) pairs from offer(), then waiting for their timestamp
+        self.offers = queue.SimpleQueue()
+        self.stamping = deque()
+        # [request, offer, deadline] for text/uri-list before the save is done
+        self.deferred = []
+        # (requestor window id, property) -> [window, type, data, offset]
+        self.transfers = {}
+        self._wake_read, self._wake_write = os.pipe()
+        os.set_blocking(self._wake_write, False)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self.run, name="snipaster-clipboard", daemon=True
+        )
+        self._thread.start()
+
+    def offer(self, source, saved, timeout=OFFER_TIMEOUT):
+        """Put the ImageSource on the clipboard; saved yields its final path.
+
+        saved is a Future. Returns once the owner thread holds the selection.
+        """
+        taken = Future()
+        self.offers.put((Offer(source, saved), taken))
+        self.wake()
+        try:
+            taken.result(timeout)
+        except TimeoutError:
+            # The caller falls back to the clipboard tool; don't take it later
+            taken.cancel()
+            raise ClipboardError("the X server did not answer in time")
+
+    def wake(self):
+        """Make the owner thread look at its queue and deferred requests."""
+        try:
+            os.write(self._wake_write, b"\0")
+        except BlockingIOError:
+            pass  # Already woken
+
+    def run(self):
+        fd = self.display.fileno()
+        while not self._stop.is_set():
+            try:
+                self.service()
+                if not self.display.pending_events():
+                    ready, _, _ = select.select([fd, self._wake_read], [], [], 0.5)
+                    if self._wake_read in ready:
+                        os.read(self._wake_read, 4096)
+                    if not self.display.pending_events():
+                        continue
+                event = self.display.next_event()
+                if event.type == X.SelectionRequest:
+                    self.answer(event)
+                elif event.type == X.SelectionClear:
+                    # Someone else copied; forget the capture and its encodings
+                    self.current = None
+                elif event.type == X.PropertyNotify:
+                    if event.window.id == self.window.id:
+                        self.stamped(event)
+                    else:
+                        self.continue_transfer(event)
+            except Exception as e:
+                print(f"Clipboard request failed: {e}", file=sys.stderr)
+
+    def service(self):
+        """Start taking the selection for new offers; answer deferred requests."""
+        while True:
+            try:
+                offered = self.offers.get_nowait()
+            except queue.Empty:
+                break
+            # ICCCM forbids CurrentTime here; a zero-length append makes the
+            # server report the time in a PropertyNotify (see stamped)
+            self.stamping.append(offered)
+            self.window.change_property(
+                self.stamp, Xatom.STRING, 8, b"", mode=X.PropModeAppend
+            )
+            self.display.flush()
+        now = time.monotonic()
+        due = [
+            entry
+            for entry in self.deferred
+            if entry[1].saved.done() or now >= entry[2]
+        ]
+        # Drop them first, so a failing reply is not retried forever
+        self.deferred = [entry for entry in self.deferred if entry not in due]
+        for request, current, _ in due:
+            try:
+                self.reply(request, current)
+            except Exception as e:
+                print(f"Clipboard request failed: {e}", file=sys.stderr)
+
+    def stamped(self, event):
+        """Take the selection for the oldest offer at the server's time."""
+        if event.atom != self.stamp or not self.stamping:
+            return
+        current, taken = self.stamping.popleft()
+        if not taken.set_running_or_notify_cancel():
+            return
+        self.window.set_selection_owner(self.selection, event.time)
+        if self.display.get_selection_owner(self.selection) != self.window:
+            taken.set_exception(ClipboardError("another client kept the clipboard"))
+            return
+        self.current = current
+        self.acquired = event.time
+        taken.set_result(None)
+
+    def convert(self, current, target):
+        """Return (type atom, format, data) for target, or None if not offered."""
+        if target == self.atoms["TARGETS"]:
+            targets = [self.atoms["TARGETS"], self.atoms["TIMESTAMP"], *self.encoders]
+            return Xatom.ATOM, 32, targets + [self.atoms["text/uri-list"]]
+        if target == self.atoms["TIMESTAMP"]:
+            return Xatom.INTEGER, 32, [self.acquired]
+        if target == self.atoms["text/uri-list"]:
+            if not current.saved.done():
+                return None  # The save stage took longer than SAVE_TIMEOUT
+            uri = "file://" + quote(current.saved.result())
+            return target, 8, (uri + "\r\n").encode()
+        if target in self.encoders:
+            if target not in current.cache:
+                current.cache[target] = self.encoders[target](current.source)
+            return target, 8, current.cache[target]
+        return None
+
+    def answer(self, request):
+        current = self.current
+        if request.selection != self.selection or (
+            request.time != X.CurrentTime and request.time < self.acquired
+        ):
+            # Not ours, or made before we took the selection
+            current = None
+        if (
+            current is not None
+            and request.target == self.atoms["text/uri-list"]
+            and not current.saved.done()
+        ):
+            # Reply once the file is saved, without holding up other requests
+            deadline = time.monotonic() + SAVE_TIMEOUT
+            self.deferred.append((request, current, deadline))
+            current.saved.add_done_callback(lambda saved: self.wake())
+            return
+        self.reply(request, current)
+
+    def reply(self, request, current):
+        """Convert request for current (None refuses it) and notify the requestor."""
+        prop = request.property or request.target
+        converted = None
+        if current is not None:
+            try:
+                converted = self.convert(current, request.target)
+            except Exception as e:
+                # Refuse the request rather than leave the requestor waiting
+                print(f"Clipboard conversion failed: {e}", file=sys.stderr)
+        if converted is None:
+            prop = X.NONE
+        else:
+            kind, fmt, data = converted
+            if fmt == 8 and len(data) > self.max_chunk:
+                self.start_transfer(request.requestor, prop, kind, data)
+            else:
+                request.requestor.change_property(prop, kind, fmt, data)
+        notify = xevent.SelectionNotify(
+            time=request.time,
+            requestor=request.requestor,
+            selection=request.selection,
+            target=request.target,
+            property=prop,
+        )
+        request.requestor.send_event(notify)
+        self.display.flush()
+
+    def start_transfer(self, window, prop, kind, data):
+        """Begin an INCR transfer; chunks follow as the requestor deletes them."""
+        window.change_attributes(event_mask=X.PropertyChangeMask)
+        window.change_property(prop, self.atoms["INCR"], 32, [len(data)])
+        self.transfers[(window.id, prop)] = [window, kind, data, 0]
+
+    def continue_transfer(self, event):
+        if event.state != X.PropertyDelete:
+            return
+        transfer = self.transfers.get((event.window.id, event.atom))
+        if transfer is None:
+            return
+        window, kind, data, offset = transfer
+        chunk = data[offset : offset + self.max_chunk]
+        # The final, empty chunk tells the requestor the transfer is complete
+        window.change_property(event.atom, kind, 8, chunk)
+        if chunk:
+            transfer[3] = offset + len(chunk)
+        else:
+            del self.transfers[(window.id, event.atom)]
+            if not any(key[0] == window.id for key in self.transfers):
+                window.change_attributes(event_mask=X.NoEventMask)
+        self.display.flush()
+
+    def close(self):
+        self._stop.set()
+        self.wake()
+        self._thread.join()
+        while not self.offers.empty():
+            self.stamping.append(self.offers.get_nowait())
+        for _, taken in self.stamping:
+            if taken.set_running_or_notify_cancel():
+                taken.set_exception(ClipboardError("the clipboard owner stopped"))
+        self.window.destroy()
+        self.display.close()
+        os.close(self._wake_read)
+        os.close(self._wake_write)
@@ -0,0 +1,211 @@
+"""Installer options, shared by both installers and the unattended entrypoint.
+
+Options come from an optional INI file (section [snipaster]) and are then
+overridden by whatever was given on the command line:
+
+    [snipaster]
+    hotkey = F1
+    save_dir = ~/Pictures/Screenshots
+    capture = auto
+    clipboard = auto
+    daemon = no
+    listener = no
+    install_packages = yes
+    encoder = png
+    archive =
+    shard = none
+    retention_days =
+    retention_bytes = 2G
+"""
+import configparser
+import os
+import re
+
+from snipaster.backend import CAPTURE_TOOLS, CLIPBOARD_TOOLS, SETTINGS_KEYS
+from snipaster.encode import CLIPBOARD_ENCODERS, ENCODERS, get_encoder
+from snipaster.library import parse_size
+from snipaster.naming import SHARD_FORMATS
+
+SECTION = "snipaster"
+DEFAULTS = {
+    "hotkey": "F1",
+    "daemon": False,
+    "listener": False,
+    "install_packages": True,
+    "encoder": "png",
+    "archive": None,
+    "shard": "none",
+    "retention_days": None,
+    "retention_bytes": None,
+    "directory": None,
+    "prefer_capture": None,
+    "prefer_clipboard": None,
+}
+# Config file key -> option name, where they differ.
+FILE_KEYS = {
+    "save_dir": "directory",
+    "capture": "prefer_capture",
+    "clipboard": "prefer_clipboard",
+}
+# GTK accelerator syntax, e.g. F1, Print or <Control><Shift>s
+HOTKEY_RE = re.compile(r"^(<[A-Za-z0-9_]+>)*[A-Za-z0-9_]+$")
+
+
+class ConfigError(ValueError):
+    """Raised for an unreadable config file or an invalid option value."""
+
+
+def _choice(name, value, choices):
+    if value not in choices:
+        raise ConfigError(f"{name}: {value!r} is not one of {', '.join(choices)}")
+    return value
+
+
+def _auto(value):
+    return None if value in (None, "", "auto") else value
+
+
+def validate(options):
+    """Check and normalise options in place; raise ConfigError if invalid."""
+    if not HOTKEY_RE.match(options["hotkey"] or ""):
+        raise ConfigError(f"hotkey: {options['hotkey']!r} is not a key binding")
+    _choice("encoder", options["encoder"], CLIPBOARD_ENCODERS)
+    _choice("shard", options["shard"], sorted(SHARD_FORMATS))
+    if options["archive"]:
+        _choice("archive", options["archive"], sorted(ENCODERS))
+        try:
+            get_encoder(options["archive"])
+        except ValueError as e:
+            raise ConfigError(f"archive: {e}")
+    options["prefer_capture"] = _auto(options["prefer_capture"])
+    options["prefer_clipboard"] = _auto(options["prefer_clipboard"])
+    if options["prefer_capture"]:
+        _choice("capture", options["prefer_capture"], sorted(CAPTURE_TOOLS))
+    if options["prefer_clipboard"]:
+        _choice("clipboard", options["prefer_clipboard"], CLIPBOARD_TOOLS)
+    if options["directory"]:
+        options["directory"] = os.path.abspath(os.path.expanduser(options["directory"]))
+    if options["listener"]:
+        # The listener runs inside snipaster-daemon
+        options["daemon"] = True
+    return options
+
+
+def load_config(path):
+    """Read options from an INI file, falling back to DEFAULTS."""
+    parser = configparser.ConfigParser(interpolation=None)
+    try:
+        with open(path) as f:
+            parser.read_file(f)
+    except (OSError, configparser.Error) as e:
+        raise ConfigError(f"cannot read {path}: {e}")
+    if not parser.has_section(SECTION):
+        raise ConfigError(f"{path}: missing [{SECTION}] section")
+
+    options = dict(DEFAULTS)
+    for key, value in parser.items(SECTION):
+        name = FILE_KEYS.get(key, key)
+        if name not in DEFAULTS:
+            raise ConfigError(f"{path}: unknown option {key!r}")
+        value = value.strip()
+        try:
+            if name in ("daemon", "listener", "install_packages"):
+                value = parser.getboolean(SECTION, key)
+            elif name == "retention_days":
+                value = float(value) if value else None
+            elif name == "retention_bytes":
+                value = parse_size(value) if value else None
+            else:
+                value = value or None
+        except ValueError as e:
+            raise ConfigError(f"{path}: {key}: {e}")
+        options[name] = value
+    return options
+
+
+def add_arguments(parser):
+    """Add the installer options to an argparse parser.
+
+    Everything defaults to None so that only flags actually given override
+    the config file.
+    """
+    parser.add_argument("--config", metavar="FILE", help="read options from FILE")
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        default=None,
+        help="run the resident snipaster-daemon for faster captures",
+    )
+    parser.add_argument(
+        "--listener",
+        action="store_true",
+        default=None,
+        help="on X11, let snipaster-daemon grab the hotkey itself instead of "
+        "xbindkeys (needs python-xlib; implies --daemon)",
+    )
+    parser.add_argument(
+        "--hotkey", help="key that takes a screenshot, e.g. F1 or <Control>Print"
+    )
+    parser.add_argument(
+        "--save-dir",
+        dest="directory",
+        metavar="DIR",
+        help="where captures are saved (default ~/Pictures/Screenshots)",
+    )
+    parser.add_argument(
+        "--capture",
+        dest="prefer_capture",
+        choices=("auto", *sorted(CAPTURE_TOOLS)),
+        help="capture tool to use when it is installed",
+    )
+    parser.add_argument(
+        "--clipboard",
+        dest="prefer_clipboard",
+        choices=("auto", *CLIPBOARD_TOOLS),
+        help="clipboard tool to use when it is installed",
+    )
+    parser.add_argument(
+        "--encoder",
+        choices=CLIPBOARD_ENCODERS,
+        help="PNG flavour for the clipboard path (png-fast: lowest compression)",
+    )
+    parser.add_argument(
+        "--archive",
+        choices=sorted(ENCODERS),
+        help=(
+            "re-encode saved captures to a smaller format in the background "
+            "(webp needs Pillow, qoi the qoi package)"
+        ),
+    )
+    parser.add_argument(
+        "--shard",
+        choices=sorted(SHARD_FORMATS),
+        help="file captures into dated subfolders of the save directory",
+    )
+    parser.add_argument(
+        "--retention-days",
+        type=float,
+        metavar="DAYS",
+        help="delete captures older than this",
+    )
+    parser.add_argument(
+        "--retention-bytes",
+        type=parse_size,
+        metavar="SIZE",
+        help="keep at most this much (e.g. 2G), deleting the oldest captures",
+    )
+
+
+def options_from_args(args):
+    """Merge the config file named by --config with the command-line flags."""
+    options = load_config(args.config) if args.config else dict(DEFAULTS)
+    for name in DEFAULTS:
+        value = getattr(args, name, None)
+        if value is not None:
+            options[name] = value
+    return validate(options)
+
+
+def settings(options):
+    """The subset of options recorded in the backend manifest."""
+    return {key: options[key] for key in SETTINGS_KEYS}
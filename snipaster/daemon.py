@@ -0,0 +1,437 @@
+"""snipaster-daemon: resident capture service.
+
+Detects the backend once at startup and then serves capture requests over a
+Unix socket, so an F1 press only costs a socket round-trip before the region
+selector appears. The wrapper script falls back to capturing by itself when
+the daemon is not running. On X11, --hotkey makes the daemon grab the key
+itself, select the region in-process and grab it through MIT-SHM, so no
+process is started for the whole capture (see snipaster.hotkey and
+snipaster.xshm; scrot remains the fallback). On X11 the daemon also owns
+the clipboard and encodes only the format a paste asks for (see
+snipaster.clipboard). On Wayland it captures through xdg-desktop-portal on
+a resident D-Bus connection (see snipaster.portal), with the tools as the
+fallback.
+
+Protocol: one request line per connection (``capture``, ``recopy [N]``,
+``ping`` or ``stop``), answered with one line: ``ok [detail]``,
+``cancelled`` or ``error <message>``. ``recopy N`` puts the Nth most recent
+capture back on the clipboard from memory (see snipaster.recent).
+"""
+import argparse
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from snipaster.backend import (
+    apply_preferences,
+    detect_backend,
+    keep_settings,
+    load_or_detect,
+)
+from snipaster.client import check_private_dir, request
+from snipaster.dedup import RecentHashes
+from snipaster.encode import ENCODERS
+from snipaster.library import Library
+from snipaster.pipeline import Pipeline, copy_to_clipboard
+from snipaster.recent import RecentCaptures, from_library
+from snipaster.shot import SCREENSHOT_DIR, CaptureError, take_screenshot
+from snipaster.trace import make_trace, record
+
+
+def socket_path(env=None):
+    """Return the daemon socket path; must match the wrapper script."""
+    env = os.environ if env is None else env
+    runtime_dir = env.get("XDG_RUNTIME_DIR") or f"/tmp/snipaster-{os.getuid()}"
+    return os.path.join(runtime_dir, "snipaster.sock")
+
+
+def daemon_running(path):
+    """Check whether a live daemon is accepting connections at path."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            check_private_dir(os.path.dirname(path) or ".")
+            sock.connect(path)
+        except OSError:
+            return False
+    return True
+
+
+def stop_daemon(path, timeout=5.0):
+    """Ask the daemon at path to exit and wait until it has."""
+    try:
+        request(path, "stop")
+    except OSError:
+        return
+    deadline = time.monotonic() + timeout
+    while daemon_running(path) and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+
+class CaptureHandler(socketserver.StreamRequestHandler):
+    """Handle one client request."""
+
+    def handle(self):
+        command = self.rfile.readline().decode("utf-8", "replace").strip()
+        try:
+            reply = self.server.dispatch(command)
+        except CaptureError as e:
+            reply = f"error {e}"
+        except Exception as e:
+            print(f"Capture failed: {e}", file=sys.stderr)
+            reply = f"error {e}"
+        self.wfile.write(reply.encode("utf-8") + b"\n")
+
+
+class CaptureServer(socketserver.UnixStreamServer):
+    """Unix socket server holding the resolved backend.
+
+    Captures are taken one at a time, whether requested over the socket or
+    by the hotkey listener: a second F1 press waits for the current
+    selection instead of opening a second selector.
+    """
+
+    def __init__(
+        self,
+        path,
+        backend,
+        directory=SCREENSHOT_DIR,
+        archive=None,
+        in_memory=False,
+        library=None,
+    ):
+        self.backend = backend
+        self.library = library
+        self.recent = RecentHashes()
+        self.captures = RecentCaptures()
+        self.directory = directory
+        self.archive = archive
+        self.in_memory = in_memory
+        self.capture_lock = threading.Lock()
+        # MIT-SHM grabber for in-process selections; False once it failed
+        self.grabber = None
+        # X11 clipboard owner; None when the tools are used instead
+        self.clipboard = None
+        # Wayland screenshot portal client; False once it failed or if disabled
+        self.portal = None
+        self.executor = ThreadPoolExecutor(
+            max_workers=4, thread_name_prefix="snipaster"
+        )
+        super().__init__(path, CaptureHandler)
+
+    def pipeline(self):
+        return Pipeline(
+            self.backend,
+            self.executor,
+            self.archive,
+            self.library,
+            self.recent,
+            self.clipboard,
+            self.captures,
+        )
+
+    def shoot(self, select=None):
+        with self.capture_lock:
+            grabber = self.shm_grabber() if select is not None else None
+            return take_screenshot(
+                self.backend,
+                self.directory,
+                self.pipeline(),
+                self.in_memory,
+                select,
+                grabber,
+                self.portal_capture(),
+            )
+
+    def shm_grabber(self):
+        """The MIT-SHM grabber, created on first use; None if unavailable."""
+        if self.grabber is None:
+            from snipaster.xshm import ShmGrabber, XShmError
+
+            try:
+                self.grabber = ShmGrabber()
+            except (XShmError, OSError) as e:
+                print(f"MIT-SHM capture unavailable: {e}", file=sys.stderr)
+                self.grabber = False
+        return self.grabber or None
+
+    def portal_capture(self):
+        """The portal client on Wayland, created on first use; None if unavailable."""
+        if self.backend["session"] != "wayland":
+            return None
+        if self.portal is None:
+            from snipaster.portal import PortalCapture, PortalError
+
+            try:
+                self.portal = PortalCapture()
+            except PortalError as e:
+                print(f"Screenshot portal unavailable: {e}", file=sys.stderr)
+                self.portal = False
+        return self.portal or None
+
+    def hotkey_capture(self, display):
+        """Capture with the in-process selector; called by the hotkey listener."""
+        from snipaster.selection import select_region
+
+        def select(timeline):
+            return select_region(display, lambda: timeline.mark("selector"))
+
+        shot = self.shoot(select)
+        if shot is not None:
+            shot.add_done_callback(lambda shot: self.finish(shot, "hotkey"))
+
+    def finish(self, shot, via):
+        """Log a capture whose stages are all done and append its trace."""
+        failed = log_shot(shot)
+        backend = self.backend
+        if self.clipboard is not None:
+            backend = dict(backend, clipboard="snipaster-daemon")
+        trace = make_trace(
+            backend,
+            via,
+            shot.timeline.as_millis(),
+            "error" if failed else "ok",
+            shot.timeline.wall,
+        )
+        try:
+            record(trace)
+        except OSError as e:
+            print(f"Cannot write the trace log: {e}", file=sys.stderr)
+
+    def recopy(self, argument):
+        """Put the Nth most recent capture back on the clipboard."""
+        try:
+            n = int(argument)
+        except ValueError:
+            return f"error recopy needs a number, not {argument!r}"
+        found = self.captures.get(n)
+        if found is None and self.library is not None:
+            # Older than the in-memory cache; read it back from disk
+            found = from_library(self.library, n)
+        if found is None:
+            return f"error no PNG capture {n} back"
+        path, source = found
+        if self.clipboard is not None:
+            from snipaster.clipboard import ClipboardError
+
+            saved = Future()
+            saved.set_result(path)
+            try:
+                self.clipboard.offer(source, saved)
+                return f"ok {path}"
+            except ClipboardError as e:
+                print(f"Clipboard owner failed: {e}", file=sys.stderr)
+        copy_to_clipboard(self.backend, path, source.png)
+        return f"ok {path}"
+
+    def dispatch(self, command):
+        if command == "ping":
+            return f"ok {self.backend['capture']}"
+        if command == "capture":
+            try:
+                shot = self.shoot()
+            except FileNotFoundError:
+                # A tool moved since startup; re-detect once and retry,
+                # keeping the installer's directory, encoder and retention
+                self.backend = apply_preferences(
+                    keep_settings(detect_backend(), self.backend)
+                )
+                shot = self.shoot()
+            if shot is None:
+                return "cancelled"
+            # Reply as soon as the clipboard is ready; the rest finishes later
+            shot.add_done_callback(lambda shot: self.finish(shot, "daemon"))
+            return f"ok {shot.path}"
+        if command == "recopy" or command.startswith("recopy "):
+            return self.recopy(command[len("recopy") :].strip() or "1")
+        if command == "stop":
+            # shutdown() blocks until serve_forever returns, so call it off-thread
+            threading.Thread(target=self.shutdown).start()
+            return "ok stopping"
+        return f"error unknown command {command!r}"
+
+
+def log_shot(shot):
+    """Report the stage timings of a finished capture; True if a stage failed."""
+    failed = False
+    for future in shot.futures:
+        if future.exception() is not None:
+            failed = True
+            print(f"{shot.path}: {future.exception()}", file=sys.stderr)
+    try:
+        path = shot.saved_path
+    except Exception:
+        path = shot.path
+    print(f"{path}: {shot.timeline.format()}", flush=True)
+    return failed
+
+
+def start_listener(server, hotkey):
+    """Grab hotkey for server; return the listener, or None if that failed."""
+    if server.backend["capture"] not in ("grim", "scrot"):
+        print(
+            f"snipaster-daemon: {server.backend['capture']} cannot capture a "
+            "selected region; not grabbing the hotkey",
+            file=sys.stderr,
+        )
+        return None
+    # python-xlib is only loaded when the listener is wanted
+    from snipaster.hotkey import HotkeyError, HotkeyListener
+
+    try:
+        listener = HotkeyListener(hotkey, server.hotkey_capture)
+        listener.start()
+    except HotkeyError as e:
+        print(f"snipaster-daemon: hotkey {hotkey}: {e}", file=sys.stderr)
+        return None
+    print(f"snipaster-daemon: listening for {hotkey}", flush=True)
+    return listener
+
+
+def start_clipboard_owner(server):
+    """Own the X11 clipboard for server; return the owner, or None."""
+    if server.backend["session"] == "wayland" or not os.environ.get("DISPLAY"):
+        return None
+    # python-xlib is only loaded when the owner can be used
+    from snipaster.clipboard import ClipboardError, ClipboardOwner, available
+
+    if not available():
+        return None
+    try:
+        owner = ClipboardOwner()
+    except ClipboardError as e:
+        print(f"snipaster-daemon: clipboard owner: {e}", file=sys.stderr)
+        return None
+    print("snipaster-daemon: serving the clipboard itself", flush=True)
+    return owner
+
+
+def serve(
+    path,
+    archive=None,
+    in_memory=False,
+    hotkey=None,
+    own_clipboard=True,
+    use_portal=True,
+):
+    """Bind the socket at path and serve until SIGTERM/SIGINT.
+
+    With hotkey (X11 only), also grab that key and capture on each press.
+    With own_clipboard (X11 with python-xlib), serve pastes from the daemon
+    instead of handing each capture to xclip. With use_portal (Wayland with
+    jeepney), capture through xdg-desktop-portal instead of the tools.
+    """
+    directory = os.path.dirname(path) or "."
+    try:
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        check_private_dir(directory)
+    except OSError as e:
+        print(f"snipaster-daemon: refusing to start: {e}", file=sys.stderr)
+        return 1
+    if os.path.exists(path):
+        if daemon_running(path):
+            print(f"snipaster-daemon already running on {path}")
+            return 0
+        os.unlink(path)
+
+    backend = load_or_detect()
+    archive = archive or backend.get("archive")
+    print(
+        f"snipaster-daemon: capture={backend['capture']} "
+        f"clipboard={backend['clipboard']} archive={archive} socket={path}"
+    )
+
+    server = CaptureServer(
+        path,
+        backend,
+        directory=backend.get("directory") or SCREENSHOT_DIR,
+        archive=archive,
+        in_memory=in_memory,
+        library=Library(),
+    )
+    os.chmod(path, 0o600)
+    if own_clipboard:
+        server.clipboard = start_clipboard_owner(server)
+    if not use_portal:
+        server.portal = False
+    listener = start_listener(server, hotkey) if hotkey else None
+
+    def stop(signum, frame):
+        # shutdown() blocks until serve_forever returns, so call it off-thread
+        threading.Thread(target=server.shutdown).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    try:
+        server.serve_forever()
+    finally:
+        if listener is not None:
+            listener.stop()
+        server.server_close()
+        server.executor.shutdown()
+        if server.grabber:
+            server.grabber.close()
+        if server.clipboard is not None:
+            server.clipboard.close()
+        if server.portal:
+            server.portal.close()
+        server.library.close()
+        if os.path.exists(path):
+            os.unlink(path)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="snipaster-daemon", description="Resident Snipaster capture service."
+    )
+    parser.add_argument("--socket", default=socket_path(), help="socket path")
+    parser.add_argument(
+        "--archive",
+        metavar="ENCODER",
+        choices=sorted(ENCODERS),
+        help="re-encode saved captures in the background "
+        "(default: the installer's choice)",
+    )
+    parser.add_argument(
+        "--in-memory",
+        action="store_true",
+        help="stream captures straight to the clipboard and save them afterwards",
+    )
+    parser.add_argument(
+        "--hotkey",
+        metavar="KEY",
+        help="grab KEY (e.g. F1) on X11 and select regions in-process "
+        "instead of relying on xbindkeys (needs python-xlib)",
+    )
+    parser.add_argument(
+        "--no-own-clipboard",
+        dest="own_clipboard",
+        action="store_false",
+        help="copy captures with xclip instead of serving the X11 clipboard "
+        "from the daemon",
+    )
+    parser.add_argument(
+        "--no-portal",
+        dest="use_portal",
+        action="store_false",
+        help="capture with gnome-screenshot or grim on Wayland instead of "
+        "xdg-desktop-portal",
+    )
+    args = parser.parse_args(argv)
+    return serve(
+        args.socket,
+        args.archive,
+        args.in_memory,
+        args.hotkey,
+        args.own_clipboard,
+        args.use_portal,
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
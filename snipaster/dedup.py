@@ -0,0 +1,105 @@
+"""Deduplication of repeated captures.
+
+Pressing F1 again on an unchanged region yields the same pixels. Such a
+capture is stored as a hard link to the earlier file instead of a new copy.
+The hash covers the image header, the chunks that change how the scanlines
+decode (palette, transparency, colour space) and the decompressed
+scanlines, so the same pixels match even when the PNGs were deflated at
+different levels. xxhash is used when installed, BLAKE2 otherwise.
+"""
+import hashlib
+import os
+import threading
+import zlib
+from collections import OrderedDict
+
+from snipaster import png
+from snipaster.naming import ALLOCATOR, link_unique
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+# Ancillary chunks that change the decoded image; two PNGs with the same
+# scanlines but, say, a different PLTE are different captures
+PIXEL_CHUNKS = (b"PLTE", b"tRNS", b"gAMA", b"cHRM", b"sRGB", b"iCCP")
+
+
+def _hasher():
+    if xxhash is not None:
+        return xxhash.xxh3_128()
+    return hashlib.blake2b(digest_size=16)
+
+
+def capture_hash(data):
+    """Content hash of a capture, independent of PNG compression settings."""
+    hasher = _hasher()
+    if data.startswith(png.SIGNATURE):
+        try:
+            inflater = zlib.decompressobj()
+            for kind, payload in png.read_chunks(data):
+                if kind == b"IHDR":
+                    hasher.update(payload)
+                elif kind in PIXEL_CHUNKS:
+                    hasher.update(kind + len(payload).to_bytes(4, "big") + payload)
+                elif kind == b"IDAT":
+                    hasher.update(inflater.decompress(payload))
+            hasher.update(inflater.flush())
+            return hasher.hexdigest()
+        except (png.PNGError, zlib.error):
+            hasher = _hasher()
+    hasher.update(data)
+    return hasher.hexdigest()
+
+
+class RecentHashes:
+    """Bounded LRU map of recent capture hashes to saved paths."""
+
+    def __init__(self, size=64):
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, digest):
+        """Return the saved path for digest, if it is recent and still exists."""
+        with self._lock:
+            path = self._entries.get(digest)
+            if path is None:
+                return None
+            if not os.path.exists(path):
+                del self._entries[digest]
+                return None
+            self._entries.move_to_end(digest)
+            return path
+
+    def add(self, digest, path):
+        with self._lock:
+            self._entries[digest] = path
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+
+def link_duplicate(existing, path, on_disk):
+    """Make path a hard link to existing, keeping existing's extension.
+
+    on_disk says whether the capture tool already wrote path, in which case
+    it is replaced. Returns the linked path, or None when the filesystem
+    cannot hard-link (the caller then stores a normal copy).
+    """
+    directory = os.path.dirname(path)
+    extension = os.path.splitext(existing)[1]
+    target = os.path.splitext(path)[0] + extension
+    try:
+        if on_disk and target == path:
+            tmp_path = ALLOCATOR.temp_path(directory, extension)
+            os.link(existing, tmp_path)
+            os.replace(tmp_path, path)
+            return path
+        target = link_unique(existing, target)
+    except OSError:
+        return None
+    if on_disk:
+        os.unlink(path)
+    return target
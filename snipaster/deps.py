@@ -0,0 +1,117 @@
+"""Batch dependency resolution for the Snipaster installers."""
+import os
+import shutil
+import subprocess
+import time
+from contextlib import contextmanager
+
+# Package name -> command it provides.
+# scrot, xbindkeys, xclip cover X11; gnome-screenshot, wl-clipboard cover Wayland.
+REQUIRED_PACKAGES = {
+    "scrot": "scrot",
+    "xbindkeys": "xbindkeys",
+    "xclip": "xclip",
+    "gnome-screenshot": "gnome-screenshot",
+    "wl-clipboard": "wl-copy",
+}
+
+
+class PhaseTimer:
+    """Record wall-clock durations of named installer phases."""
+
+    def __init__(self):
+        self.timings = {}
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + (
+                time.perf_counter() - start
+            )
+
+    def report(self):
+        """Format the recorded timings as a single line."""
+        return ", ".join(f"{name} {secs:.2f}s" for name, secs in self.timings.items())
+
+
+def dpkg_installed(packages):
+    """Return the subset of packages that dpkg reports as installed."""
+    if not packages or shutil.which("dpkg-query") is None:
+        return set()
+    # dpkg-query exits non-zero when any package is unknown, but still prints
+    # the status of the ones it knows about, so the return code is ignored.
+    result = subprocess.run(
+        ["dpkg-query", "-W", "-f=${Package} ${db:Status-Status}\n", *packages],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+    )
+    installed = set()
+    for line in result.stdout.splitlines():
+        name, _, status = line.partition(" ")
+        if status == "installed":
+            installed.add(name)
+    return installed
+
+
+def probe_packages(packages_map):
+    """Return the packages from packages_map that still need installing.
+
+    Commands are looked up on PATH in-process; only packages whose command is
+    absent are checked against dpkg, all in one query.
+    """
+    unresolved = [
+        pkg for pkg, cmd in packages_map.items() if shutil.which(cmd or pkg) is None
+    ]
+    installed = dpkg_installed(unresolved)
+    return [pkg for pkg in unresolved if pkg not in installed]
+
+
+def sudo_prefix(interactive=True):
+    """Command prefix for running apt-get as root.
+
+    Empty when already root. Non-interactive runs use sudo -n, which fails
+    instead of waiting for a password nobody will type.
+    """
+    if os.geteuid() == 0:
+        return []
+    return ["sudo"] if interactive else ["sudo", "-n"]
+
+
+def install_packages(missing, timer, quiet=True, sudo=("sudo",)):
+    """Install all missing packages with one apt-get update and one install."""
+    output = subprocess.DEVNULL if quiet else None
+    env = dict(os.environ, DEBIAN_FRONTEND="noninteractive")
+    with timer.phase("apt-get update"):
+        subprocess.run(
+            [*sudo, "apt-get", "update"],
+            check=True,
+            stdout=output,
+            stderr=output,
+            env=env,
+        )
+    with timer.phase("apt-get install"):
+        subprocess.run(
+            [*sudo, "apt-get", "install", "-y", *missing],
+            check=True,
+            stdout=output,
+            stderr=output,
+            env=env,
+        )
+
+
+def resolve(packages_map=REQUIRED_PACKAGES, timer=None, quiet=True):
+    """Probe every package in one pass and install the missing ones together.
+
+    Returns the list of packages that were installed. Raises
+    subprocess.CalledProcessError if apt-get fails.
+    """
+    timer = timer if timer is not None else PhaseTimer()
+    with timer.phase("probe"):
+        missing = probe_packages(packages_map)
+    if missing:
+        install_packages(missing, timer, quiet=quiet)
+    return missing
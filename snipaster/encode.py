@@ -0,0 +1,296 @@
+"""Pluggable image encoders for the capture pipeline.
+
+Capture tools hand over PNG bytes, in-process backends hand over raw pixels;
+an ImageSource wraps either and converts lazily, so an encoder only pays for
+the conversion it needs. The clipboard path uses a fast, low-compression PNG;
+a slower archival encoder can re-encode the saved file in the background.
+
+Encoders are registered by name with register_encoder(). Pillow is optional
+and only needed for WebP (it also speeds up PNG decoding when present); QOI
+needs the qoi package, whose C encoder is orders of magnitude faster than
+looping over pixels in Python.
+"""
+import argparse
+import io
+import os
+import struct
+import sys
+import threading
+
+from snipaster import png
+from snipaster.fsutil import atomic_write
+from snipaster.naming import write_unique
+
+# PNG flavour requested from capture tools for the clipboard path.
+CLIPBOARD_ENCODERS = ("png", "png-fast")
+
+
+def pillow():
+    """Return the PIL.Image module, or None when Pillow is not installed."""
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    return Image
+
+
+class RawImage:
+    """Packed 8-bit pixels: grey, grey+alpha, RGB or RGBA."""
+
+    def __init__(self, width, height, channels, pixels):
+        self.width = width
+        self.height = height
+        self.channels = channels
+        self.pixels = pixels
+
+
+class ImageSource:
+    """An image held as PNG bytes, raw pixels or both, converted on demand.
+
+    Safe to share between threads (the save stage and a clipboard paste,
+    say); each conversion runs at most once.
+    """
+
+    def __init__(self, png_data=None, raw=None):
+        if png_data is None and raw is None:
+            raise ValueError("ImageSource needs PNG data or raw pixels")
+        self._png = png_data
+        self._raw = raw
+        self._lock = threading.Lock()
+
+    @property
+    def has_raw(self):
+        return self._raw is not None
+
+    @property
+    def png(self):
+        with self._lock:
+            if self._png is None:
+                raw = self._raw
+                self._png = png.encode(
+                    raw.width, raw.height, raw.channels, raw.pixels, level=1
+                )
+            return self._png
+
+    @property
+    def raw(self):
+        with self._lock:
+            if self._raw is None:
+                self._raw = self._decode()
+            return self._raw
+
+    def _decode(self):
+        Image = pillow()
+        if Image is None:
+            return RawImage(*png.decode(self._png))
+        with Image.open(io.BytesIO(self._png)) as image:
+            if image.mode not in ("L", "LA", "RGB", "RGBA"):
+                image = image.convert("RGBA")
+            return RawImage(image.width, image.height, len(image.mode), image.tobytes())
+
+
+class Encoder:
+    """A named image encoder producing files with a given extension."""
+
+    def __init__(self, name, extension, encode, available=None, description=""):
+        self.name = name
+        self.extension = extension
+        self.encode = encode
+        self.available = available or (lambda: True)
+        self.description = description
+
+
+ENCODERS = {}
+
+
+def register_encoder(name, extension, encode, available=None, description=""):
+    """Make encode(source) -> bytes selectable under name."""
+    ENCODERS[name] = Encoder(name, extension, encode, available, description)
+
+
+def get_encoder(name):
+    """Look up an available encoder, raising ValueError otherwise."""
+    encoder = ENCODERS.get(name)
+    if encoder is None:
+        raise ValueError(f"unknown encoder {name!r}")
+    if not encoder.available():
+        raise ValueError(f"encoder {name!r} is not available on this system")
+    return encoder
+
+
+def encode_png(source):
+    return source.png
+
+
+def encode_png_fast(source):
+    if source.has_raw:
+        raw = source.raw
+        return png.encode(raw.width, raw.height, raw.channels, raw.pixels, level=1)
+    return png.recompress(source.png, 1)
+
+
+def encode_png_max(source):
+    return png.recompress(source.png, 9)
+
+
+def encode_bmp(source):
+    """Encode as an uncompressed 24-bit BMP, the form raw-bitmap pastes take.
+
+    Not registered as an archival encoder; used for the image/bmp
+    clipboard target, straight from the raw pixels.
+    """
+    raw = source.raw
+    channels = raw.channels
+    pixels = raw.pixels
+    count = raw.width * raw.height
+    bgr = bytearray(count * 3)
+    if channels < 3:
+        grey = pixels[0::channels]
+        for offset in range(3):
+            bgr[offset::3] = grey
+    else:
+        for offset, channel in enumerate((2, 1, 0)):
+            bgr[offset::3] = pixels[channel::channels]
+    # Rows are stored bottom-up, each padded to a multiple of four bytes
+    stride = raw.width * 3
+    padding = b"\x00" * (-stride % 4)
+    rows = [
+        bgr[y * stride : (y + 1) * stride] + padding
+        for y in range(raw.height - 1, -1, -1)
+    ]
+    body = b"".join(rows)
+    header = struct.pack(
+        "<2sIHHIIiiHHIIiiII",
+        b"BM",
+        54 + len(body),
+        0,
+        0,
+        54,
+        40,
+        raw.width,
+        raw.height,
+        1,
+        24,
+        0,
+        len(body),
+        2835,
+        2835,
+        0,
+        0,
+    )
+    return header + body
+
+
+def encode_webp(source):
+    Image = pillow()
+    raw = source.raw
+    mode = {1: "L", 2: "LA", 3: "RGB", 4: "RGBA"}[raw.channels]
+    image = Image.frombytes(mode, (raw.width, raw.height), raw.pixels)
+    if mode in ("L", "LA"):
+        image = image.convert("RGBA" if mode == "LA" else "RGB")
+    out = io.BytesIO()
+    image.save(out, format="WEBP", lossless=True, method=4)
+    return out.getvalue()
+
+
+def webp_available():
+    Image = pillow()
+    if Image is None:
+        return False
+    from PIL import features
+
+    return features.check("webp")
+
+
+def qoi_module():
+    """Return the qoi module (a C encoder), or None when it is not installed."""
+    try:
+        import qoi
+    except ImportError:
+        return None
+    return qoi
+
+
+def qoi_available():
+    # A pure-Python QOI encoder takes seconds per screen; only offer the C one
+    return qoi_module() is not None
+
+
+def encode_qoi(source):
+    """Encode as QOI (https://qoiformat.org), lossless and simple to decode."""
+    import numpy
+
+    qoi = qoi_module()
+    raw = source.raw
+    pixels = numpy.frombuffer(raw.pixels, numpy.uint8).reshape(
+        raw.height, raw.width, raw.channels
+    )
+    if raw.channels < 3:
+        # Expand grey(+alpha) to RGB(A)
+        rgb = numpy.repeat(pixels[:, :, :1], 3, axis=2)
+        pixels = numpy.concatenate((rgb, pixels[:, :, 1:]), axis=2)
+    pixels = numpy.ascontiguousarray(pixels)
+    return qoi.encode(pixels, colorspace=qoi.QOIColorSpace.SRGB)
+
+
+register_encoder("png", ".png", encode_png, description="as produced by the capture")
+register_encoder(
+    "png-fast", ".png", encode_png_fast, description="zlib level 1, fastest PNG"
+)
+register_encoder(
+    "png-max", ".png", encode_png_max, description="zlib level 9, lossless re-deflate"
+)
+register_encoder(
+    "webp", ".webp", encode_webp, webp_available, "lossless WebP (needs Pillow)"
+)
+register_encoder(
+    "qoi", ".qoi", encode_qoi, qoi_available, "lossless QOI (needs the qoi package)"
+)
+
+
+def archive_file(path, name):
+    """Re-encode the PNG at path with encoder name, replacing it.
+
+    Returns the path of the archived file, which has the encoder's extension.
+    """
+    encoder = get_encoder(name)
+    with open(path, "rb") as f:
+        data = encoder.encode(ImageSource(f.read()))
+    target = os.path.splitext(path)[0] + encoder.extension
+    mode = os.stat(path).st_mode & 0o777
+    if target == path:
+        atomic_write(path, data, mode)
+        return path
+    target = write_unique(target, data, mode)
+    os.unlink(path)
+    return target
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-encode Snipaster captures.")
+    parser.add_argument("--list", action="store_true", help="list encoders")
+    parser.add_argument("--to", metavar="ENCODER", help="archival encoder to use")
+    parser.add_argument("files", nargs="*", help="PNG files to re-encode in place")
+    args = parser.parse_args(argv)
+
+    if args.list or not args.to:
+        for encoder in ENCODERS.values():
+            state = "" if encoder.available() else " (unavailable)"
+            print(f"{encoder.name:10} {encoder.description}{state}")
+        return 0
+    try:
+        get_encoder(args.to)
+    except ValueError as e:
+        parser.error(str(e))
+    status = 0
+    for path in args.files:
+        try:
+            print(archive_file(path, args.to))
+        except (OSError, png.PNGError) as e:
+            print(f"{path}: {e}", file=sys.stderr)
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
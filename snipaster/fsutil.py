@@ -0,0 +1,24 @@
+"""Small filesystem helpers shared by the installers and the capture path."""
+import os
+import tempfile
+
+
+def atomic_write(path, content, mode=None):
+    """Write content to path via a temp file and rename.
+
+    Readers never observe a half-written file. content may be str or bytes.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    data = content.encode("utf-8") if isinstance(content, str) else content
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".snipaster-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        if mode is not None:
+            os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
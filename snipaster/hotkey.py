@@ -0,0 +1,158 @@
+"""Resident X11 hotkey listener (needs python-xlib).
+
+With xbindkeys, an F1 press forks /bin/sh, which runs the snipaster_shot
+bash script, which runs scrot -s: three process launches before the
+selection cursor appears. snipaster-daemon --hotkey instead grabs the key on
+the root window itself and, on a press, opens the region selector
+(snipaster.selection) in-process on the same X connection.
+"""
+import re
+import select
+import sys
+import threading
+
+try:
+    from Xlib import XK, X, display, error
+except ImportError:
+    X = None
+
+# GTK accelerator modifier -> X modifier mask name.
+MODIFIERS = {
+    "control": "ControlMask",
+    "ctrl": "ControlMask",
+    "primary": "ControlMask",
+    "shift": "ShiftMask",
+    "alt": "Mod1Mask",
+    "mod1": "Mod1Mask",
+    "super": "Mod4Mask",
+    "mod4": "Mod4Mask",
+}
+# Caps Lock and Num Lock (usually Mod2) must not stop the hotkey from firing,
+# so the key is grabbed once for each combination of them.
+LOCK_MASKS = ("LockMask", "Mod2Mask")
+
+
+class HotkeyError(Exception):
+    """Raised when the hotkey cannot be parsed or grabbed."""
+
+
+def available():
+    """Whether python-xlib is installed."""
+    return X is not None
+
+
+def parse_accelerator(binding):
+    """Split a GTK accelerator into (keysym, modifier mask)."""
+    names = re.findall(r"<([^>]+)>", binding)
+    key = re.sub(r"<[^>]+>", "", binding)
+    mask = 0
+    for name in names:
+        if name.lower() not in MODIFIERS:
+            raise HotkeyError(f"unknown modifier <{name}> in {binding!r}")
+        mask |= getattr(X, MODIFIERS[name.lower()])
+    keysym = XK.string_to_keysym(key)
+    if not keysym:
+        raise HotkeyError(f"unknown key {key!r} in {binding!r}")
+    return keysym, mask
+
+
+def lock_variants():
+    """Every combination of the ignored lock modifiers, as masks."""
+    masks = [getattr(X, name) for name in LOCK_MASKS]
+    variants = [0]
+    for mask in masks:
+        variants += [variant | mask for variant in variants]
+    return variants
+
+
+class HotkeyListener:
+    """Grab binding on the root window and call on_press(display) per press.
+
+    on_press runs on the listener's own thread with its X connection, so it
+    can take over the pointer and keyboard (see select_region) without
+    racing the event loop; presses made meanwhile are dropped.
+    """
+
+    def __init__(self, binding, on_press, display_name=None):
+        if X is None:
+            raise HotkeyError("the hotkey listener needs python-xlib")
+        self.binding = binding
+        self.on_press = on_press
+        try:
+            self.display = display.Display(display_name)
+        except (error.DisplayError, error.ConnectionClosedError) as e:
+            raise HotkeyError(f"cannot open display: {e}")
+        self.root = self.display.screen().root
+        keysym, self.mask = parse_accelerator(binding)
+        self.keycode = self.display.keysym_to_keycode(keysym)
+        if not self.keycode:
+            raise HotkeyError(f"no key produces {binding!r} on this keyboard")
+        self._stop = threading.Event()
+        self._thread = None
+
+    def grab(self):
+        """Grab the hotkey; raise HotkeyError if another client holds it."""
+        catcher = error.CatchError(error.BadAccess)
+        for extra in lock_variants():
+            self.root.grab_key(
+                self.keycode,
+                self.mask | extra,
+                False,
+                X.GrabModeAsync,
+                X.GrabModeAsync,
+                onerror=catcher,
+            )
+        self.display.sync()
+        if catcher.get_error():
+            self.ungrab()
+            raise HotkeyError(
+                f"{self.binding} is already grabbed by another client "
+                "(is xbindkeys still bound to it?)"
+            )
+
+    def ungrab(self):
+        for extra in lock_variants():
+            self.root.ungrab_key(self.keycode, self.mask | extra)
+        self.display.sync()
+
+    def is_press(self, event):
+        state = event.state & ~sum(getattr(X, name) for name in LOCK_MASKS)
+        return (
+            event.type == X.KeyPress
+            and event.detail == self.keycode
+            and state == self.mask
+        )
+
+    def run(self):
+        """Dispatch presses until stop() is called."""
+        fd = self.display.fileno()
+        while not self._stop.is_set():
+            if not self.display.pending_events():
+                # Wake up now and then to notice stop()
+                select.select([fd], [], [], 0.5)
+                if not self.display.pending_events():
+                    continue
+            event = self.display.next_event()
+            if not self.is_press(event):
+                continue
+            try:
+                self.on_press(self.display)
+            except Exception as e:
+                print(f"Hotkey capture failed: {e}", file=sys.stderr)
+            # Drop presses queued while the capture ran
+            while self.display.pending_events():
+                self.display.next_event()
+
+    def start(self):
+        """Grab the hotkey and run the listener on a background thread."""
+        self.grab()
+        self._thread = threading.Thread(
+            target=self.run, name="snipaster-hotkey", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.display.close()
@@ -0,0 +1,435 @@
+"""The Snipaster installation as a graph of timed steps.
+
+Steps compare what they would write with what is already there (see
+snipaster.plan) and only touch files, settings and processes that differ,
+so re-running the installer on a configured machine changes nothing.
+"""
+import hashlib
+import importlib.util
+import json
+import os
+import queue
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+from snipaster import xbindkeys
+from snipaster.backend import (
+    MANIFEST_PATH,
+    apply_preferences,
+    detect_backend,
+    env_path,
+    render_env,
+    render_manifest,
+)
+from snipaster.config import settings as manifest_settings
+from snipaster.daemon import daemon_running, socket_path, stop_daemon
+from snipaster.deps import REQUIRED_PACKAGES, install_packages, sudo_prefix
+from snipaster.keybinding import apply_keybinding, read_keybindings, xbindkeys_keys
+from snipaster.library import LIBRARY_PATH, Library
+from snipaster.plan import Plan
+from snipaster.shot import SCREENSHOT_DIR
+from snipaster.steps import StepGraph
+from snipaster.wrapper import (
+    SNIPASTER_HOME,
+    daemon_arguments,
+    daemon_autostart,
+    launcher_script,
+    wrapper_script,
+)
+
+AUTOSTART_DIR = os.path.expanduser("~/.config/autostart")
+BIN_DIR = os.path.expanduser("~/.local/bin")
+SCRIPT_PATH = os.path.join(BIN_DIR, "snipaster_shot")
+DAEMON_LAUNCHER = os.path.join(BIN_DIR, "snipaster-daemon")
+SNIPASTER_LAUNCHER = os.path.join(BIN_DIR, "snipaster")
+DAEMON_AUTOSTART = os.path.join(AUTOSTART_DIR, "snipaster-daemon.desktop")
+# Animation levels from richest to cheapest; "none" skips the UI entirely.
+RENDER_LEVELS = ("full", "lite", "static")
+XBINDKEYS_CONFIG = os.path.expanduser("~/.xbindkeysrc")
+XBINDKEYS_AUTOSTART_PATH = os.path.join(AUTOSTART_DIR, "xbindkeys.desktop")
+XBINDKEYS_AUTOSTART = """
+[Desktop Entry]
+Type=Application
+Name=xbindkeys
+Exec=xbindkeys
+Terminal=false
+Hidden=false
+NoDisplay=false
+X-GNOME-Autostart-enabled=true
+"""
+# dconf rewrites this file on every settings change, so an unchanged stat
+# means the GNOME keybinding cannot have changed either.
+DCONF_DB = os.path.join(
+    os.environ.get("XDG_CONFIG_HOME") or os.path.expanduser("~/.config"),
+    "dconf",
+    "user",
+)
+# Modules whose code decides what the installer writes.
+FINGERPRINT_SOURCES = (
+    "backend.py",
+    "config.py",
+    "install.py",
+    "wrapper.py",
+    "xbindkeys.py",
+)
+
+
+def is_gnome_wayland(env=None):
+    """Whether the current session is GNOME on Wayland."""
+    env = os.environ if env is None else env
+    return (
+        "wayland" in env.get("XDG_SESSION_TYPE", "").lower()
+        and "gnome" in env.get("XDG_CURRENT_DESKTOP", "").lower()
+    )
+
+
+def start_daemon(launcher, args=()):
+    """Start snipaster-daemon detached from this process."""
+    subprocess.Popen(
+        [launcher, *args],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+def configure_gnome(plan, current, hotkey="F1"):
+    """Bind hotkey through GNOME settings and retire xbindkeys.
+
+    current is the read_keybindings() result, read ahead of time, or
+    "cached" when the state cache shows the binding is already in place.
+    """
+    if current == "cached":
+        status = "unchanged"
+    else:
+        status = apply_keybinding(current, SCRIPT_PATH, hotkey, dry_run=plan.dry_run)
+        if status is None:
+            raise RuntimeError("cannot read GNOME keybindings")
+        if status != "unchanged":
+            plan.note(f"set GNOME keybinding {hotkey}")
+        plan.record_key("gnome-keybinding", f"{SCRIPT_PATH}\n{hotkey}", DCONF_DB)
+    text, mode = read_xbindkeys_config()
+    if text is not None:
+        plan.sync_file(XBINDKEYS_CONFIG, xbindkeys.remove(text), mode)
+    if plan.remove_file(XBINDKEYS_AUTOSTART_PATH):
+        plan.note("stop xbindkeys")
+        if not plan.dry_run:
+            xbindkeys.stop()
+    return f"GNOME keybinding {status}"
+
+
+def read_xbindkeys_config():
+    """Return the current ~/.xbindkeysrc text and mode, or (None, 0o644)."""
+    try:
+        with open(XBINDKEYS_CONFIG) as f:
+            return f.read(), os.fstat(f.fileno()).st_mode & 0o777
+    except FileNotFoundError:
+        return None, 0o644
+
+
+def configure_xbindkeys(plan, hotkey="F1"):
+    """Bind hotkey through xbindkeys and start it with the session.
+
+    Only the managed Snipaster block of ~/.xbindkeysrc is rewritten, and a
+    running xbindkeys is told to reload (SIGHUP) only when that block changed.
+    """
+    text, mode = read_xbindkeys_config()
+    content = xbindkeys.merge(text or "", SCRIPT_PATH, xbindkeys_keys(hotkey))
+    changed = plan.sync_file(XBINDKEYS_CONFIG, content, mode)
+    plan.sync_file(XBINDKEYS_AUTOSTART_PATH, XBINDKEYS_AUTOSTART)
+    if not changed:
+        return "xbindkeys unchanged"
+    plan.note("reload xbindkeys")
+    if not plan.dry_run:
+        xbindkeys.reload()
+    return f"xbindkeys configured in {XBINDKEYS_CONFIG}"
+
+
+def configure_listener(plan):
+    """Leave the hotkey to snipaster-daemon's listener and unbind it in xbindkeys."""
+    if importlib.util.find_spec("Xlib") is None:
+        raise RuntimeError(
+            "the hotkey listener needs python-xlib (apt install python3-xlib)"
+        )
+    text, mode = read_xbindkeys_config()
+    if text is None or not plan.sync_file(
+        XBINDKEYS_CONFIG, xbindkeys.remove(text), mode
+    ):
+        return "grabbed by snipaster-daemon"
+    # xbindkeys must let go of the key before the daemon can grab it
+    plan.note("reload xbindkeys")
+    if not plan.dry_run:
+        xbindkeys.reload(start=False)
+    return "grabbed by snipaster-daemon (xbindkeys binding removed)"
+
+
+def install_steps(missing, timer, options, quiet=True, interactive=True, plan=None):
+    """Build the installation graph for options (see snipaster.config).
+
+    missing is the list of packages probe_packages() reported; apt-get only
+    runs when it is non-empty. Everything that does not need the new
+    packages overlaps with apt, which holds the only serialized resource.
+    Non-interactive runs never wait for a sudo password. With a dry-run
+    plan, the steps only list what they would change in plan.changes.
+    """
+    plan = plan if plan is not None else Plan()
+    directory = options["directory"] or SCREENSHOT_DIR
+    graph = StepGraph()
+    gnome = {}
+    gnome_wayland = is_gnome_wayland()
+    listener = options["listener"] and not gnome_wayland
+
+    def packages():
+        if not missing:
+            return "all packages present"
+        plan.note(f"install packages {', '.join(missing)}")
+        if plan.dry_run:
+            return f"would install {', '.join(missing)}"
+        if not options["install_packages"]:
+            raise RuntimeError(f"missing packages: {', '.join(missing)}")
+        install_packages(missing, timer, quiet=quiet, sudo=sudo_prefix(interactive))
+        return f"installed {', '.join(missing)}"
+
+    def directories():
+        for path in (directory, AUTOSTART_DIR, BIN_DIR):
+            if not os.path.isdir(path):
+                plan.note(f"create {path}")
+                if not plan.dry_run:
+                    os.makedirs(path, exist_ok=True)
+
+    def scripts():
+        changed = plan.sync_file(SCRIPT_PATH, wrapper_script(), 0o755)
+        changed |= plan.sync_file(
+            DAEMON_LAUNCHER, launcher_script("snipaster.daemon"), 0o755
+        )
+        changed |= plan.sync_file(
+            SNIPASTER_LAUNCHER, launcher_script("snipaster"), 0o755
+        )
+        return "updated" if changed else "unchanged"
+
+    def daemon():
+        if not options["daemon"]:
+            plan.remove_file(DAEMON_AUTOSTART)
+            return "not enabled"
+        hotkey = options["hotkey"] if listener else None
+        changed = plan.sync_file(
+            DAEMON_AUTOSTART, daemon_autostart(DAEMON_LAUNCHER, hotkey)
+        )
+        running = daemon_running(socket_path())
+        if running and not changed:
+            return "already running"
+        # A running daemon keeps its old arguments until restarted
+        plan.note(f"{'restart' if running else 'start'} snipaster-daemon")
+        if not plan.dry_run:
+            if running:
+                stop_daemon(socket_path())
+            start_daemon(DAEMON_LAUNCHER, daemon_arguments(hotkey))
+        return "restarted" if running else "started"
+
+    def manifest():
+        backend = detect_backend()
+        backend.update(manifest_settings(options))
+        apply_preferences(backend)
+        changed = plan.sync_file(MANIFEST_PATH, render_manifest(backend))
+        changed |= plan.sync_file(env_path(MANIFEST_PATH), render_env(backend))
+        state = "updated" if changed else "unchanged"
+        tools = f"capture {backend['capture']}, clipboard {backend['clipboard']}"
+        return f"{tools} ({state})"
+
+    def library():
+        if plan.dry_run:
+            return "not scanned in plan mode"
+        if plan.scan_in_sync(directory, LIBRARY_PATH):
+            return "index up to date"
+        library = Library()
+        mtimes = {}
+        try:
+            added, _ = library.scan(directory, mtimes)
+        finally:
+            library.close()
+        plan.record_scan(directory, mtimes)
+        return f"indexed {added} screenshots"
+
+    def read_gnome():
+        value = f"{SCRIPT_PATH}\n{options['hotkey']}"
+        if plan.key_in_sync("gnome-keybinding", value, DCONF_DB):
+            gnome["current"] = "cached"
+        else:
+            gnome["current"] = read_keybindings()
+
+    label = f"Installing {', '.join(missing)}..." if missing else None
+    graph.add(
+        "packages",
+        packages,
+        label=label or "Checking system packages...",
+        resources=("apt",),
+    )
+    graph.add("directories", directories, label="Configuring directories...")
+    graph.add("scripts", scripts, ["directories"], label="Creating wrapper script...")
+    # The manifest records which tools exist, so it waits for apt.
+    graph.add(
+        "manifest",
+        manifest,
+        ["packages", "directories"],
+        label="Detecting session type...",
+    )
+    if gnome_wayland:
+        graph.add("gsettings", read_gnome, label="Reading GNOME keybindings...")
+        graph.add(
+            "keybinding",
+            lambda: configure_gnome(plan, gnome["current"], options["hotkey"]),
+            ["scripts", "gsettings"],
+            label="Configuring GNOME Wayland...",
+        )
+    elif listener:
+        graph.add(
+            "keybinding",
+            lambda: configure_listener(plan),
+            label="Configuring the hotkey listener...",
+        )
+    else:
+        graph.add(
+            "keybinding",
+            lambda: configure_xbindkeys(plan, options["hotkey"]),
+            ["packages", "scripts"],
+            label="Configuring X11/Other...",
+        )
+    # The listener can only grab the hotkey once xbindkeys has released it
+    graph.add(
+        "daemon",
+        daemon,
+        ["scripts", "manifest"] + (["keybinding"] if listener else []),
+        label="Configuring snipaster-daemon...",
+    )
+    graph.add("library", library, ["directories"], label="Indexing screenshots...")
+    return graph
+
+
+def run_installation(graph, events):
+    """Run the installation steps, posting progress events to the queue.
+
+    Events are ("status", message), ("progress", fraction) and, last,
+    ("done", success, message).
+    """
+    total = max(1, len(graph.steps))
+    finished = []
+    lock = threading.Lock()
+
+    def on_event(kind, step):
+        if kind == "start":
+            events.put(("status", step.label))
+            return
+        with lock:
+            finished.append(step.name)
+            fraction = len(finished) / total
+        events.put(("progress", fraction))
+        if kind == "failed":
+            events.put(("status", f"Error in {step.name}: {step.error}"))
+
+    try:
+        success = graph.run(on_event)
+    except Exception as e:
+        events.put(("done", False, f"Error: {e}"))
+        return
+    if success:
+        events.put(("done", True, "Finalizing setup..."))
+    else:
+        failed = ", ".join(step.name for step in graph.failures()) or "a step"
+        events.put(("done", False, f"{failed} failed"))
+
+
+class InstallProgress:
+    """The UI's view of the installation, fed from the worker's event queue."""
+
+    def __init__(self, events):
+        self.events = events
+        self.message = "Initializing..."
+        self.fraction = 0.0
+        self.outcome = None
+        self.started = time.monotonic()
+
+    def _apply(self, event):
+        kind, *data = event
+        if kind == "status":
+            self.message = data[0]
+        elif kind == "progress":
+            self.fraction = data[0]
+        elif kind == "done":
+            self.outcome = (data[0], data[1])
+            self.message = data[1]
+            self.fraction = 1.0
+
+    def drain(self):
+        """Apply every queued event; return True if anything changed."""
+        changed = False
+        while True:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                return changed
+            self._apply(event)
+            changed = True
+
+    def wait(self, timeout=None):
+        """Block until the next event arrives and apply it."""
+        try:
+            self._apply(self.events.get(timeout=timeout))
+        except queue.Empty:
+            return False
+        return True
+
+
+def choose_render(requested, stream=None, env=None):
+    """Resolve --render auto to full, lite or none for this terminal."""
+    if requested != "auto":
+        return requested
+    stream = sys.stdout if stream is None else stream
+    env = os.environ if env is None else env
+    if not stream.isatty() or env.get("TERM", "dumb") == "dumb":
+        return "none"
+    if any(env.get(name) for name in ("SSH_CONNECTION", "SSH_CLIENT", "SSH_TTY")):
+        return "lite"
+    return "full"
+
+
+def fingerprint(options, env=None):
+    """Hash everything an install depends on.
+
+    That is the options, the session, the interpreter and checkout the
+    generated scripts point at, the size and mtime of the modules that
+    render the installed files, and where each required tool is on PATH, so
+    a removed package makes the host diverge.
+    """
+    env = os.environ if env is None else env
+    sources = []
+    for name in FINGERPRINT_SOURCES:
+        st = os.stat(os.path.join(SNIPASTER_HOME, "snipaster", name))
+        sources.append((name, st.st_size, st.st_mtime_ns))
+    state = {
+        "options": options,
+        "session": env.get("XDG_SESSION_TYPE", ""),
+        "desktop": env.get("XDG_CURRENT_DESKTOP", ""),
+        "python": sys.executable,
+        "home": SNIPASTER_HOME,
+        "sources": sources,
+        "tools": {
+            package: shutil.which(command, path=env.get("PATH"))
+            for package, command in REQUIRED_PACKAGES.items()
+        },
+    }
+    data = json.dumps(state, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+def converged(options, plan=None):
+    """Whether the last install used the same inputs and nothing drifted since."""
+    plan = plan if plan is not None else Plan()
+    return plan.converged(fingerprint(options))
+
+
+def record_install(options, plan):
+    """Save the plan's state cache, marking options as installed."""
+    plan.save(fingerprint(options))
@@ -0,0 +1,204 @@
+"""GNOME custom keybinding registration.
+
+The existing custom bindings are read with one ``dconf dump`` and the
+Snipaster entry is written with one ``dconf load``, reusing the slot of an
+earlier install instead of appending a new ``customN`` each time. Nothing is
+written when the binding is already in place. Without the dconf CLI the same
+logic runs through gsettings, at the cost of a few more calls.
+"""
+import ast
+import configparser
+import re
+import shutil
+import subprocess
+
+SCHEMA = "org.gnome.settings-daemon.plugins.media-keys"
+KEY = "custom-keybindings"
+DCONF_DIR = "/org/gnome/settings-daemon/plugins/media-keys/"
+PATH_BASE = DCONF_DIR + "custom-keybindings/custom"
+# GTK accelerator modifier -> xbindkeys modifier.
+XBINDKEYS_MODIFIERS = {
+    "control": "Control",
+    "ctrl": "Control",
+    "primary": "Control",
+    "shift": "Shift",
+    "alt": "Alt",
+    "mod1": "Alt",
+    "super": "Mod4",
+    "mod4": "Mod4",
+}
+
+
+def parse_gvariant(text):
+    """Parse the GVariant text of a string or string list."""
+    text = text.strip()
+    if text.startswith("@as "):
+        text = text[4:]
+    if not text:
+        return None
+    return ast.literal_eval(text)
+
+
+def format_gvariant(value):
+    """Format a str or list of str as GVariant text."""
+    if isinstance(value, str):
+        return "'" + value.replace("\\", "\\\\").replace("'", "\\'") + "'"
+    return "[" + ", ".join(format_gvariant(item) for item in value) + "]"
+
+
+def read_dconf():
+    """Return (binding paths, {path: {name, command, binding}}) in one call."""
+    dump = subprocess.run(
+        ["dconf", "dump", DCONF_DIR],
+        check=True,
+        stdout=subprocess.PIPE,
+        text=True,
+    ).stdout
+    parser = configparser.ConfigParser(interpolation=None)
+    parser.optionxform = str
+    parser.read_string(dump)
+
+    paths = []
+    if parser.has_option("/", KEY):
+        paths = parse_gvariant(parser.get("/", KEY)) or []
+    entries = {}
+    for section in parser.sections():
+        if section.startswith("custom-keybindings/"):
+            path = DCONF_DIR + section + "/"
+            entries[path] = {
+                key: parse_gvariant(value) for key, value in parser.items(section)
+            }
+    return paths, entries
+
+
+def read_gsettings():
+    """gsettings fallback for read_dconf(); one call per existing binding."""
+    current = subprocess.check_output(["gsettings", "get", SCHEMA, KEY], text=True)
+    paths = parse_gvariant(current) or []
+    entries = {}
+    for path in paths:
+        rel_schema = f"{SCHEMA}.custom-keybinding:{path}"
+        entries[path] = {
+            key: parse_gvariant(
+                subprocess.check_output(
+                    ["gsettings", "get", rel_schema, key], text=True
+                )
+            )
+            for key in ("name", "command", "binding")
+        }
+    return paths, entries
+
+
+def plan(paths, entries, command, binding, name):
+    """Work out the target slot and what has to change.
+
+    Returns (slot, new path list or None if unchanged, values to write,
+    stale Snipaster slots to drop).
+    """
+    ours = [
+        path
+        for path in paths
+        if entries.get(path, {}).get("name") == name
+        or entries.get(path, {}).get("command") == command
+    ]
+    if ours:
+        slot, stale = ours[0], ours[1:]
+    else:
+        idx = 0
+        while f"{PATH_BASE}{idx}/" in paths or f"{PATH_BASE}{idx}/" in entries:
+            idx += 1
+        slot, stale = f"{PATH_BASE}{idx}/", []
+
+    new_paths = [path for path in paths if path not in stale]
+    if slot not in new_paths:
+        new_paths.append(slot)
+    if new_paths == paths:
+        new_paths = None
+
+    wanted = {"name": name, "command": command, "binding": binding}
+    current = entries.get(slot, {})
+    values = {key: value for key, value in wanted.items() if current.get(key) != value}
+    return slot, new_paths, values, stale
+
+
+def write_dconf(slot, new_paths, values, stale):
+    """Apply a plan with a single dconf load (plus a reset per stale slot)."""
+    lines = []
+    if new_paths is not None:
+        lines += ["[/]", f"{KEY}={format_gvariant(new_paths)}", ""]
+    if values:
+        lines.append(f"[{slot[len(DCONF_DIR):].rstrip('/')}]")
+        lines += [f"{key}={format_gvariant(value)}" for key, value in values.items()]
+    subprocess.run(
+        ["dconf", "load", DCONF_DIR],
+        input="\n".join(lines) + "\n",
+        text=True,
+        check=True,
+    )
+    for path in stale:
+        subprocess.run(["dconf", "reset", "-f", path], check=True)
+
+
+def write_gsettings(slot, new_paths, values, stale):
+    """gsettings fallback for write_dconf(); only changed keys are set."""
+    if new_paths is not None:
+        subprocess.run(
+            ["gsettings", "set", SCHEMA, KEY, format_gvariant(new_paths)], check=True
+        )
+    rel_schema = f"{SCHEMA}.custom-keybinding:{slot}"
+    for key, value in values.items():
+        subprocess.run(
+            ["gsettings", "set", rel_schema, key, format_gvariant(value)], check=True
+        )
+    for path in stale:
+        subprocess.run(
+            [
+                "gsettings",
+                "reset-recursively",
+                f"{SCHEMA}.custom-keybinding:{path}",
+            ],
+            check=True,
+        )
+
+
+def read_keybindings():
+    """Read the current custom bindings.
+
+    Returns (use_dconf, paths, entries), or None when the GNOME settings
+    cannot be read.
+    """
+    use_dconf = shutil.which("dconf") is not None
+    try:
+        paths, entries = read_dconf() if use_dconf else read_gsettings()
+    except (OSError, subprocess.CalledProcessError, ValueError, SyntaxError):
+        return None
+    return use_dconf, paths, entries
+
+
+def apply_keybinding(current, command, binding, name="Snipaster", dry_run=False):
+    """Write the Snipaster binding against a read_keybindings() result.
+
+    Returns "unchanged", "updated" or "created", or None when current is
+    None; with dry_run the result is reported but nothing is written.
+    Raises subprocess.CalledProcessError if a write fails.
+    """
+    if current is None:
+        return None
+    use_dconf, paths, entries = current
+    slot, new_paths, values, stale = plan(paths, entries, command, binding, name)
+    if new_paths is None and not values and not stale:
+        return "unchanged"
+    if not dry_run:
+        write = write_dconf if use_dconf else write_gsettings
+        write(slot, new_paths, values, stale)
+    return "created" if slot not in paths else "updated"
+
+
+def xbindkeys_keys(binding):
+    """Translate a GTK accelerator such as <Control>Print to xbindkeys syntax."""
+    modifiers = [
+        XBINDKEYS_MODIFIERS.get(name.lower(), name)
+        for name in re.findall(r"<([^>]+)>", binding)
+    ]
+    key = re.sub(r"<[^>]+>", "", binding)
+    return f"{'+'.join(modifiers)} + {key}" if modifiers else key
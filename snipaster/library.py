@@ -0,0 +1,346 @@
+"""Snipaster's index of saved captures.
+
+A SQLite database records path, size, dimensions and content hash (see
+snipaster.dedup) of each capture as it is saved, so nothing has to list the
+Screenshots folder again.
+It also drives the retention policy: captures older than a number of days,
+or beyond a total size, are evicted oldest first, along with their
+thumbnails.
+
+Command line: python3 -m snipaster.library {add,scan,evict,stats}
+"""
+import argparse
+import os
+import sqlite3
+import struct
+import sys
+import threading
+import time
+
+from snipaster import png
+from snipaster.dedup import capture_hash
+from snipaster.backend import MANIFEST_PATH, load_manifest
+from snipaster.naming import PREFIX
+from snipaster.thumbnail import remove_thumbnails
+
+DATA_DIR = os.path.join(
+    os.environ.get("XDG_DATA_HOME") or os.path.expanduser("~/.local/share"),
+    "snipaster",
+)
+LIBRARY_PATH = os.path.join(DATA_DIR, "library.sqlite3")
+IMAGE_EXTENSIONS = (".png", ".webp", ".qoi")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS captures (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    width INTEGER,
+    height INTEGER,
+    hash TEXT NOT NULL,
+    created_ns INTEGER NOT NULL,
+    device INTEGER,
+    inode INTEGER
+);
+CREATE INDEX IF NOT EXISTS captures_created ON captures (created_ns);
+CREATE INDEX IF NOT EXISTS captures_hash ON captures (hash);
+"""
+INSERT = (
+    "INSERT OR REPLACE INTO captures (path, size, width, height, hash, "
+    "created_ns, device, inode) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+# Deduplicated captures are hard links to one file, so bytes are counted
+# once per inode; rows indexed before inodes were recorded count on their own
+FILE_KEY = "COALESCE(device || ':' || inode, path)"
+
+SIZE_UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+
+
+def parse_size(text):
+    """Parse sizes such as 500M or 2G into bytes."""
+    text = text.strip().upper().removesuffix("B").removesuffix("I")
+    unit = text[-1:] if text[-1:] in SIZE_UNITS else ""
+    number = text[: len(text) - len(unit)]
+    return int(float(number) * SIZE_UNITS[unit])
+
+
+def image_dimensions(data):
+    """Return (width, height) from the file header, or (None, None)."""
+    if data.startswith(png.SIGNATURE):
+        try:
+            return png.dimensions(data)
+        except png.PNGError:
+            return None, None
+    if data.startswith(b"qoif") and len(data) >= 12:
+        return struct.unpack(">II", data[4:12])
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        kind = data[12:16]
+        if kind == b"VP8L" and len(data) >= 25:
+            bits = int.from_bytes(data[21:25], "little")
+            return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        if kind == b"VP8X" and len(data) >= 30:
+            return (
+                int.from_bytes(data[24:27], "little") + 1,
+                int.from_bytes(data[27:30], "little") + 1,
+            )
+        if kind == b"VP8 " and len(data) >= 30:
+            width, height = struct.unpack("<HH", data[26:30])
+            return width & 0x3FFF, height & 0x3FFF
+    return None, None
+
+
+class Library:
+    """The capture index; one connection shared by the daemon's threads."""
+
+    def __init__(self, path=LIBRARY_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        # WAL lets the wrapper's background indexer and the daemon write
+        # without blocking readers
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        """Add the device and inode columns to an index made without them."""
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(captures)")}
+        if "inode" in columns:
+            return
+        try:
+            with self._db:
+                self._db.execute("ALTER TABLE captures ADD COLUMN device INTEGER")
+                self._db.execute("ALTER TABLE captures ADD COLUMN inode INTEGER")
+        except sqlite3.OperationalError:
+            return  # Another process migrated it first
+        with self._db:
+            for (path,) in self._db.execute("SELECT path FROM captures").fetchall():
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                self._db.execute(
+                    "UPDATE captures SET device = ?, inode = ? WHERE path = ?",
+                    (stat.st_dev, stat.st_ino, path),
+                )
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def add(self, path, digest=None, created_ns=None):
+        """Index one capture; digest is its capture_hash if already known.
+
+        Only the file header is read unless the hash still has to be computed.
+        created_ns defaults to now; the file's mtime is no use for that since
+        deduplicated captures share one inode.
+        """
+        row = self._row(path, digest, created_ns)
+        with self._lock, self._db:
+            self._db.execute(INSERT, row)
+        return row
+
+    def _row(self, path, digest=None, created_ns=None):
+        with open(path, "rb") as f:
+            data = f.read() if digest is None else f.read(64)
+        width, height = image_dimensions(data)
+        stat = os.stat(path)
+        return (
+            os.path.abspath(path),
+            stat.st_size,
+            width,
+            height,
+            digest or capture_hash(data),
+            created_ns or time.time_ns(),
+            stat.st_dev,
+            stat.st_ino,
+        )
+
+    def find(self, digest):
+        """Return the newest existing capture with this content hash, or None."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT path FROM captures WHERE hash = ? ORDER BY created_ns DESC",
+                (digest,),
+            ).fetchall()
+        for (path,) in rows:
+            if os.path.exists(path):
+                return path
+            self.forget(path)
+        return None
+
+    def forget(self, path):
+        with self._lock, self._db:
+            self._db.execute(
+                "DELETE FROM captures WHERE path = ?", (os.path.abspath(path),)
+            )
+
+    def recent(self, limit):
+        """Return the paths of the newest captures, newest first."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT path FROM captures ORDER BY created_ns DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def paths(self):
+        with self._lock:
+            return {row[0] for row in self._db.execute("SELECT path FROM captures")}
+
+    def stats(self):
+        """Return (count, total bytes, oldest created_ns, newest created_ns).
+
+        Captures sharing one file through hard links count its bytes once.
+        """
+        with self._lock:
+            count, oldest, newest = self._db.execute(
+                "SELECT COUNT(*), MIN(created_ns), MAX(created_ns) FROM captures"
+            ).fetchone()
+            total = self._db.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM (SELECT MAX(size) AS size "
+                f"FROM captures GROUP BY {FILE_KEY})"
+            ).fetchone()[0]
+        return count, total, oldest, newest
+
+    def scan(self, directory, mtimes=None):
+        """Reconcile the index with directory: add new files, drop missing ones.
+
+        Only needed once for captures made before the index existed, or after
+        files were moved by hand; normal captures are indexed as they happen.
+        All changes go in one transaction. If mtimes is a dict, it is filled
+        with the mtime_ns of every directory walked (see Plan.scan_in_sync).
+        """
+        known = self.paths()
+        seen = set()
+        rows = []
+        for root, dirs, files in os.walk(directory):
+            if mtimes is not None:
+                mtimes[os.path.abspath(root)] = os.stat(root).st_mtime_ns
+            dirs[:] = [d for d in dirs if not d.startswith(".")]
+            for name in files:
+                if not name.startswith(PREFIX) or not name.endswith(IMAGE_EXTENSIONS):
+                    continue
+                path = os.path.abspath(os.path.join(root, name))
+                seen.add(path)
+                if path not in known:
+                    rows.append(self._row(path, created_ns=os.stat(path).st_mtime_ns))
+        base = os.path.abspath(directory)
+        removed = [(p,) for p in known - seen if p.startswith(base + os.sep)]
+        with self._lock, self._db:
+            self._db.executemany(INSERT, rows)
+            self._db.executemany("DELETE FROM captures WHERE path = ?", removed)
+        return len(rows), len(removed)
+
+    def evict(self, max_age_days=None, max_bytes=None, now_ns=None):
+        """Delete captures past the retention limits, oldest first.
+
+        A capture's bytes only count as freed once the last indexed link to
+        its file goes. Returns the list of deleted paths.
+        """
+        if max_age_days is None and max_bytes is None:
+            return []
+        now_ns = time.time_ns() if now_ns is None else now_ns
+        cutoff = None
+        if max_age_days is not None:
+            cutoff = now_ns - int(max_age_days * 86400 * 1e9)
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT path, size, created_ns, {FILE_KEY} FROM captures "
+                "ORDER BY created_ns"
+            ).fetchall()
+        # File -> [indexed links left, size]
+        files = {}
+        for _, size, _, key in rows:
+            files.setdefault(key, [0, size])[0] += 1
+        total = sum(size for _, size in files.values())
+        victims = []
+        for path, _, created_ns, key in rows:
+            expired = cutoff is not None and created_ns < cutoff
+            over = max_bytes is not None and total > max_bytes
+            if not expired and not over:
+                # Rows are oldest first, so no later one is due either
+                break
+            victims.append(path)
+            links = files[key]
+            links[0] -= 1
+            if links[0] == 0:
+                total -= links[1]
+
+        for path in victims:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            remove_thumbnails(path)
+            self.forget(path)
+            remove_empty_parents(os.path.dirname(path))
+        return victims
+
+
+def remove_empty_parents(directory):
+    """Remove empty date-shard directories left behind by eviction."""
+    # Shards are at most three levels deep (YYYY/MM/DD)
+    for _ in range(3):
+        if not os.path.basename(directory).isdigit():
+            return
+        try:
+            os.rmdir(directory)
+        except OSError:
+            return
+        directory = os.path.dirname(directory)
+
+
+def retention(settings):
+    """Return (max_age_days, max_bytes) from manifest settings."""
+    return settings.get("retention_days"), settings.get("retention_bytes")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the Snipaster capture index.")
+    parser.add_argument("--db", default=LIBRARY_PATH, help="index database")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser(
+        "add", help="store new captures: deduplicate, archive and index them"
+    )
+    add.add_argument("files", nargs="+")
+    scan = commands.add_parser("scan", help="reconcile the index with a folder")
+    scan.add_argument("directory", nargs="?")
+    commands.add_parser("evict", help="apply the retention policy now")
+    commands.add_parser("stats", help="show index totals")
+    args = parser.parse_args(argv)
+
+    settings = load_manifest(MANIFEST_PATH) or {}
+    library = Library(args.db)
+    try:
+        if args.command == "add":
+            from snipaster.pipeline import Pipeline, Timeline
+
+            pipeline = Pipeline(
+                settings, archive=settings.get("archive"), library=library
+            )
+            for path in args.files:
+                pipeline.persist(path, Timeline())
+            pipeline.executor.shutdown()
+        elif args.command == "scan":
+            from snipaster.shot import SCREENSHOT_DIR
+
+            directory = args.directory or settings.get("directory") or SCREENSHOT_DIR
+            added, removed = library.scan(directory)
+            print(f"Indexed {added} new captures, dropped {removed} missing ones")
+        elif args.command == "evict":
+            for path in library.evict(*retention(settings)):
+                print(f"Evicted {path}")
+        elif args.command == "stats":
+            count, total, oldest, newest = library.stats()
+            print(f"{count} captures, {total / (1 << 20):.1f} MiB")
+            if count:
+                for label, ns in (("oldest", oldest), ("newest", newest)):
+                    when = time.localtime(ns / 1e9)
+                    print(f"{label}: {time.strftime('%Y-%m-%d %H:%M:%S', when)}")
+    finally:
+        library.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
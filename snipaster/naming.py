@@ -0,0 +1,127 @@
+"""Collision-free capture filenames.
+
+Names carry a nanosecond timestamp, e.g.
+``screenshot-2026-10-17-14-03-07-123456789.png``, and are allocated in
+process without forking ``date``. Files are written under a temporary name
+and then hard-linked into place, which fails instead of overwriting when the
+name is taken (for instance by a capture from another process); the next
+sequence number is tried in that case.
+"""
+import errno
+import os
+import tempfile
+import threading
+import time
+
+PREFIX = "screenshot-"
+
+# Optional date-sharded layout below the Screenshots folder.
+SHARD_FORMATS = {"none": "", "month": "%Y/%m", "day": "%Y/%m/%d"}
+
+
+def shard_directory(base, shard="none", when=None):
+    """Return (and create) the folder a capture taken at when belongs in."""
+    fmt = SHARD_FORMATS[shard or "none"]
+    directory = base
+    if fmt:
+        directory = os.path.join(base, time.strftime(fmt, time.localtime(when)))
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+class Allocator:
+    """Hand out monotonic, unique capture paths; safe to share across threads."""
+
+    def __init__(self, prefix=PREFIX):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._last_ns = 0
+        self._seq = 0
+
+    def _stamp(self):
+        with self._lock:
+            now = time.time_ns()
+            if now <= self._last_ns:
+                # Same tick (or the clock stepped back): keep order with a counter
+                now = self._last_ns
+                self._seq += 1
+            else:
+                self._last_ns = now
+                self._seq = 0
+            return now, self._seq
+
+    def next_path(self, directory, extension=".png"):
+        """Return a new capture path in directory."""
+        now, seq = self._stamp()
+        seconds, nanos = divmod(now, 1_000_000_000)
+        stamp = time.strftime("%Y-%m-%d-%H-%M-%S", time.localtime(seconds))
+        suffix = f"-{seq}" if seq else ""
+        return os.path.join(
+            directory, f"{self.prefix}{stamp}-{nanos:09d}{suffix}{extension}"
+        )
+
+    def temp_path(self, directory, extension=".png"):
+        """Return a hidden scratch path for a capture tool to write to."""
+        now, seq = self._stamp()
+        name = f".snipaster-{now}-{seq}-{os.getpid()}{extension}"
+        return os.path.join(directory, name)
+
+
+ALLOCATOR = Allocator()
+
+
+def _link_or_claim(src, dst):
+    """Atomically put src at dst unless dst exists; False if it does."""
+    try:
+        os.link(src, dst)
+        return True
+    except FileExistsError:
+        return False
+    except OSError as e:
+        if e.errno not in (errno.EPERM, errno.EOPNOTSUPP, errno.EXDEV, errno.EMLINK):
+            raise
+    # No hard links on this filesystem: claim the name, then replace it
+    try:
+        os.close(os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600))
+    except FileExistsError:
+        return False
+    os.rename(src, dst)
+    return True
+
+
+def publish(tmp_path, path, allocator=ALLOCATOR):
+    """Move a finished file to path without clobbering; return the final path."""
+    directory = os.path.dirname(path)
+    extension = os.path.splitext(path)[1]
+    while not _link_or_claim(tmp_path, path):
+        path = allocator.next_path(directory, extension)
+    if os.path.exists(tmp_path):
+        os.unlink(tmp_path)
+    return path
+
+
+def link_unique(existing, path, allocator=ALLOCATOR):
+    """Hard-link existing at path (or the next free name); return that path."""
+    directory = os.path.dirname(path)
+    extension = os.path.splitext(path)[1]
+    while True:
+        try:
+            os.link(existing, path)
+            return path
+        except FileExistsError:
+            path = allocator.next_path(directory, extension)
+
+
+def write_unique(path, data, mode=0o644, allocator=ALLOCATOR):
+    """Write data via a temp file and publish it at path (or the next free name)."""
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".snipaster-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(tmp_path, mode)
+        return publish(tmp_path, path, allocator)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
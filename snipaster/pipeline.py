@@ -0,0 +1,290 @@
+"""Post-capture pipeline.
+
+Once the capture tool has produced an image, the clipboard handoff runs first
+so the user can paste as soon as possible. Saving, an optional archival
+re-encode, making the file durable and the desktop notification then run
+concurrently in the background. Every stage is stamped on a Timeline so
+time-to-clipboard and time-to-durable can be measured separately.
+"""
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from snipaster.dedup import capture_hash, link_duplicate
+from snipaster.encode import ImageSource, get_encoder, pillow
+from snipaster.fsutil import atomic_write
+from snipaster.naming import write_unique
+from snipaster.png import PNGError
+from snipaster.thumbnail import write_thumbnails
+
+# The umask can only be read by setting it, so do that once before any threads
+UMASK = os.umask(0o022)
+os.umask(UMASK)
+
+
+class Timeline:
+    """Monotonic timestamps of capture stages, relative to the start."""
+
+    def __init__(self):
+        self.start = time.monotonic_ns()
+        # Wall-clock start, only to date the trace (see snipaster.trace)
+        self.wall = time.time()
+        self.marks = {}
+        self._lock = threading.Lock()
+
+    def mark(self, stage):
+        with self._lock:
+            self.marks[stage] = time.monotonic_ns() - self.start
+
+    def as_millis(self):
+        """Return {stage: milliseconds since start}, in stage order."""
+        with self._lock:
+            marks = sorted(self.marks.items(), key=lambda item: item[1])
+        return {stage: ns / 1e6 for stage, ns in marks}
+
+    def format(self):
+        return " ".join(f"{stage}={ms:.1f}ms" for stage, ms in self.as_millis().items())
+
+
+def notify(backend, message):
+    """Show a desktop notification if notify-send is available."""
+    notify_send = backend["tools"].get("notify-send")
+    if notify_send:
+        subprocess.run([notify_send, "Snipaster", message])
+
+
+def copy_to_clipboard(backend, path, data=None):
+    """Put the PNG on the clipboard, from memory when data is given."""
+    tools = backend["tools"]
+    if backend["clipboard"] == "wl-copy":
+        command = [tools["wl-copy"], "--type", "image/png"]
+    elif backend["clipboard"] == "xclip":
+        command = [tools["xclip"], "-selection", "clipboard", "-t", "image/png"]
+    else:
+        return
+    if data is not None:
+        subprocess.run(command, input=data)
+    else:
+        with open(path, "rb") as f:
+            subprocess.run(command, stdin=f)
+
+
+def make_durable(path):
+    """fsync the file and its directory entry."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    dir_fd = os.open(os.path.dirname(path), os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+class PendingShot:
+    """A captured screenshot whose background stages may still be running."""
+
+    def __init__(self, path, timeline, futures):
+        self.path = path
+        self.timeline = timeline
+        self.futures = futures
+
+    @property
+    def saved_path(self):
+        """Where the image ended up; differs from path after archiving."""
+        return self.futures[0].result()
+
+    def wait(self):
+        """Block until every background stage has finished."""
+        wait(self.futures)
+        for future in self.futures:
+            future.result()
+
+    def add_done_callback(self, callback):
+        """Call callback(self) once all background stages are done."""
+        remaining = [len(self.futures)]
+        lock = threading.Lock()
+
+        def done(_future):
+            with lock:
+                remaining[0] -= 1
+                finished = remaining[0] == 0
+            if finished:
+                callback(self)
+
+        if not self.futures:
+            callback(self)
+        for future in self.futures:
+            future.add_done_callback(done)
+
+
+class Pipeline:
+    """Run the post-capture stages for a backend."""
+
+    def __init__(
+        self,
+        backend,
+        executor=None,
+        archive=None,
+        library=None,
+        recent=None,
+        clipboard=None,
+        captures=None,
+    ):
+        self.backend = backend
+        self.library = library
+        self.recent = recent
+        # A snipaster.recent.RecentCaptures, fed every saved capture
+        self.captures = captures
+        # A snipaster.clipboard.ClipboardOwner, used instead of the tools
+        self.clipboard = clipboard
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers=4, thread_name_prefix="snipaster"
+        )
+        # Validate up front so a bad name fails at startup, not per capture
+        self.archive = get_encoder(archive) if archive else None
+
+    def run(self, path, timeline, data=None, source=None):
+        """Hand the image to the clipboard, then persist and notify in the background.
+
+        When data holds the encoded image, path is only written by the
+        background save stage; otherwise the capture tool already wrote it.
+        source is an ImageSource that may hold raw pixels instead of data.
+        """
+        if self.clipboard is not None:
+            return self._offer(path, timeline, data, source)
+        if data is None and source is not None:
+            data = source.png
+            timeline.mark("encoded")
+        copy_to_clipboard(self.backend, path, data)
+        timeline.mark("clipboard")
+        futures = [
+            self.executor.submit(self.persist, path, timeline, data, source),
+            self.executor.submit(self._notify, timeline),
+        ]
+        return PendingShot(path, timeline, futures)
+
+    def _offer(self, path, timeline, data, source):
+        """Put the image on the clipboard owner, encoding nothing up front."""
+        from snipaster.clipboard import ClipboardError
+
+        offered = source
+        if offered is None and data is None:
+            with open(path, "rb") as f:
+                offered = ImageSource(f.read())
+        elif offered is None:
+            offered = ImageSource(data)
+        # The owner serves text/uri-list from the save stage's result
+        futures = [
+            self.executor.submit(self.persist, path, timeline, data, source),
+            self.executor.submit(self._notify, timeline),
+        ]
+        try:
+            self.clipboard.offer(offered, futures[0])
+        except ClipboardError as e:
+            print(
+                f"Clipboard owner failed, using the clipboard tool: {e}",
+                file=sys.stderr,
+            )
+            copy_to_clipboard(self.backend, path, offered.png)
+        timeline.mark("clipboard")
+        return PendingShot(path, timeline, futures)
+
+    def find_duplicate(self, digest):
+        """Return a saved capture with the same pixels, if any."""
+        if self.recent is not None:
+            path = self.recent.lookup(digest)
+            if path is not None:
+                return path
+        if self.library is not None:
+            return self.library.find(digest)
+        return None
+
+    def persist(self, path, timeline, data=None, source=None):
+        """Store a capture (deduplicated, archived, thumbnailed); return its path."""
+        on_disk = data is None and source is None
+        if on_disk:
+            with open(path, "rb") as f:
+                data = f.read()
+        elif data is None:
+            data = source.png
+            timeline.mark("encoded")
+        digest = capture_hash(data)
+        timeline.mark("hashed")
+
+        target = None
+        duplicate = self.find_duplicate(digest)
+        if duplicate is not None:
+            target = link_duplicate(duplicate, path, on_disk)
+            if target is not None:
+                timeline.mark("deduplicated")
+        if target is None:
+            target = self._store(path, timeline, data, on_disk, source)
+        make_durable(target)
+        timeline.mark("durable")
+
+        if self.recent is not None:
+            self.recent.add(digest, target)
+        self._index(target, timeline, digest)
+        if self.captures is not None:
+            self.captures.add(target, data)
+        source = source or ImageSource(data)
+        self._thumbnail(target, timeline, source)
+        return target
+
+    def _store(self, path, timeline, data, on_disk, source=None):
+        archive = self.archive
+        if archive is not None and archive.name == "png":
+            archive = None
+        if on_disk and archive is None:
+            # The capture tool already wrote the file as it should stay
+            return path
+
+        target = path
+        if archive is not None:
+            try:
+                data = archive.encode(source or ImageSource(data))
+                target = os.path.splitext(path)[0] + archive.extension
+            except PNGError:
+                archive = None
+        if on_disk and target == path:
+            # Re-encoded in place, e.g. png-max
+            atomic_write(path, data, 0o666 & ~UMASK)
+        else:
+            target = write_unique(target, data, 0o666 & ~UMASK)
+        timeline.mark("archived" if archive is not None else "saved")
+        if target != path and os.path.exists(path):
+            os.unlink(path)
+        return target
+
+    def _index(self, path, timeline, digest):
+        if self.library is None:
+            return
+        self.library.add(path, digest=digest)
+        timeline.mark("indexed")
+        max_age_days = self.backend.get("retention_days")
+        max_bytes = self.backend.get("retention_bytes")
+        if max_age_days is not None or max_bytes is not None:
+            self.executor.submit(self.library.evict, max_age_days, max_bytes)
+
+    def _thumbnail(self, path, timeline, source):
+        # A missing thumbnail only means the file manager makes its own. That
+        # beats decoding the PNG in pure Python on every save, so without
+        # Pillow only captures whose pixels are already at hand get one.
+        if not source.has_raw and pillow() is None:
+            return
+        try:
+            write_thumbnails(path, source)
+        except (OSError, ValueError) as e:
+            print(f"{path}: no thumbnail: {e}", file=sys.stderr)
+            return
+        timeline.mark("thumbnailed")
+
+    def _notify(self, timeline):
+        notify(self.backend, "Screenshot saved and copied to clipboard")
+        timeline.mark("notified")
@@ -0,0 +1,176 @@
+"""Desired-state tracking for the installer: write only what changed.
+
+Each file the installer manages is compared with what it should contain.
+The comparison goes through a small state cache (state.json in the config
+directory) holding the path's mtime, size and the SHA-256 of the content
+last written there, so a file nobody touched is confirmed with one stat()
+instead of being read and hashed. The cache also carries the fingerprint of
+the last successful install's inputs, which makes a converged re-run a few
+stat calls in total.
+"""
+import hashlib
+import json
+import os
+import threading
+
+from snipaster.backend import CONFIG_DIR
+from snipaster.fsutil import atomic_write
+
+STATE_PATH = os.path.join(CONFIG_DIR, "state.json")
+STATE_VERSION = 1
+
+
+def digest(content):
+    """SHA-256 hex digest of str or bytes content."""
+    data = content.encode("utf-8") if isinstance(content, str) else content
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_state(path):
+    """Return [mtime_ns, size] of path, or None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+def load_state(path=STATE_PATH):
+    """Return the state cache, or an empty one if missing or unreadable."""
+    try:
+        with open(path) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {"files": {}, "keys": {}}
+    if state.get("version") != STATE_VERSION:
+        return {"files": {}, "keys": {}}
+    return state
+
+
+class Plan:
+    """What one installer run would change, and the cache it updates.
+
+    With dry_run set nothing is written; the changes are only listed.
+    Install steps run on several threads, so changes are collected under
+    a lock; each step touches its own paths in the cache.
+    """
+
+    def __init__(self, dry_run=False, path=STATE_PATH):
+        self.dry_run = dry_run
+        self.path = path
+        self.state = load_state(path)
+        self.changes = []
+        self._lock = threading.Lock()
+
+    def note(self, change):
+        """Record a change that was (or, in a dry run, would be) made."""
+        with self._lock:
+            self.changes.append(change)
+
+    def in_sync(self, path, content):
+        """Whether path already holds content (None meaning absent)."""
+        entry = self.state["files"].get(path)
+        current = file_state(path)
+        wanted = None if content is None else digest(content)
+        if entry and entry["sha256"] == wanted and entry["stat"] == current:
+            return True
+        if content is None:
+            on_disk = None if current is None else "present"
+        elif current is None:
+            on_disk = None
+        else:
+            with open(path, "rb") as f:
+                on_disk = digest(f.read())
+        if on_disk == wanted:
+            self.state["files"][path] = {"sha256": wanted, "stat": current}
+            return True
+        return False
+
+    def sync_file(self, path, content, mode=0o644):
+        """Make path hold content; return True if it changed (or would)."""
+        if self.in_sync(path, content):
+            return False
+        self.note(f"write {path}")
+        if not self.dry_run:
+            atomic_write(path, content, mode)
+            self.state["files"][path] = {
+                "sha256": digest(content),
+                "stat": file_state(path),
+            }
+        return True
+
+    def remove_file(self, path):
+        """Make sure path does not exist; return True if it was removed."""
+        if self.in_sync(path, None):
+            return False
+        self.note(f"remove {path}")
+        if not self.dry_run:
+            os.remove(path)
+            self.state["files"][path] = {"sha256": None, "stat": None}
+        return True
+
+    def key_in_sync(self, name, value, watched):
+        """Whether an external setting was last set to value.
+
+        watched is a file that changes whenever the setting could have (the
+        dconf database, say); if it has not been touched since value was
+        recorded, nothing needs reading.
+        """
+        entry = self.state["keys"].get(name)
+        return bool(
+            entry
+            and entry["sha256"] == digest(value)
+            and entry["stat"] == file_state(watched)
+        )
+
+    def record_key(self, name, value, watched):
+        """Remember that an external setting now holds value."""
+        if not self.dry_run:
+            self.state["keys"][name] = {
+                "sha256": digest(value),
+                "path": watched,
+                "stat": file_state(watched),
+            }
+
+    def scan_in_sync(self, directory, index_path):
+        """Whether a library scan of directory would find nothing new.
+
+        True when the index exists and no directory recorded by the last
+        scan has changed since: a file added, removed or renamed, or a new
+        subdirectory, updates its parent's mtime. One stat() per directory.
+        """
+        mtimes = self.state.get("scans", {}).get(directory)
+        if not mtimes or not os.path.exists(index_path):
+            return False
+        for path, mtime_ns in mtimes.items():
+            current = file_state(path)
+            if current is None or current[0] != mtime_ns:
+                return False
+        return True
+
+    def record_scan(self, directory, mtimes):
+        """Remember the directory mtimes seen by a library scan."""
+        if not self.dry_run:
+            self.state.setdefault("scans", {})[directory] = mtimes
+
+    def converged(self, fingerprint):
+        """Whether the last install had these inputs and nothing drifted since.
+
+        Only stat() calls: one per managed file and watched setting.
+        """
+        if self.state.get("fingerprint") != fingerprint:
+            return False
+        entries = list(self.state["files"].items())
+        entries += [(entry["path"], entry) for entry in self.state["keys"].values()]
+        return bool(entries) and all(
+            entry["stat"] == file_state(path) for path, entry in entries
+        )
+
+    def save(self, fingerprint=None):
+        """Write the cache back, marking a successful install's inputs."""
+        if self.dry_run:
+            return
+        state = dict(self.state, version=STATE_VERSION)
+        if fingerprint is not None:
+            state["fingerprint"] = fingerprint
+        atomic_write(self.path, json.dumps(state, indent=2, sort_keys=True) + "\n")
@@ -0,0 +1,164 @@
+"""Minimal PNG chunk handling with the standard library only."""
+import struct
+import zlib
+
+SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+class PNGError(ValueError):
+    """Raised for data that is not a well-formed PNG."""
+
+
+def read_chunks(data):
+    """Yield (type, payload) for each chunk of a PNG byte string."""
+    if not data.startswith(SIGNATURE):
+        raise PNGError("not a PNG file")
+    pos = len(SIGNATURE)
+    while pos < len(data):
+        if pos + 8 > len(data):
+            raise PNGError("truncated chunk header")
+        length, kind = struct.unpack(">I4s", data[pos : pos + 8])
+        payload = data[pos + 8 : pos + 8 + length]
+        if len(payload) != length:
+            raise PNGError("truncated chunk")
+        yield kind, payload
+        pos += 12 + length
+        if kind == b"IEND":
+            return
+
+
+def chunk(kind, payload):
+    """Serialise one chunk including its CRC."""
+    crc = zlib.crc32(payload, zlib.crc32(kind))
+    return struct.pack(">I", len(payload)) + kind + payload + struct.pack(">I", crc)
+
+
+def dimensions(data):
+    """Return (width, height) from the IHDR chunk."""
+    for kind, payload in read_chunks(data):
+        if kind == b"IHDR":
+            return struct.unpack(">II", payload[:8])
+    raise PNGError("missing IHDR")
+
+
+def recompress(data, level=9):
+    """Re-deflate the image data at another zlib level.
+
+    Lossless: the filtered scanlines are kept as they are, so no pixel
+    decoding is needed. Ancillary chunks are preserved in order.
+    """
+    out = [SIGNATURE]
+    idat = []
+    for kind, payload in read_chunks(data):
+        if kind == b"IDAT":
+            idat.append(payload)
+            continue
+        if idat and kind == b"IEND":
+            raw = zlib.decompress(b"".join(idat))
+            out.append(chunk(b"IDAT", zlib.compress(raw, level)))
+        out.append(chunk(kind, payload))
+    return b"".join(out)
+
+
+# Bytes per pixel for the 8-bit colour types this module can decode.
+CHANNELS = {0: 1, 2: 3, 4: 2, 6: 4}
+COLOUR_TYPES = {channels: colour for colour, channels in CHANNELS.items()}
+
+
+def encode(width, height, channels, pixels, level=6):
+    """Encode raw 8-bit pixels (rows packed, no padding) as a PNG.
+
+    Every row uses filter type 0, which keeps encoding to one zlib pass.
+    """
+    stride = width * channels
+    raw = bytearray((stride + 1) * height)
+    for y in range(height):
+        start = y * (stride + 1) + 1
+        raw[start : start + stride] = pixels[y * stride : (y + 1) * stride]
+    header = struct.pack(
+        ">IIBBBBB", width, height, 8, COLOUR_TYPES[channels], 0, 0, 0
+    )
+    return b"".join(
+        [
+            SIGNATURE,
+            chunk(b"IHDR", header),
+            chunk(b"IDAT", zlib.compress(bytes(raw), level)),
+            chunk(b"IEND", b""),
+        ]
+    )
+
+
+def _add_bytes(a, b, nbytes):
+    """Bytewise (a + b) mod 256 of two equally long byte strings."""
+    high = int.from_bytes(b"\x80" * nbytes, "big")
+    x = int.from_bytes(a, "big")
+    y = int.from_bytes(b, "big")
+    low = ~high & ((1 << (8 * nbytes)) - 1)
+    return (((x & low) + (y & low)) ^ ((x ^ y) & high)).to_bytes(nbytes, "big")
+
+
+def _unfilter_row(kind, row, prev, bpp):
+    """Undo one scanline filter; row is mutated and returned."""
+    if kind == 0:
+        return row
+    if kind == 2:
+        # Up: whole-row add, done on big integers instead of per byte
+        return bytearray(_add_bytes(row, prev, len(row)))
+    n = len(row)
+    if kind == 1:
+        for i in range(bpp, n):
+            row[i] = (row[i] + row[i - bpp]) & 0xFF
+    elif kind == 3:
+        for i in range(n):
+            left = row[i - bpp] if i >= bpp else 0
+            row[i] = (row[i] + ((left + prev[i]) >> 1)) & 0xFF
+    elif kind == 4:
+        for i in range(n):
+            a = row[i - bpp] if i >= bpp else 0
+            b = prev[i]
+            c = prev[i - bpp] if i >= bpp else 0
+            p = a + b - c
+            pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+            if pa <= pb and pa <= pc:
+                predictor = a
+            elif pb <= pc:
+                predictor = b
+            else:
+                predictor = c
+            row[i] = (row[i] + predictor) & 0xFF
+    else:
+        raise PNGError(f"bad filter type {kind}")
+    return row
+
+
+def decode(data):
+    """Decode an 8-bit, non-interlaced PNG to (width, height, channels, pixels).
+
+    Pure Python, so slow on large images; callers should prefer Pillow when
+    it is installed.
+    """
+    idat = []
+    header = None
+    for kind, payload in read_chunks(data):
+        if kind == b"IHDR":
+            header = struct.unpack(">IIBBBBB", payload)
+        elif kind == b"IDAT":
+            idat.append(payload)
+    if header is None:
+        raise PNGError("missing IHDR")
+    width, height, depth, colour, _, _, interlace = header
+    if depth != 8 or colour not in CHANNELS or interlace:
+        raise PNGError("only 8-bit non-interlaced grey/RGB(A) PNGs are supported")
+
+    channels = CHANNELS[colour]
+    stride = width * channels
+    raw = zlib.decompress(b"".join(idat))
+    pixels = bytearray(stride * height)
+    prev = bytes(stride)
+    for y in range(height):
+        start = y * (stride + 1)
+        row = bytearray(raw[start + 1 : start + 1 + stride])
+        row = _unfilter_row(raw[start], row, prev, channels)
+        pixels[y * stride : (y + 1) * stride] = row
+        prev = row
+    return width, height, channels, bytes(pixels)
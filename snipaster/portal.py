@@ -0,0 +1,218 @@
+"""Wayland capture through the xdg-desktop-portal Screenshot interface.
+
+Needs jeepney (apt install python3-jeepney). On Wayland the wrapper script
+runs gnome-screenshot -a or grim -g "$(slurp)": two or three process
+launches per capture. snipaster-daemon instead keeps one session bus
+connection open and calls org.freedesktop.portal.Screenshot. GNOME's portal
+shows its own area selector. On wlroots compositors xdg-desktop-portal-wlr
+grabs through wlr-screencopy. The portal writes the PNG and returns its URI,
+and the file is moved into place. The capture tools remain the fallback.
+
+Command line: python3 -m snipaster.portal [--region X,Y,W,H] out.png
+"""
+import argparse
+import itertools
+import os
+import shutil
+import sys
+import threading
+from urllib.parse import unquote, urlparse
+
+from snipaster import png
+from snipaster.encode import ImageSource
+from snipaster.fsutil import atomic_write
+
+try:
+    from jeepney import (
+        DBusAddress,
+        DBusErrorResponse,
+        HeaderFields,
+        MatchRule,
+        MessageType,
+        Properties,
+        message_bus,
+        new_method_call,
+    )
+    from jeepney.io.blocking import Proxy, open_dbus_connection
+except ImportError:
+    open_dbus_connection = None
+
+BUS_NAME = "org.freedesktop.portal.Desktop"
+OBJECT_PATH = "/org/freedesktop/portal/desktop"
+INTERFACE = "org.freedesktop.portal.Screenshot"
+REQUEST_INTERFACE = "org.freedesktop.portal.Request"
+# Response codes of org.freedesktop.portal.Request.Response
+SUCCESS = 0
+CANCELLED = 1
+# How long the user may take to select an area
+TIMEOUT = 300.0
+
+
+class PortalError(Exception):
+    """Raised when the portal cannot be reached or fails a capture."""
+
+
+def available():
+    """Whether jeepney is installed."""
+    return open_dbus_connection is not None
+
+
+def crop(data, region):
+    """Return PNG data cut down to region (x, y, width, height)."""
+    raw = ImageSource(data).raw
+    x, y, width, height = region
+    x, y = max(0, min(x, raw.width)), max(0, min(y, raw.height))
+    width, height = min(width, raw.width - x), min(height, raw.height - y)
+    stride = raw.width * raw.channels
+    rows = [
+        raw.pixels[row * stride + x * raw.channels :][: width * raw.channels]
+        for row in range(y, y + height)
+    ]
+    return png.encode(width, height, raw.channels, b"".join(rows), level=1)
+
+
+class PortalCapture:
+    """Take screenshots through the portal on one session bus connection.
+
+    bus is "SESSION" or a D-Bus address, such as a private test bus.
+    """
+
+    def __init__(self, bus="SESSION"):
+        if open_dbus_connection is None:
+            raise PortalError("the portal backend needs jeepney")
+        try:
+            self.connection = open_dbus_connection(bus)
+        except (OSError, KeyError, ValueError) as e:
+            raise PortalError(f"cannot connect to the session bus: {e}")
+        self.portal = DBusAddress(OBJECT_PATH, bus_name=BUS_NAME, interface=INTERFACE)
+        self.bus = Proxy(message_bus, self.connection)
+        self.tokens = itertools.count()
+        self._lock = threading.Lock()
+        try:
+            reply = self.connection.send_and_get_reply(
+                Properties(self.portal).get("version"), timeout=5
+            )
+        except TimeoutError:
+            self.close()
+            raise PortalError("the portal did not answer")
+        if reply.header.message_type == MessageType.error:
+            self.close()
+            raise PortalError(f"no screenshot portal on the bus: {reply.body}")
+        self.version = reply.body[0][1]
+
+    def screenshot(self, interactive=True, timeout=TIMEOUT):
+        """Ask the portal for a screenshot; return its file, or None if cancelled.
+
+        With interactive the portal lets the user pick an area first.
+        """
+        token = f"snipaster{os.getpid()}_{next(self.tokens)}"
+        # Signals carry the portal's unique name, so match on the handle instead
+        rule = MatchRule(type="signal", interface=REQUEST_INTERFACE, member="Response")
+        options = {"handle_token": ("s", token), "interactive": ("b", interactive)}
+        call = new_method_call(self.portal, "Screenshot", "sa{sv}", ("", options))
+        with self._lock:
+            # Subscribe before calling, or a fast portal's answer is missed
+            self.bus.AddMatch(rule)
+            try:
+                with self.connection.filter(rule, bufsize=16) as responses:
+                    reply = self.connection.send_and_get_reply(call, timeout=10)
+                    if reply.header.message_type == MessageType.error:
+                        raise PortalError(f"screenshot refused: {reply.body}")
+                    handle = reply.body[0]
+                    while True:
+                        signal = self.connection.recv_until_filtered(
+                            responses, timeout=timeout
+                        )
+                        if signal.header.fields.get(HeaderFields.path) == handle:
+                            break
+            except TimeoutError:
+                raise PortalError("no answer from the portal")
+            except (OSError, DBusErrorResponse) as e:
+                raise PortalError(str(e))
+            finally:
+                try:
+                    self.bus.RemoveMatch(rule)
+                except (OSError, DBusErrorResponse):
+                    pass
+        response, results = signal.body
+        if response == CANCELLED:
+            return None
+        if response != SUCCESS or "uri" not in results:
+            raise PortalError(f"the portal failed the screenshot (response {response})")
+        return unquote(urlparse(results["uri"][1]).path)
+
+    def capture(self, path, region=None):
+        """Write a screenshot to path; return False if the user cancelled.
+
+        Without region the portal's own selector picks the area; with one
+        (x, y, width, height) the whole screen is grabbed and cropped.
+        """
+        if region is not None:
+            data = self.capture_bytes(region)
+            if data is None:
+                return False
+            atomic_write(path, data)
+            return True
+        source = self.screenshot()
+        if source is None:
+            return False
+        shutil.move(source, path)
+        return True
+
+    def capture_bytes(self, region=None):
+        """Return a screenshot as PNG data, or None if the user cancelled.
+
+        The portal's own file is read and removed; region works as in capture.
+        """
+        source = self.screenshot(interactive=region is None)
+        if source is None:
+            return None
+        try:
+            with open(source, "rb") as f:
+                data = f.read()
+        finally:
+            os.unlink(source)
+        return data if region is None else crop(data, region)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Take a screenshot through xdg-desktop-portal."
+    )
+    parser.add_argument(
+        "--region", metavar="X,Y,W,H", help="grab without asking and crop to this"
+    )
+    parser.add_argument("output", help="PNG file to write")
+    args = parser.parse_args(argv)
+
+    region = None
+    if args.region:
+        try:
+            region = tuple(int(part) for part in args.region.split(","))
+        except ValueError:
+            parser.error("--region must be X,Y,W,H")
+        if len(region) != 4:
+            parser.error("--region must be X,Y,W,H")
+    try:
+        with PortalCapture() as portal:
+            taken = portal.capture(args.output, region)
+    except PortalError as e:
+        print(f"Portal capture failed: {e}", file=sys.stderr)
+        return 1
+    if not taken:
+        print("Cancelled", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
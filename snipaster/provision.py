@@ -0,0 +1,143 @@
+"""Unattended installation for fleets: options in, one JSON result out.
+
+Usage: python3 -m snipaster.provision [--config FILE] [options] [--plan|--force]
+
+Runs the same step graph as the interactive installers, but never prompts:
+apt-get goes through ``sudo -n`` (or runs directly as root), and nothing is
+drawn or written outside the user's own config. Concurrent runs for the same
+user serialise on a lock file, and a host whose last install used the same
+inputs is reported as converged without doing any work.
+
+--plan reports what would change (the "changes" list) without changing it.
+
+Exit codes: 0 installed or already converged, 1 a step failed or an
+unexpected error, 2 bad options or config file, 3 changes pending (--plan
+only). Errors are reported as {"status": "error", ...} on stdout too.
+"""
+import argparse
+import fcntl
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+from snipaster.backend import CONFIG_DIR
+from snipaster.config import ConfigError, add_arguments, options_from_args
+from snipaster.deps import REQUIRED_PACKAGES, PhaseTimer, probe_packages
+from snipaster.install import fingerprint, install_steps, record_install
+from snipaster.plan import Plan
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_PENDING = 3
+LOCK_PATH = os.path.join(CONFIG_DIR, "install.lock")
+
+
+class JSONArgumentParser(argparse.ArgumentParser):
+    """Raise ConfigError for bad options instead of printing usage and exiting."""
+
+    def error(self, message):
+        raise ConfigError(message)
+
+
+def error_result(code, message):
+    return {"status": "error", "exit_code": code, "error": message}
+
+
+def emit(result):
+    json.dump(result, sys.stdout, indent=2)
+    print()
+    return result["exit_code"]
+
+
+@contextmanager
+def install_lock(path=LOCK_PATH):
+    """Hold an exclusive lock so two runs never install over each other."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def provision(options, force=False, dry_run=False):
+    """Install for options unless already converged; return the result dict.
+
+    With dry_run nothing is changed and the result lists what would be.
+    """
+    start = time.perf_counter()
+    skipped = {"status": "converged", "exit_code": EXIT_OK, "changes": [], "steps": {}}
+    if not force and Plan(dry_run).converged(fingerprint(options)):
+        return dict(skipped, seconds=round(time.perf_counter() - start, 4))
+
+    with install_lock():
+        # Another run may have finished the job while we waited
+        plan = Plan(dry_run)
+        if not force and plan.converged(fingerprint(options)):
+            return dict(skipped, seconds=round(time.perf_counter() - start, 4))
+        timer = PhaseTimer()
+        with timer.phase("probe"):
+            missing = probe_packages(REQUIRED_PACKAGES)
+        graph = install_steps(missing, timer, options, interactive=False, plan=plan)
+        ok = graph.run()
+        if ok:
+            record_install(options, plan)
+
+    if not ok:
+        status, code = "failed", EXIT_FAILED
+    elif dry_run:
+        status = "pending" if plan.changes else "converged"
+        code = EXIT_PENDING if plan.changes else EXIT_OK
+    else:
+        status, code = ("installed" if plan.changes else "converged"), EXIT_OK
+    return {
+        "status": status,
+        "exit_code": code,
+        "seconds": round(time.perf_counter() - start, 4),
+        "missing_packages": missing,
+        "changes": plan.changes,
+        "steps": graph.results(),
+        "critical_path": [step.name for step in graph.critical_path()],
+        "timings": {name: round(secs, 4) for name, secs in timer.timings.items()},
+    }
+
+
+def main(argv=None):
+    parser = JSONArgumentParser(
+        prog="python3 -m snipaster.provision",
+        description="Install Snipaster without prompts and report JSON.",
+    )
+    add_arguments(parser)
+    parser.add_argument(
+        "--no-install-packages",
+        dest="install_packages",
+        action="store_false",
+        default=None,
+        help="fail instead of running apt-get when packages are missing",
+    )
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--plan", action="store_true", help="only report what would change"
+    )
+    mode.add_argument(
+        "--force", action="store_true", help="install even if already converged"
+    )
+    try:
+        args = parser.parse_args(argv)
+        options = options_from_args(args)
+    except ConfigError as e:
+        return emit(error_result(EXIT_USAGE, str(e)))
+
+    try:
+        result = provision(options, force=args.force, dry_run=args.plan)
+    except Exception as e:
+        return emit(error_result(EXIT_FAILED, f"{type(e).__name__}: {e}"))
+    return emit(result)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""Recent captures kept in memory so they can be copied again.
+
+snipaster-daemon holds the PNG data of its last few captures, as the save
+stage already has it, in a cache bounded by count and by bytes. Then
+`snipaster recopy N` puts the Nth most recent capture back on the clipboard
+without reading it from disk. Older captures, or any capture when the
+daemon is not running, are read back through the library index.
+
+Command line: snipaster recopy [N] (or python3 -m snipaster.recent [N])
+"""
+import argparse
+import sys
+import threading
+from collections import OrderedDict
+
+from snipaster.encode import ImageSource
+
+MAX_ENTRIES = 10
+MAX_BYTES = 256 << 20
+
+
+class RecentCaptures:
+    """Bounded map of the newest captures' paths to their PNG data.
+
+    Only the encoded bytes are kept, so the byte bound is what the cache
+    really holds; each get() decodes into a fresh ImageSource that is
+    freed with its user. The oldest captures are dropped first once either
+    bound is exceeded.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def add(self, path, data):
+        with self._lock:
+            if path in self._entries:
+                self._bytes -= len(self._entries.pop(path))
+            self._entries[path] = data
+            self._bytes += len(data)
+            while self._entries and (
+                len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+            ):
+                _, dropped = self._entries.popitem(last=False)
+                self._bytes -= len(dropped)
+
+    def get(self, n=1):
+        """Return (path, ImageSource) of the nth newest capture (1 = newest)."""
+        with self._lock:
+            if not 1 <= n <= len(self._entries):
+                return None
+            path = list(self._entries)[-n]
+            return path, ImageSource(self._entries[path])
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+def from_library(library, n=1):
+    """Return (path, source) of the nth newest indexed PNG capture, or None."""
+    paths = library.recent(n)
+    if len(paths) < n or not paths[n - 1].endswith(".png"):
+        return None
+    path = paths[n - 1]
+    try:
+        with open(path, "rb") as f:
+            return path, ImageSource(f.read())
+    except FileNotFoundError:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="snipaster recopy",
+        description="Put a recent capture back on the clipboard.",
+    )
+    parser.add_argument(
+        "n", nargs="?", type=int, default=1, help="how many captures back (1 = last)"
+    )
+    args = parser.parse_args(argv)
+    if args.n < 1:
+        parser.error("N must be 1 or more")
+
+    from snipaster.client import request
+    from snipaster.daemon import socket_path
+
+    try:
+        reply = request(socket_path(), f"recopy {args.n}")
+    except OSError:
+        reply = None
+    if reply:
+        status, _, detail = reply.partition(" ")
+        print(detail, file=sys.stdout if status == "ok" else sys.stderr)
+        return 0 if status == "ok" else 1
+
+    # No daemon: read the capture back from disk and use the clipboard tool
+    from snipaster.backend import load_or_detect
+    from snipaster.library import Library
+    from snipaster.pipeline import copy_to_clipboard
+
+    library = Library()
+    try:
+        found = from_library(library, args.n)
+    finally:
+        library.close()
+    if found is None:
+        print(f"No PNG capture {args.n} back", file=sys.stderr)
+        return 1
+    path, source = found
+    copy_to_clipboard(load_or_detect(), path, source.png)
+    print(path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
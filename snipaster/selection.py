@@ -0,0 +1,132 @@
+"""In-process rubber-band region selection on X11 (needs python-xlib).
+
+Used by the hotkey listener so the selector appears without starting a
+capture tool. The rectangle is drawn with an XOR GC straight onto the root
+window, the way scrot -s does it, so no window has to be mapped first.
+Clicking without dragging selects the window under the pointer.
+"""
+try:
+    from Xlib import X
+except ImportError:
+    X = None
+
+# Glyphs of the X "cursor" font
+XC_CROSSHAIR = 34
+# Drags smaller than this (in pixels) count as a click
+CLICK_SLOP = 3
+
+
+def available():
+    """Whether python-xlib is installed."""
+    return X is not None
+
+
+def grab(display, root, cursor):
+    """Grab pointer and keyboard; return True once both are held."""
+    status = root.grab_pointer(
+        False,
+        X.ButtonPressMask | X.ButtonReleaseMask | X.PointerMotionMask,
+        X.GrabModeAsync,
+        X.GrabModeAsync,
+        X.NONE,
+        cursor,
+        X.CurrentTime,
+    )
+    if status != X.GrabSuccess:
+        return False
+    status = root.grab_keyboard(False, X.GrabModeAsync, X.GrabModeAsync, X.CurrentTime)
+    if status != X.GrabSuccess:
+        display.ungrab_pointer(X.CurrentTime)
+        return False
+    return True
+
+
+def window_at(root):
+    """Return the (x, y, width, height) of the top-level window under the pointer."""
+    child = root.query_pointer().child
+    if not child:
+        geometry = root.get_geometry()
+        return 0, 0, geometry.width, geometry.height
+    geometry = child.get_geometry()
+    border = geometry.border_width
+    return (
+        geometry.x,
+        geometry.y,
+        geometry.width + 2 * border,
+        geometry.height + 2 * border,
+    )
+
+
+def normalise(start, end):
+    """The rectangle spanned by two corners, as (x, y, width, height)."""
+    (x0, y0), (x1, y1) = start, end
+    return min(x0, x1), min(y0, y1), abs(x1 - x0) + 1, abs(y1 - y0) + 1
+
+
+def select_region(display, on_ready=None):
+    """Let the user drag out a region on display's default screen.
+
+    on_ready() is called as soon as the grabs are held, i.e. when the
+    selector is visible. Returns (x, y, width, height), or None when the
+    selection was cancelled with a key press or a grab could not be taken.
+    """
+    screen = display.screen()
+    root = screen.root
+    font = display.open_font("cursor")
+    cursor = font.create_glyph_cursor(
+        font, XC_CROSSHAIR, XC_CROSSHAIR + 1, (65535, 65535, 65535), (0, 0, 0)
+    )
+    gc = root.create_gc(
+        function=X.GXxor,
+        foreground=screen.white_pixel ^ screen.black_pixel,
+        subwindow_mode=X.IncludeInferiors,
+        line_width=1,
+    )
+    try:
+        if not grab(display, root, cursor):
+            return None
+        if on_ready is not None:
+            on_ready()
+        return _track(display, root, gc)
+    finally:
+        display.ungrab_keyboard(X.CurrentTime)
+        display.ungrab_pointer(X.CurrentTime)
+        gc.free()
+        cursor.free()
+        font.close()
+        # Wait until the server has erased the rubber band, or the grab that
+        # follows could still see the XOR outline on screen
+        display.sync()
+
+
+def _track(display, root, gc):
+    start = drawn = None
+    while True:
+        event = display.next_event()
+        if event.type == X.KeyPress:
+            region = None
+            break
+        if event.type == X.ButtonPress and start is None:
+            if event.detail != 1:
+                region = None
+                break
+            start = (event.root_x, event.root_y)
+        elif event.type == X.MotionNotify and start is not None:
+            # Only draw for the newest position; skip queued motion
+            if display.pending_events():
+                continue
+            rect = normalise(start, (event.root_x, event.root_y))
+            if drawn is not None:
+                root.rectangle(gc, *drawn)
+            root.rectangle(gc, *rect)
+            drawn = rect
+            display.flush()
+        elif event.type == X.ButtonRelease and start is not None:
+            region = normalise(start, (event.root_x, event.root_y))
+            if region[2] < CLICK_SLOP and region[3] < CLICK_SLOP:
+                region = window_at(root)
+            break
+    if drawn is not None:
+        # XOR again to erase the last rectangle
+        root.rectangle(gc, *drawn)
+    return region
@@ -0,0 +1,233 @@
+"""Take a screenshot with a resolved backend.
+
+This is the Python counterpart of the wrapper script, used by the daemon so
+the per-shot work is only the capture tool itself.
+"""
+import os
+import subprocess
+import sys
+import tempfile
+
+from snipaster.encode import ImageSource
+from snipaster.naming import ALLOCATOR, publish, shard_directory
+from snipaster.pipeline import Pipeline, Timeline, notify
+
+SCREENSHOT_DIR = os.path.expanduser("~/Pictures/Screenshots")
+
+
+class CaptureError(Exception):
+    """Raised when no usable capture tool is available."""
+
+
+def encoder_args(backend):
+    """Extra capture tool arguments for the configured clipboard encoder."""
+    if backend.get("encoder") != "png-fast":
+        return []
+    # Lowest PNG compression: grim takes a zlib level, scrot a 1-100 quality
+    return {"grim": ["-l", "1"], "scrot": ["-q", "100"]}.get(backend["capture"], [])
+
+
+def region_args(backend, region):
+    """Capture tool arguments for an already selected (x, y, width, height)."""
+    x, y, width, height = region
+    if backend["capture"] == "scrot":
+        return ["-a", f"{x},{y},{width},{height}"]
+    if backend["capture"] == "grim":
+        return ["-g", f"{x},{y} {width}x{height}"]
+    raise CaptureError(f"{backend['capture']} cannot capture a given region")
+
+
+def fake_region(env=None):
+    """The (x, y, width, height) in SNIPASTER_FAKE_REGION, or None.
+
+    Set by the benchmarks to replace the interactive selection, as in the
+    wrapper script.
+    """
+    env = os.environ if env is None else env
+    value = env.get("SNIPASTER_FAKE_REGION")
+    if not value:
+        return None
+    try:
+        x, y, width, height = (int(part) for part in value.split(","))
+    except ValueError:
+        raise CaptureError(f"SNIPASTER_FAKE_REGION must be X,Y,W,H, not {value!r}")
+    return x, y, width, height
+
+
+def capture(backend, path, region=None):
+    """Run the region capture, writing the image to path.
+
+    Without region the tool's own interactive selector is used.
+    """
+    tools = backend["tools"]
+    if region is not None and backend["capture"] in ("grim", "scrot"):
+        subprocess.run(
+            [
+                tools[backend["capture"]],
+                *encoder_args(backend),
+                *region_args(backend, region),
+                path,
+            ]
+        )
+    elif backend["capture"] == "gnome-screenshot":
+        subprocess.run([tools["gnome-screenshot"], "-a", "-f", path])
+    elif backend["capture"] == "grim":
+        region = subprocess.run(
+            [tools["slurp"]], stdout=subprocess.PIPE, text=True
+        ).stdout.strip()
+        if region:
+            subprocess.run(
+                [tools["grim"], *encoder_args(backend), "-g", region, path]
+            )
+    elif backend["capture"] == "scrot":
+        subprocess.run([tools["scrot"], *encoder_args(backend), "-s", path])
+    else:
+        if backend["session"] == "wayland":
+            message = "No screenshot tool found (gnome-screenshot or grim)"
+        else:
+            message = "scrot not found"
+        notify(backend, message)
+        raise CaptureError(message)
+
+
+def capture_bytes(backend, region=None):
+    """Run the region capture and return the encoded PNG.
+
+    grim and scrot stream the image on stdout. gnome-screenshot can only
+    write a file, so it writes to the runtime directory (normally a tmpfs)
+    instead of the possibly network-mounted home directory.
+    Returns None if the selection was cancelled.
+    """
+    tools = backend["tools"]
+    if region is not None and backend["capture"] in ("grim", "scrot"):
+        result = subprocess.run(
+            [
+                tools[backend["capture"]],
+                *encoder_args(backend),
+                *region_args(backend, region),
+                "-",
+            ],
+            stdout=subprocess.PIPE,
+        )
+    elif backend["capture"] == "grim":
+        region = subprocess.run(
+            [tools["slurp"]], stdout=subprocess.PIPE, text=True
+        ).stdout.strip()
+        if not region:
+            return None
+        result = subprocess.run(
+            [tools["grim"], *encoder_args(backend), "-g", region, "-"],
+            stdout=subprocess.PIPE,
+        )
+    elif backend["capture"] == "scrot":
+        result = subprocess.run(
+            [tools["scrot"], *encoder_args(backend), "-s", "-"],
+            stdout=subprocess.PIPE,
+        )
+    elif backend["capture"] == "gnome-screenshot":
+        runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+        fd, tmp_path = tempfile.mkstemp(suffix=".png", dir=runtime_dir)
+        os.close(fd)
+        try:
+            capture(backend, tmp_path)
+            with open(tmp_path, "rb") as f:
+                return f.read() or None
+        finally:
+            os.unlink(tmp_path)
+    else:
+        # Reports the missing tool and raises CaptureError
+        capture(backend, None)
+    if result.returncode != 0:
+        return None
+    return result.stdout or None
+
+
+def take_screenshot(
+    backend,
+    directory=SCREENSHOT_DIR,
+    pipeline=None,
+    in_memory=False,
+    select=None,
+    grabber=None,
+    portal=None,
+):
+    """Capture a region and run the post-capture pipeline on it.
+
+    With in_memory the image goes from the capture tool straight to the
+    clipboard and the Screenshots folder is written afterwards in the
+    background. select, when given, is called with the Timeline and picks
+    the region itself (see snipaster.selection) instead of the capture
+    tool's selector. The selected region is then grabbed in-process with
+    grabber (a snipaster.xshm.ShmGrabber) when one is given, falling back to
+    the capture tool. On Wayland, portal (a snipaster.portal.PortalCapture)
+    takes the capture instead of the tool when given; with in_memory its PNG
+    is read back and the folder is written afterwards, as for the tools.
+    Returns a PendingShot as soon as the image is on the clipboard, or None
+    if the user cancelled the selection.
+    """
+    timeline = Timeline()
+    region = fake_region()
+    if select is not None:
+        region = select(timeline)
+        if region is None:
+            return None
+        timeline.mark("selected")
+    directory = shard_directory(directory, backend.get("shard"))
+    path = ALLOCATOR.next_path(directory)
+    pipeline = pipeline or Pipeline(backend)
+
+    if region is not None and grabber is not None:
+        from snipaster.xshm import XShmError
+
+        try:
+            raw = grabber.grab(*region)
+        except XShmError as e:
+            print(
+                f"MIT-SHM capture failed, using {backend['capture']}: {e}",
+                file=sys.stderr,
+            )
+        else:
+            timeline.mark("captured")
+            # Encoded only where needed; the archival encoder skips a decode
+            return pipeline.run(path, timeline, None, ImageSource(raw=raw))
+
+    if portal is not None:
+        from snipaster.portal import PortalError
+
+        tmp_path = ALLOCATOR.temp_path(directory)
+        try:
+            if in_memory:
+                data = portal.capture_bytes(region)
+                taken = data is not None
+            else:
+                taken = portal.capture(tmp_path, region)
+        except PortalError as e:
+            print(
+                f"Portal capture failed, using {backend['capture']}: {e}",
+                file=sys.stderr,
+            )
+        else:
+            if not taken:
+                return None
+            if in_memory:
+                timeline.mark("captured")
+                return pipeline.run(path, timeline, data)
+            path = publish(tmp_path, path)
+            timeline.mark("captured")
+            return pipeline.run(path, timeline)
+
+    if in_memory:
+        data = capture_bytes(backend, region)
+        if data is None:
+            return None
+        timeline.mark("captured")
+        return pipeline.run(path, timeline, data)
+
+    # The tool writes a scratch file that is linked into place once complete
+    tmp_path = ALLOCATOR.temp_path(directory)
+    capture(backend, tmp_path, region)
+    if not os.path.exists(tmp_path):
+        return None
+    path = publish(tmp_path, path)
+    timeline.mark("captured")
+    return pipeline.run(path, timeline)
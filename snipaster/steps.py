@@ -0,0 +1,171 @@
+"""Installer steps as an explicit dependency graph with real timings."""
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from snipaster.deps import PhaseTimer
+
+
+class Step:
+    """One unit of installer work and the steps it has to wait for."""
+
+    def __init__(self, name, func, after=(), label=None, resources=()):
+        self.name = name
+        self.func = func
+        self.after = tuple(after)
+        self.label = label or name
+        self.resources = tuple(sorted(resources))
+        self.status = "pending"
+        self.detail = None
+        self.error = None
+        self.started = None
+        self.finished = None
+
+    @property
+    def seconds(self):
+        if self.started is None or self.finished is None:
+            return 0.0
+        return self.finished - self.started
+
+    def result(self):
+        """Summarise the step as a plain dict."""
+        result = {"status": self.status, "seconds": round(self.seconds, 4)}
+        if self.detail is not None:
+            result["detail"] = self.detail
+        if self.error is not None:
+            result["error"] = self.error
+        return result
+
+
+class StepGraph:
+    """Run named steps in dependency order, recording how long each took.
+
+    A step's function takes no arguments and may return a short detail
+    string. Steps whose dependencies are done run concurrently on a thread
+    pool; steps naming the same resource (such as the apt lock) are never
+    started while another holds it. When a step raises, the steps that
+    depend on it are skipped and the rest still run. on_event(kind, step)
+    is called with kind "start", "done", "failed" or "skipped" as the run
+    progresses, from whichever thread ran the step.
+    """
+
+    def __init__(self):
+        self.steps = {}
+        self.timer = PhaseTimer()
+        self.started = None
+        self.finished = None
+
+    def add(self, name, func, after=(), label=None, resources=()):
+        for dep in after:
+            if dep not in self.steps:
+                raise ValueError(f"step {name!r} depends on unknown step {dep!r}")
+        self.steps[name] = Step(name, func, after, label, resources)
+        return self.steps[name]
+
+    def _blocked(self, step):
+        return any(self.steps[dep].status != "done" for dep in step.after)
+
+    def _ready(self, step):
+        return all(
+            self.steps[dep].status in ("done", "failed", "skipped")
+            for dep in step.after
+        )
+
+    def _run_step(self, step, on_event):
+        on_event("start", step)
+        step.started = time.perf_counter()
+        try:
+            with self.timer.phase(step.name):
+                step.detail = step.func()
+        except Exception as e:
+            step.status = "failed"
+            step.error = str(e) or type(e).__name__
+        else:
+            step.status = "done"
+        step.finished = time.perf_counter()
+        on_event(step.status, step)
+
+    def run(self, on_event=None, workers=4):
+        """Run every step; return True when none failed or was skipped."""
+        on_event = on_event or (lambda kind, step: None)
+        self.started = time.perf_counter()
+        pending = list(self.steps.values())
+        running = {}
+        busy = set()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while pending or running:
+                for step in [step for step in pending if self._ready(step)]:
+                    if self._blocked(step):
+                        pending.remove(step)
+                        step.status = "skipped"
+                        on_event("skipped", step)
+                    elif not busy.intersection(step.resources):
+                        pending.remove(step)
+                        busy.update(step.resources)
+                        step.status = "running"
+                        future = executor.submit(self._run_step, step, on_event)
+                        running[future] = step
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    step = running.pop(future)
+                    busy.difference_update(step.resources)
+                    future.result()
+        self.finished = time.perf_counter()
+        return self.ok
+
+    @property
+    def ok(self):
+        return all(step.status == "done" for step in self.steps.values())
+
+    @property
+    def seconds(self):
+        if self.started is None or self.finished is None:
+            return 0.0
+        return self.finished - self.started
+
+    def failures(self):
+        """Return the steps that failed, in declaration order."""
+        return [step for step in self.steps.values() if step.status == "failed"]
+
+    def results(self):
+        """Map step name to its status, duration and detail."""
+        return {name: step.result() for name, step in self.steps.items()}
+
+    def critical_path(self):
+        """Return the chain of steps that determined the total run time.
+
+        Starting from the step that finished last, repeatedly step back to
+        whatever it waited for: the dependency, or the earlier holder of a
+        shared resource, that finished last before it started.
+        """
+        timed = [step for step in self.steps.values() if step.finished is not None]
+        if not timed:
+            return []
+        step = max(timed, key=lambda step: step.finished)
+        path = [step]
+        while True:
+            deps = [self.steps[dep] for dep in step.after] + [
+                other
+                for other in timed
+                if other is not step
+                and set(other.resources).intersection(step.resources)
+                and other.finished <= step.started
+            ]
+            deps = [dep for dep in deps if dep.finished is not None]
+            if not deps:
+                break
+            step = max(deps, key=lambda step: step.finished)
+            path.append(step)
+        return path[::-1]
+
+    def report(self):
+        """Format the step durations as a single line."""
+        return self.timer.report()
+
+    def critical_report(self):
+        """Format the critical path and the graph's wall-clock time."""
+        path = " -> ".join(
+            f"{step.name} {step.seconds:.2f}s" for step in self.critical_path()
+        )
+        return f"{path} (total {self.seconds:.2f}s)"
@@ -0,0 +1,117 @@
+"""Thumbnails of saved captures in the freedesktop thumbnail cache.
+
+File managers look for $XDG_CACHE_HOME/thumbnails/<flavour>/<md5 of the
+file URI>.png before decoding an image themselves, which is slow for
+thousands of 4K captures. The save stage writes these thumbnails straight
+away from the pixels it already holds. They carry the Thumb::URI and
+Thumb::MTime tags of the Thumbnail Managing Standard, so viewers trust them
+until the file changes.
+"""
+import hashlib
+import os
+from urllib.parse import quote
+
+from snipaster import png
+from snipaster.encode import RawImage, pillow
+from snipaster.fsutil import atomic_write
+
+THUMBNAIL_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+    "thumbnails",
+)
+# Flavour -> longest side in pixels, largest first so each is scaled from
+# the previous one rather than from the full capture
+FLAVOURS = {"large": 256, "normal": 128}
+# Characters GLib leaves unescaped in file URIs; the hash must match theirs
+URI_SAFE = "/!$&'()*+,:=@"
+MODES = {1: "L", 2: "LA", 3: "RGB", 4: "RGBA"}
+
+
+def file_uri(path):
+    return "file://" + quote(os.path.abspath(path), safe=URI_SAFE)
+
+
+def thumbnail_path(path, flavour="normal", root=THUMBNAIL_DIR):
+    """Where the thumbnail of path is looked up."""
+    digest = hashlib.md5(file_uri(path).encode()).hexdigest()
+    return os.path.join(root, flavour, digest + ".png")
+
+
+def scaled_size(width, height, longest):
+    """Fit width x height into longest x longest; never scale up."""
+    if max(width, height) <= longest:
+        return width, height
+    if width >= height:
+        return longest, max(1, height * longest // width)
+    return max(1, width * longest // height), longest
+
+
+def downscale(raw, width, height):
+    """Return raw scaled to width x height."""
+    if (width, height) == (raw.width, raw.height):
+        return raw
+    Image = pillow()
+    if Image is not None:
+        mode = MODES[raw.channels]
+        image = Image.frombytes(mode, (raw.width, raw.height), raw.pixels)
+        image = image.resize((width, height), Image.BILINEAR, reducing_gap=2.0)
+        return RawImage(width, height, raw.channels, image.tobytes())
+    # Nearest neighbour: a few thousand slices, fine for thumbnail sizes
+    channels = raw.channels
+    stride = raw.width * channels
+    columns = [(x * raw.width // width) * channels for x in range(width)]
+    pixels = bytearray()
+    for y in range(height):
+        start = (y * raw.height // height) * stride
+        row = raw.pixels[start : start + stride]
+        for offset in columns:
+            pixels += row[offset : offset + channels]
+    return RawImage(width, height, channels, bytes(pixels))
+
+
+def tag(data, fields):
+    """Add tEXt chunks for fields to PNG data, right after IHDR."""
+    text = b"".join(
+        png.chunk(b"tEXt", key.encode("latin-1") + b"\0" + value.encode("latin-1"))
+        for key, value in fields.items()
+    )
+    # Signature (8) + IHDR length, type, 13 bytes of payload and CRC
+    end = len(png.SIGNATURE) + 8 + 13 + 4
+    return data[:end] + text + data[end:]
+
+
+def write_thumbnails(path, source, root=THUMBNAIL_DIR):
+    """Write every thumbnail flavour of the capture at path.
+
+    source is the capture's ImageSource; its raw pixels are used when it
+    already has them. Returns the thumbnail paths.
+    """
+    stat = os.stat(path)
+    raw = source.raw
+    fields = {
+        "Thumb::URI": file_uri(path),
+        "Thumb::MTime": str(int(stat.st_mtime)),
+        "Thumb::Size": str(stat.st_size),
+        "Thumb::Image::Width": str(raw.width),
+        "Thumb::Image::Height": str(raw.height),
+        "Software": "Snipaster",
+    }
+    written = []
+    for flavour, longest in FLAVOURS.items():
+        raw = downscale(raw, *scaled_size(raw.width, raw.height, longest))
+        data = png.encode(raw.width, raw.height, raw.channels, raw.pixels)
+        target = thumbnail_path(path, flavour, root)
+        # The standard asks for private permissions on the cache
+        os.makedirs(os.path.dirname(target), mode=0o700, exist_ok=True)
+        atomic_write(target, tag(data, fields), 0o600)
+        written.append(target)
+    return written
+
+
+def remove_thumbnails(path, root=THUMBNAIL_DIR):
+    """Delete the thumbnails of a capture that is going away."""
+    for flavour in FLAVOURS:
+        try:
+            os.unlink(thumbnail_path(path, flavour, root))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,181 @@
+"""Per-capture latency traces and the `snipaster stats` report.
+
+Every capture appends one JSON line to a size-capped log: when and how it
+was taken (via the daemon socket, the hotkey listener or the wrapper
+script), the session and tools used, and the milliseconds from the start of
+the capture to each stage (selector, selected, captured, clipboard, saved,
+...). The log is a two-file ring: once trace.log would pass MAX_BYTES it
+becomes trace.log.1 and a new file is started, so at most twice MAX_BYTES
+is ever kept.
+
+Command line: python3 -m snipaster.trace {record,stats}, or `snipaster stats`.
+"""
+import argparse
+import fcntl
+import json
+import os
+import sys
+import time
+
+STATE_DIR = os.path.join(
+    os.environ.get("XDG_STATE_HOME") or os.path.expanduser("~/.local/state"),
+    "snipaster",
+)
+TRACE_PATH = os.path.join(STATE_DIR, "trace.log")
+MAX_BYTES = 256 << 10
+PERCENTILES = (50, 95, 99)
+GROUPS = ("capture", "clipboard", "via", "session")
+
+
+def make_trace(backend, via, stages, outcome="ok", when=None):
+    """Build a trace record; stages maps stage name to ms since the start."""
+    return {
+        "t": round(time.time() if when is None else when, 3),
+        "via": via,
+        "session": backend.get("session", ""),
+        "capture": backend.get("capture") or "",
+        "clipboard": backend.get("clipboard") or "",
+        "outcome": outcome,
+        "stages": {stage: round(ms, 2) for stage, ms in stages.items()},
+    }
+
+
+def record(trace, path=TRACE_PATH, max_bytes=MAX_BYTES):
+    """Append trace to the log at path, rotating it when it is full."""
+    line = (json.dumps(trace, separators=(",", ":")) + "\n").encode()
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    # The wrapper script and the daemon may record at the same moment; the
+    # lock keeps one from rotating away the file the other just rotated
+    with open(path + ".lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            size = 0
+        if size and size + len(line) > max_bytes:
+            os.replace(path, path + ".1")
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+
+def read_traces(path=TRACE_PATH):
+    """Return every readable trace in the log, oldest first."""
+    traces = []
+    for name in (path + ".1", path):
+        try:
+            with open(name, encoding="utf-8") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            continue
+        for line in lines:
+            try:
+                trace = json.loads(line)
+            except ValueError:
+                # A line cut short by a crash or a concurrent rotation
+                continue
+            if isinstance(trace, dict) and isinstance(trace.get("stages"), dict):
+                traces.append(trace)
+    return traces
+
+
+def percentile(ordered, q):
+    """Nearest-rank percentile q (0-100) of an already sorted list."""
+    return ordered[int(q / 100 * (len(ordered) - 1))]
+
+
+def summarise(traces, by="capture"):
+    """Return one row per (group, stage) with run count and percentiles."""
+    samples = {}
+    for trace in traces:
+        if trace.get("outcome", "ok") != "ok":
+            continue
+        group = trace.get(by) or "-"
+        for stage, ms in trace["stages"].items():
+            samples.setdefault((group, stage), []).append(ms)
+    rows = []
+    for (group, stage), values in samples.items():
+        values.sort()
+        row = {by: group, "stage": stage, "runs": len(values)}
+        for q in PERCENTILES:
+            row[f"p{q}_ms"] = round(percentile(values, q), 2)
+        rows.append(row)
+    # Stages in the order a capture goes through them
+    rows.sort(key=lambda row: (row[by], row["p50_ms"]))
+    return rows
+
+
+def print_report(rows, by, traces):
+    failed = sum(1 for trace in traces if trace.get("outcome", "ok") != "ok")
+    print(f"{len(traces)} captures traced, {failed} failed")
+    if not rows:
+        return
+    header = f"{by:<18}{'stage':<14}{'runs':>6}"
+    print(header + "".join(f"{f'p{q} ms':>10}" for q in PERCENTILES))
+    for row in rows:
+        line = f"{row[by]:<18}{row['stage']:<14}{row['runs']:>6}"
+        print(line + "".join(f"{row[f'p{q}_ms']:>10.1f}" for q in PERCENTILES))
+
+
+def parse_marks(marks):
+    """Turn STAGE=EPOCHSECONDS arguments into (start, {stage: ms since start}).
+
+    The start is the "start" mark, or else the earliest one.
+    """
+    times = {}
+    for mark in marks:
+        stage, _, when = mark.partition("=")
+        # bash's $EPOCHREALTIME uses the locale's decimal separator
+        times[stage] = float(when.replace(",", "."))
+    start = times.pop("start", min(times.values(), default=0.0))
+    return start, {stage: (when - start) * 1000 for stage, when in times.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Snipaster capture latency traces.")
+    parser.add_argument("--log", default=TRACE_PATH, help="trace log")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser(
+        "record", help="append a trace (used by the wrapper script)"
+    )
+    add.add_argument("--via", default="script")
+    add.add_argument("--session", default="")
+    add.add_argument("--capture", default="")
+    add.add_argument("--clipboard", default="")
+    add.add_argument("--outcome", default="ok")
+    add.add_argument(
+        "marks", nargs="+", metavar="STAGE=TIME", help="epoch seconds per stage"
+    )
+    stats = commands.add_parser(
+        "stats", help="p50/p95/p99 latency per stage and backend"
+    )
+    stats.add_argument("--by", choices=GROUPS, default="capture")
+    stats.add_argument("--json", action="store_true", help="print rows as JSON")
+    args = parser.parse_args(argv)
+
+    if args.command == "record":
+        try:
+            start, stages = parse_marks(args.marks)
+        except ValueError:
+            parser.error("marks must look like STAGE=EPOCHSECONDS")
+        backend = {
+            "session": args.session,
+            "capture": args.capture,
+            "clipboard": args.clipboard,
+        }
+        record(make_trace(backend, args.via, stages, args.outcome, start), args.log)
+    elif args.command == "stats":
+        traces = read_traces(args.log)
+        rows = summarise(traces, args.by)
+        if args.json:
+            json.dump(rows, sys.stdout, indent=2)
+            print()
+        else:
+            print_report(rows, args.by, traces)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
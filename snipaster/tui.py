@@ -0,0 +1,251 @@
+"""The animated installer UI, imported only when there is a terminal for it.
+
+Everything here depends on asciimatics; the installation itself lives in
+snipaster.install and runs without it.
+"""
+import time
+
+from asciimatics.effects import Effect, Print
+from asciimatics.event import KeyboardEvent
+from asciimatics.exceptions import StopApplication
+from asciimatics.renderers import FigletText, Plasma, Rainbow
+from asciimatics.scene import Scene
+from asciimatics.screen import Screen
+
+from snipaster.install import RENDER_LEVELS
+
+INSTALL_NAME = "SNIPASTER"
+# Frames between title recolours in lite mode.
+LITE_SPEED = 5
+# Per-frame budgets; asciimatics aims for one frame every 50ms.
+FRAME_CPU_BUDGET = 0.02
+FRAME_INTERVAL_BUDGET = 0.075
+
+
+class CheckInstallStatus(Effect):
+    """Effect to stop the animation once the installation has finished."""
+
+    def __init__(self, screen, progress, min_display=0.0, **kwargs):
+        super(CheckInstallStatus, self).__init__(screen, **kwargs)
+        self._progress = progress
+        self._min_display = min_display
+
+    def _update(self, frame_no):
+        if (
+            self._progress.outcome is not None
+            and time.monotonic() - self._progress.started >= self._min_display
+        ):
+            raise StopApplication("Install Complete")
+
+    @property
+    def stop_frame(self):
+        return 0
+
+    def process_event(self, event):
+        # Allow quitting with 'q'
+        if isinstance(event, KeyboardEvent):
+            if event.key_code == ord("q") or event.key_code == ord("Q"):
+                raise StopApplication("User Cancelled")
+        return event
+
+    def reset(self):
+        pass
+
+
+class StatusText(Effect):
+    """Effect to display the current installation status.
+
+    The status rows are kept out of the animated background, so they are
+    only repainted when an event changes the message or the progress.
+    """
+
+    def __init__(self, screen, progress, y, **kwargs):
+        super(StatusText, self).__init__(screen, **kwargs)
+        self._progress = progress
+        self._y = y
+        self._dirty = True
+
+    def _update(self, frame_no):
+        if not self._progress.drain() and not self._dirty:
+            return
+        self._dirty = False
+
+        # Center the text
+        msg = f" {self._progress.message} "
+        x = max(0, (self._screen.width - len(msg)) // 2)
+        y = self._y
+
+        # Clear line area first (simple clear)
+        self._screen.print_at(" " * self._screen.width, 0, y, bg=Screen.COLOUR_BLACK)
+        self._screen.print_at(
+            msg, x, y, colour=Screen.COLOUR_CYAN, bg=Screen.COLOUR_BLACK
+        )
+
+        # Loading bar
+        bar_width = min(40, self._screen.width - 4)
+        if bar_width > 0:
+            filled_len = int(round(self._progress.fraction * bar_width))
+            bar_content = "=" * filled_len + " " * (bar_width - filled_len)
+            bar = f"[{bar_content}]"
+            bx = max(0, (self._screen.width - len(bar)) // 2)
+            by = y + 2
+
+            self._screen.print_at(
+                " " * self._screen.width, 0, by, bg=Screen.COLOUR_BLACK
+            )
+            self._screen.print_at(
+                bar, bx, by, colour=Screen.COLOUR_GREEN, bg=Screen.COLOUR_BLACK
+            )
+
+    @property
+    def stop_frame(self):
+        return 0
+
+    def reset(self):
+        self._dirty = True
+
+
+class RenderTooSlow(Exception):
+    """Raised from inside the scene to restart it at a cheaper level."""
+
+
+class FrameStart(Effect):
+    """Mark the start of a frame's effect updates for FrameMonitor."""
+
+    def __init__(self, screen, clock, **kwargs):
+        super(FrameStart, self).__init__(screen, **kwargs)
+        self._clock = clock
+
+    def _update(self, frame_no):
+        self._clock["start"] = time.perf_counter()
+
+    @property
+    def stop_frame(self):
+        return 0
+
+    def reset(self):
+        pass
+
+
+class FrameMonitor(Effect):
+    """Measure what each frame costs and ask for a cheaper level if needed.
+
+    Two costs are tracked over a sliding window: the CPU time spent in the
+    effects themselves, and the interval between frames, which grows past
+    the 50ms asciimatics frame when the terminal cannot take the output
+    (a slow SSH link, say). Either one running over budget for most of the
+    window raises RenderTooSlow.
+    """
+
+    def __init__(self, screen, clock, window=20, **kwargs):
+        super(FrameMonitor, self).__init__(screen, **kwargs)
+        self._clock = clock
+        self._window = window
+        self._costs = []
+        self._intervals = []
+        self._last = None
+
+    def _update(self, frame_no):
+        now = time.perf_counter()
+        self._costs.append(now - self._clock.get("start", now))
+        if self._last is not None:
+            self._intervals.append(now - self._last)
+        self._last = now
+        if len(self._intervals) < self._window:
+            return
+        costs, self._costs = self._costs[-self._window :], []
+        intervals, self._intervals = self._intervals, []
+        slow_cpu = sum(cost > FRAME_CPU_BUDGET for cost in costs)
+        slow_tty = sum(gap > FRAME_INTERVAL_BUDGET for gap in intervals)
+        if max(slow_cpu, slow_tty) * 2 > self._window:
+            raise RenderTooSlow()
+
+    @property
+    def stop_frame(self):
+        return 0
+
+    def reset(self):
+        self._last = None
+
+
+def scene_effects(screen, progress, level, min_display=0.0):
+    """Build the effects for one render level."""
+    # Create renderers first to calculate dimensions
+    title_renderer = FigletText(INSTALL_NAME, font="big")
+
+    # Calculate centered position
+    # max_width might be 0 if font not loaded? No, pyfiglet usually works.
+    title_x = max(0, (screen.width - title_renderer.max_width) // 2)
+    title_y = (screen.height // 2) - 6
+
+    # The status message and bar use three rows that the plasma leaves alone
+    status_y = (screen.height // 2) + 6
+    bands = [(0, status_y), (status_y + 3, screen.height - status_y - 3)]
+
+    clock = {}
+    effects = [FrameStart(screen, clock)]
+    if level == "full":
+        # 1. Background: Plasma above and below the status rows
+        # Use screen.colours to respect terminal capabilities
+        effects += [
+            Print(
+                screen,
+                Plasma(height, screen.width, screen.colours),
+                top,
+                speed=1,
+                transparent=False,
+            )
+            for top, height in bands
+            if height > 0
+        ]
+    if level in ("full", "lite"):
+        # 2. Title: Rainbow Figlet, recoloured every frame or every few
+        effects.append(
+            Print(
+                screen,
+                Rainbow(screen, title_renderer),
+                y=title_y,
+                x=title_x,
+                speed=1 if level == "full" else LITE_SPEED,
+                transparent=True,
+            )
+        )
+    else:
+        # Static title: identical every frame, so the terminal gets no updates
+        effects.append(
+            Print(
+                screen,
+                title_renderer,
+                y=title_y,
+                x=title_x,
+                colour=Screen.COLOUR_MAGENTA,
+                speed=0,
+                transparent=True,
+            )
+        )
+    effects += [
+        # 3. Custom Status Text & Progress Bar
+        StatusText(screen, progress, status_y),
+        # 4. Completion Checker
+        CheckInstallStatus(screen, progress, min_display),
+    ]
+    if level != "static":
+        effects.append(FrameMonitor(screen, clock))
+    return effects
+
+
+def demo(screen, progress, level="full", min_display=0.0):
+    """The main animation setup, stepping down a level whenever it is too slow."""
+    while True:
+        try:
+            screen.clear()
+            effects = scene_effects(screen, progress, level, min_display)
+            screen.play([Scene(effects, -1)], stop_on_resize=True, repeat=False)
+            return
+        except RenderTooSlow:
+            level = RENDER_LEVELS[RENDER_LEVELS.index(level) + 1]
+
+
+def run(progress, level="full", min_display=0.0):
+    """Show the animation until the installation finishes or the user quits."""
+    Screen.wrapper(demo, arguments=[progress, level, min_display])
@@ -0,0 +1,255 @@
+"""Generation of the scripts Snipaster installs into ~/.local/bin."""
+import os
+import sys
+
+# Repository root, so generated scripts can find the snipaster package.
+SNIPASTER_HOME = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WRAPPER_TEMPLATE = """#!/bin/bash
+# Snipaster wrapper script
+
+# Stage timestamps for the trace log (bash 5+; see snipaster.trace)
+T_START=$EPOCHREALTIME
+
+# Hand the capture to snipaster-daemon when it is running; the client
+# refuses a socket directory that is not ours with mode 0700
+SOCK_DIR="${XDG_RUNTIME_DIR:-/tmp/snipaster-$UID}"
+SOCK="$SOCK_DIR/snipaster.sock"
+if [ -O "$SOCK_DIR" ] && [ ! -L "$SOCK_DIR" ] && [ -S "$SOCK" ] \
+    && [ -f "@CLIENT@" ]; then
+    "@PYTHON@" -IS "@CLIENT@" "$SOCK"
+    STATUS=$?
+    # 75 (EX_TEMPFAIL) means the daemon did not answer; capture directly
+    if [ "$STATUS" -ne 75 ]; then
+        exit "$STATUS"
+    fi
+fi
+
+# Load the backend resolved at install time
+MANIFEST="${XDG_CONFIG_HOME:-$HOME/.config}/snipaster/backend.env"
+if [ -f "$MANIFEST" ]; then
+    . "$MANIFEST"
+fi
+
+# Re-detect only when the session type changed or a recorded tool is gone
+STALE=0
+if [ ! -f "$MANIFEST" ] || [ "$SNIPASTER_SESSION" != "$XDG_SESSION_TYPE" ]; then
+    STALE=1
+fi
+for TOOL in $SNIPASTER_REQUIRED; do
+    [ -x "$TOOL" ] || STALE=1
+done
+
+if [ "$STALE" = 1 ]; then
+    SNIPASTER_SESSION="$XDG_SESSION_TYPE"
+    SNIPASTER_GNOME_SCREENSHOT=$(command -v gnome-screenshot)
+    SNIPASTER_GRIM=$(command -v grim)
+    SNIPASTER_SLURP=$(command -v slurp)
+    SNIPASTER_SCROT=$(command -v scrot)
+    SNIPASTER_WL_COPY=$(command -v wl-copy)
+    SNIPASTER_XCLIP=$(command -v xclip)
+    SNIPASTER_NOTIFY_SEND=$(command -v notify-send)
+
+    SNIPASTER_CAPTURE=""
+    if [ "$XDG_SESSION_TYPE" = "wayland" ]; then
+        if [ -n "$SNIPASTER_GNOME_SCREENSHOT" ]; then
+            SNIPASTER_CAPTURE=gnome-screenshot
+        elif [ -n "$SNIPASTER_GRIM" ] && [ -n "$SNIPASTER_SLURP" ]; then
+            SNIPASTER_CAPTURE=grim
+        fi
+    elif [ -n "$SNIPASTER_SCROT" ]; then
+        SNIPASTER_CAPTURE=scrot
+    fi
+
+    SNIPASTER_CLIPBOARD=""
+    if [ "$XDG_SESSION_TYPE" = "wayland" ] && [ -n "$SNIPASTER_WL_COPY" ]; then
+        SNIPASTER_CLIPBOARD=wl-copy
+    elif [ -n "$SNIPASTER_XCLIP" ]; then
+        SNIPASTER_CLIPBOARD=xclip
+    fi
+
+    # Refresh the manifest in the background for the next capture
+    if [ -f "@HOME@/snipaster/backend.py" ]; then
+        PYTHONPATH="@HOME@" "@PYTHON@" -m snipaster.backend --write >/dev/null 2>&1 &
+    fi
+fi
+
+notify() {
+    if [ -n "$SNIPASTER_NOTIFY_SEND" ]; then
+        "$SNIPASTER_NOTIFY_SEND" "Snipaster" "$1"
+    fi
+}
+
+# Generate a sub-second filename with shell builtins only (no date fork)
+if [ -n "$EPOCHREALTIME" ]; then
+    NOW=${EPOCHREALTIME/,/.}
+else
+    NOW=$(date +%s.%N)
+fi
+FRACTION="${NOW#*.}000000000"
+printf -v TIMESTAMP '%(%Y-%m-%d-%H-%M-%S)T-%s' "${NOW%.*}" "${FRACTION:0:9}"
+DIR="${SNIPASTER_DIR:-$HOME/Pictures/Screenshots}"
+if [ -n "$SNIPASTER_SHARD" ]; then
+    # Date-sharded layout, e.g. Screenshots/2026/10/17
+    printf -v SHARD "%($SNIPASTER_SHARD)T" "${NOW%.*}"
+    DIR="$DIR/$SHARD"
+fi
+
+[ -d "$DIR" ] || mkdir -p "$DIR"
+
+# Capture into a hidden temp file and publish it under its final name only
+# once it is complete, so nothing watching the folder sees a partial file
+TMP=$(mktemp --suffix=.png "$DIR/.snipaster-XXXXXX") || {
+    notify "Cannot create a file in $DIR"
+    exit 1
+}
+trap 'rm -f "$TMP"' EXIT
+
+# Lowest PNG compression on the clipboard path when png-fast was chosen
+GRIM_ARGS=()
+SCROT_ARGS=()
+if [ "$SNIPASTER_ENCODER" = "png-fast" ]; then
+    GRIM_ARGS=(-l 1)
+    SCROT_ARGS=(-q 100)
+fi
+
+# SNIPASTER_FAKE_REGION=X,Y,W,H replaces the interactive selection, so the
+# benchmarks can drive this script headless (gnome-screenshot then grabs the
+# whole screen)
+GNOME_SELECT=(-a)
+SCROT_SELECT=(-s)
+if [ -n "$SNIPASTER_FAKE_REGION" ]; then
+    IFS=, read -r FAKE_X FAKE_Y FAKE_W FAKE_H <<< "$SNIPASTER_FAKE_REGION"
+    GNOME_SELECT=()
+    SCROT_SELECT=(-a "$SNIPASTER_FAKE_REGION")
+fi
+
+# Run the screenshot tool chosen for this session
+case "$SNIPASTER_CAPTURE" in
+    gnome-screenshot)
+        "$SNIPASTER_GNOME_SCREENSHOT" "${GNOME_SELECT[@]}" -f "$TMP"
+        ;;
+    grim)
+        if [ -n "$SNIPASTER_FAKE_REGION" ]; then
+            GEOMETRY="$FAKE_X,$FAKE_Y ${FAKE_W}x$FAKE_H"
+        else
+            GEOMETRY=$("$SNIPASTER_SLURP")
+        fi
+        "$SNIPASTER_GRIM" "${GRIM_ARGS[@]}" -g "$GEOMETRY" "$TMP"
+        ;;
+    scrot)
+        # -o: write into the temp file instead of picking a new name
+        "$SNIPASTER_SCROT" "${SCROT_ARGS[@]}" -o "${SCROT_SELECT[@]}" "$TMP"
+        ;;
+    *)
+        if [ "$XDG_SESSION_TYPE" = "wayland" ]; then
+            notify "No screenshot tool found (gnome-screenshot or grim)"
+        else
+            notify "scrot not found"
+        fi
+        exit 1
+        ;;
+esac
+
+# The temp file stays empty when the selection was cancelled
+if [ ! -s "$TMP" ]; then
+    exit 1
+fi
+chmod 644 "$TMP"
+
+# Link the capture onto a free name (ln never replaces an existing file);
+# mv -n stands in on filesystems without hard links
+FILE="$DIR/screenshot-$TIMESTAMP.png"
+SEQ=0
+until ln "$TMP" "$FILE" 2>/dev/null \
+    || { mv -n "$TMP" "$FILE" 2>/dev/null && [ ! -e "$TMP" ]; }; do
+    SEQ=$((SEQ + 1))
+    if [ "$SEQ" -gt 100 ]; then
+        notify "Cannot create a file in $DIR"
+        exit 1
+    fi
+    FILE="$DIR/screenshot-$TIMESTAMP-$SEQ.png"
+done
+rm -f "$TMP"
+T_CAPTURED=$EPOCHREALTIME
+
+# Copy to clipboard
+case "$SNIPASTER_CLIPBOARD" in
+    wl-copy)
+        "$SNIPASTER_WL_COPY" < "$FILE"
+        ;;
+    xclip)
+        "$SNIPASTER_XCLIP" -selection clipboard -t image/png -i "$FILE"
+        ;;
+esac
+T_CLIPBOARD=$EPOCHREALTIME
+
+# Notify in the background so the shortcut finishes once the clipboard is set
+notify "Screenshot saved and copied to clipboard" &
+
+# Archive, index and apply retention after the clipboard has its copy
+if [ -f "@HOME@/snipaster/library.py" ]; then
+    PYTHONPATH="@HOME@" "@PYTHON@" -m snipaster.library add "$FILE" >/dev/null 2>&1 &
+fi
+
+# Append this capture's stage timings to the log read by `snipaster stats`
+if [ -n "$T_START" ] && [ -f "@HOME@/snipaster/trace.py" ]; then
+    PYTHONPATH="@HOME@" "@PYTHON@" -m snipaster.trace record --via script \\
+        --session "$XDG_SESSION_TYPE" --capture "$SNIPASTER_CAPTURE" \\
+        --clipboard "$SNIPASTER_CLIPBOARD" start="$T_START" \\
+        captured="$T_CAPTURED" clipboard="$T_CLIPBOARD" >/dev/null 2>&1 &
+fi
+"""
+
+LAUNCHER_TEMPLATE = """#!/bin/sh
+# Snipaster launcher for python -m @MODULE@
+PYTHONPATH="@HOME@${PYTHONPATH:+:$PYTHONPATH}" exec "@PYTHON@" -m @MODULE@ "$@"
+"""
+
+DAEMON_AUTOSTART_TEMPLATE = """
+[Desktop Entry]
+Type=Application
+Name=snipaster-daemon
+Exec=@LAUNCHER@
+Terminal=false
+Hidden=false
+NoDisplay=true
+X-GNOME-Autostart-enabled=true
+"""
+
+
+def render(template, **values):
+    """Substitute @NAME@ placeholders; bash's own $ syntax is left alone."""
+    for name, value in values.items():
+        template = template.replace(f"@{name.upper()}@", value)
+    return template
+
+
+def wrapper_script():
+    """Return the contents of the screenshot wrapper script."""
+    return render(
+        WRAPPER_TEMPLATE,
+        client=os.path.join(SNIPASTER_HOME, "snipaster", "client.py"),
+        home=SNIPASTER_HOME,
+        python=sys.executable,
+    )
+
+
+def launcher_script(module):
+    """Return the contents of a ~/.local/bin shim for a snipaster module."""
+    return render(
+        LAUNCHER_TEMPLATE, home=SNIPASTER_HOME, python=sys.executable, module=module
+    )
+
+
+def daemon_arguments(hotkey=None):
+    """Command-line arguments for snipaster-daemon; hotkey enables the listener."""
+    return ["--hotkey", hotkey] if hotkey else []
+
+
+def daemon_autostart(launcher_path, hotkey=None):
+    """Return the autostart entry that starts snipaster-daemon."""
+    # Exec= needs "<" and ">" (as in <Control>Print) quoted
+    command = [launcher_path] + [f'"{arg}"' for arg in daemon_arguments(hotkey)]
+    return render(DAEMON_AUTOSTART_TEMPLATE, launcher=" ".join(command))
+
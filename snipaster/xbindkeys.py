@@ -0,0 +1,122 @@
+"""Merging the Snipaster binding into ~/.xbindkeysrc.
+
+The binding lives in a managed block between marker comments; everything
+else in the file is kept as the user wrote it. The block written by older
+installers (a "# Snipaster keybinding" comment followed by the command and
+key lines) is recognised and replaced in place.
+"""
+import os
+import signal
+import subprocess
+
+BEGIN = "# >>> snipaster >>>"
+END = "# <<< snipaster <<<"
+LEGACY_MARKER = "# Snipaster keybinding"
+
+
+def render_block(command, keys):
+    """Return the managed block's lines for command bound to keys."""
+    escaped = command.replace("\\", "\\\\").replace('"', '\\"')
+    return [BEGIN, f'"{escaped}"', f"  {keys}", END]
+
+
+def split(lines):
+    """Split lines into (before, managed block, after).
+
+    The block is None when the file has none. A legacy block counts as the
+    managed one. An unterminated block runs to the end of the file.
+    """
+    for i, line in enumerate(lines):
+        if line.strip() == BEGIN:
+            for j in range(i + 1, len(lines)):
+                if lines[j].strip() == END:
+                    return lines[:i], lines[i : j + 1], lines[j + 1 :]
+            return lines[:i], lines[i:], []
+    for i, line in enumerate(lines):
+        if line.strip() == LEGACY_MARKER:
+            # The marker, the quoted command and the key line
+            end = i + 1
+            if end < len(lines) and lines[end].lstrip().startswith('"'):
+                end += 1
+                if end < len(lines) and lines[end].strip():
+                    end += 1
+            return lines[:i], lines[i:end], lines[end:]
+    return lines, None, []
+
+
+def merge(text, command, keys):
+    """Return text with the managed block set to bind keys to command."""
+    before, _, after = split(text.splitlines())
+    block = render_block(command, keys)
+    if before and before[-1].strip():
+        block = [""] + block
+    return "\n".join(before + block + after) + "\n"
+
+
+def remove(text):
+    """Return text without the managed block and the blank line before it."""
+    before, block, after = split(text.splitlines())
+    if block is None:
+        return text
+    if before and not before[-1].strip():
+        before = before[:-1]
+    lines = before + after
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+def running_pids(uid=None):
+    """PIDs of this user's xbindkeys processes, read from /proc."""
+    uid = os.getuid() if uid is None else uid
+    pids = []
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return pids
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/comm") as f:
+                name = f.read().strip()
+            owner = os.stat(f"/proc/{entry}").st_uid
+        except OSError:
+            continue
+        if name == "xbindkeys" and owner == uid:
+            pids.append(int(entry))
+    return pids
+
+
+def reload(start=True):
+    """Make xbindkeys pick up the config: SIGHUP it, or start it if absent.
+
+    Returns "reloaded", "started", or None when nothing was running and
+    start is false or there is no display to start it on.
+    """
+    pids = running_pids()
+    if pids:
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGHUP)
+            except ProcessLookupError:
+                pass
+        return "reloaded"
+    if not start or not os.environ.get("DISPLAY"):
+        return None
+    subprocess.Popen(
+        ["xbindkeys"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    return "started"
+
+
+def stop():
+    """Terminate this user's xbindkeys processes; return how many there were."""
+    pids = running_pids()
+    for pid in pids:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    return len(pids)
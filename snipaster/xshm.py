@@ -0,0 +1,364 @@
+"""In-process X11 capture through the MIT-SHM extension.
+
+The X server copies the requested rectangle of the root window straight
+into a System V shared memory segment that this process has mapped, so the
+pixels never travel over the X socket and no capture tool is started. The
+segment is attached once and reused for every grab. Only libX11, libXext
+and libc are needed (through ctypes); when they or the extension are
+missing, callers fall back to scrot.
+
+Usage: python3 -m snipaster.xshm [--region X,Y,WIDTH,HEIGHT] OUT.png
+"""
+import argparse
+import ctypes
+import ctypes.util
+import sys
+import threading
+import time
+
+from snipaster import png
+from snipaster.encode import RawImage
+
+ZPIXMAP = 2
+LSB_FIRST = 0
+ALL_PLANES = 0xFFFFFFFF
+IPC_PRIVATE = 0
+IPC_CREAT = 0o1000
+IPC_RMID = 0
+
+
+class XShmError(Exception):
+    """Raised when MIT-SHM capture is unavailable or a grab fails."""
+
+
+class XShmSegmentInfo(ctypes.Structure):
+    _fields_ = [
+        ("shmseg", ctypes.c_ulong),
+        ("shmid", ctypes.c_int),
+        ("shmaddr", ctypes.c_void_p),
+        ("readOnly", ctypes.c_int),
+    ]
+
+
+class XImage(ctypes.Structure):
+    # Leading fields of Xlib's XImage; the rest is never read here
+    _fields_ = [
+        ("width", ctypes.c_int),
+        ("height", ctypes.c_int),
+        ("xoffset", ctypes.c_int),
+        ("format", ctypes.c_int),
+        ("data", ctypes.c_void_p),
+        ("byte_order", ctypes.c_int),
+        ("bitmap_unit", ctypes.c_int),
+        ("bitmap_bit_order", ctypes.c_int),
+        ("bitmap_pad", ctypes.c_int),
+        ("depth", ctypes.c_int),
+        ("bytes_per_line", ctypes.c_int),
+        ("bits_per_pixel", ctypes.c_int),
+        ("red_mask", ctypes.c_ulong),
+        ("green_mask", ctypes.c_ulong),
+        ("blue_mask", ctypes.c_ulong),
+    ]
+
+
+class XErrorEvent(ctypes.Structure):
+    _fields_ = [
+        ("type", ctypes.c_int),
+        ("display", ctypes.c_void_p),
+        ("resourceid", ctypes.c_ulong),
+        ("serial", ctypes.c_ulong),
+        ("error_code", ctypes.c_ubyte),
+        ("request_code", ctypes.c_ubyte),
+        ("minor_code", ctypes.c_ubyte),
+    ]
+
+
+ERROR_HANDLER = ctypes.CFUNCTYPE(
+    ctypes.c_int, ctypes.c_void_p, ctypes.POINTER(XErrorEvent)
+)
+_libs = None
+_libs_lock = threading.Lock()
+# Xlib's default handler exits the process; errors are recorded here instead
+_last_error = []
+
+
+@ERROR_HANDLER
+def _record_error(display, event):
+    _last_error.append(event.contents.error_code)
+    return 0
+
+
+def _declare(function, restype, *argtypes):
+    function.restype = restype
+    function.argtypes = argtypes
+
+
+def libraries():
+    """Load and declare libX11, libXext and libc; raise XShmError if missing."""
+    global _libs
+    with _libs_lock:
+        if _libs is not None:
+            return _libs
+        names = {name: ctypes.util.find_library(name) for name in ("X11", "Xext", "c")}
+        missing = [name for name, path in names.items() if path is None]
+        if missing:
+            raise XShmError(f"lib{', lib'.join(missing)} not found")
+        x11 = ctypes.CDLL(names["X11"])
+        xext = ctypes.CDLL(names["Xext"])
+        libc = ctypes.CDLL(names["c"], use_errno=True)
+
+        p, ul, i, ui = ctypes.c_void_p, ctypes.c_ulong, ctypes.c_int, ctypes.c_uint
+        _declare(x11.XOpenDisplay, p, ctypes.c_char_p)
+        _declare(x11.XCloseDisplay, i, p)
+        _declare(x11.XDefaultScreen, i, p)
+        _declare(x11.XRootWindow, ul, p, i)
+        _declare(x11.XDefaultVisual, p, p, i)
+        _declare(x11.XDefaultDepth, i, p, i)
+        _declare(x11.XSync, i, p, i)
+        _declare(x11.XSetErrorHandler, p, ERROR_HANDLER)
+        _declare(x11.XDestroyImage, i, ctypes.POINTER(XImage))
+        _declare(
+            x11.XGetGeometry,
+            i,
+            p,
+            ul,
+            ctypes.POINTER(ul),
+            ctypes.POINTER(i),
+            ctypes.POINTER(i),
+            ctypes.POINTER(ui),
+            ctypes.POINTER(ui),
+            ctypes.POINTER(ui),
+            ctypes.POINTER(ui),
+        )
+        info = ctypes.POINTER(XShmSegmentInfo)
+        _declare(xext.XShmQueryExtension, i, p)
+        _declare(
+            xext.XShmCreateImage, ctypes.POINTER(XImage), p, p, ui, i, p, info, ui, ui
+        )
+        _declare(xext.XShmAttach, i, p, info)
+        _declare(xext.XShmDetach, i, p, info)
+        _declare(xext.XShmGetImage, i, p, ul, ctypes.POINTER(XImage), i, i, ul)
+        _declare(libc.shmget, i, i, ctypes.c_size_t, i)
+        _declare(libc.shmat, p, i, p, i)
+        _declare(libc.shmdt, i, p)
+        _declare(libc.shmctl, i, i, i, p)
+        x11.XSetErrorHandler(_record_error)
+        _libs = (x11, xext, libc)
+        return _libs
+
+
+def available():
+    """Whether the libraries for MIT-SHM capture can be loaded."""
+    try:
+        libraries()
+    except (XShmError, OSError):
+        return False
+    return True
+
+
+def channel_offsets(image):
+    """Byte offsets of red, green and blue within a 32-bit pixel."""
+    offsets = []
+    for mask in (image.red_mask, image.green_mask, image.blue_mask):
+        offset = (mask.bit_length() - 8) // 8
+        if image.byte_order != LSB_FIRST:
+            offset = 3 - offset
+        offsets.append(offset)
+    return offsets
+
+
+def to_rgb(buffer, width, height, stride, offsets):
+    """Pack 32-bit pixels from buffer into RGB bytes, dropping the pad byte."""
+    data = buffer.tobytes()
+    if stride != width * 4:
+        data = b"".join(
+            data[row * stride : row * stride + width * 4] for row in range(height)
+        )
+    rgb = bytearray(width * height * 3)
+    for channel, offset in enumerate(offsets):
+        rgb[channel::3] = data[offset::4]
+    return bytes(rgb)
+
+
+class ShmGrabber:
+    """An X connection with a shared memory segment attached for grabs.
+
+    Not thread-safe; callers serialise grabs (snipaster-daemon captures one
+    at a time anyway).
+    """
+
+    def __init__(self, display_name=None):
+        self.x11, self.xext, self.libc = libraries()
+        name = display_name.encode() if display_name else None
+        self.display = self.x11.XOpenDisplay(name)
+        if not self.display:
+            raise XShmError(f"cannot open display {display_name or ''}".rstrip())
+        if not self.xext.XShmQueryExtension(self.display):
+            self.x11.XCloseDisplay(self.display)
+            raise XShmError("the X server has no MIT-SHM extension")
+        screen = self.x11.XDefaultScreen(self.display)
+        self.root = self.x11.XRootWindow(self.display, screen)
+        self.visual = self.x11.XDefaultVisual(self.display, screen)
+        self.depth = self.x11.XDefaultDepth(self.display, screen)
+        self.info = None
+        self.size = 0
+        try:
+            width, height = self.screen_size()
+            self._attach(width * height * 4)
+        except XShmError:
+            self.x11.XCloseDisplay(self.display)
+            raise
+
+    def screen_size(self):
+        """Current (width, height) of the root window, following RandR changes."""
+        root = ctypes.c_ulong()
+        x, y = ctypes.c_int(), ctypes.c_int()
+        width, height = ctypes.c_uint(), ctypes.c_uint()
+        border, depth = ctypes.c_uint(), ctypes.c_uint()
+        self.x11.XGetGeometry(
+            self.display,
+            self.root,
+            ctypes.byref(root),
+            ctypes.byref(x),
+            ctypes.byref(y),
+            ctypes.byref(width),
+            ctypes.byref(height),
+            ctypes.byref(border),
+            ctypes.byref(depth),
+        )
+        return width.value, height.value
+
+    def _check(self, what):
+        self.x11.XSync(self.display, 0)
+        if _last_error:
+            code = _last_error.pop()
+            _last_error.clear()
+            raise XShmError(f"{what} failed (X error {code})")
+
+    def _attach(self, size):
+        shmid = self.libc.shmget(IPC_PRIVATE, size, IPC_CREAT | 0o600)
+        if shmid < 0:
+            raise XShmError(f"shmget: {ctypes.get_errno()}")
+        address = self.libc.shmat(shmid, None, 0)
+        if address in (None, ctypes.c_void_p(-1).value):
+            self.libc.shmctl(shmid, IPC_RMID, None)
+            raise XShmError(f"shmat: {ctypes.get_errno()}")
+        info = XShmSegmentInfo(0, shmid, address, 0)
+        self.xext.XShmAttach(self.display, ctypes.byref(info))
+        try:
+            # Fails for remote displays, where the server cannot see our memory
+            self._check("XShmAttach")
+        except XShmError:
+            self.libc.shmdt(address)
+            raise
+        finally:
+            # Freed once both sides have detached
+            self.libc.shmctl(shmid, IPC_RMID, None)
+        self.info = info
+        self.size = size
+
+    def _detach(self):
+        if self.info is not None:
+            self.xext.XShmDetach(self.display, ctypes.byref(self.info))
+            self.x11.XSync(self.display, 0)
+            self.libc.shmdt(self.info.shmaddr)
+            self.info = None
+            self.size = 0
+
+    def grab(self, x=0, y=0, width=None, height=None):
+        """Capture a rectangle of the screen (all of it by default) as RGB."""
+        screen_width, screen_height = self.screen_size()
+        # Clip to the screen; the server rejects rectangles reaching outside
+        x, y = max(0, x), max(0, y)
+        width = min(width or screen_width, screen_width - x)
+        height = min(height or screen_height, screen_height - y)
+        if width <= 0 or height <= 0:
+            raise XShmError("region lies outside the screen")
+        if width * height * 4 > self.size:
+            self._detach()
+            self._attach(screen_width * screen_height * 4)
+
+        image = self.xext.XShmCreateImage(
+            self.display,
+            self.visual,
+            self.depth,
+            ZPIXMAP,
+            self.info.shmaddr,
+            ctypes.byref(self.info),
+            width,
+            height,
+        )
+        if not image:
+            raise XShmError("XShmCreateImage failed")
+        try:
+            contents = image.contents
+            if contents.bits_per_pixel != 32:
+                raise XShmError(f"unsupported {contents.bits_per_pixel}-bit visual")
+            ok = self.xext.XShmGetImage(
+                self.display, self.root, image, x, y, ALL_PLANES
+            )
+            self._check("XShmGetImage")
+            if not ok:
+                raise XShmError("XShmGetImage failed")
+            stride = contents.bytes_per_line
+            buffer = (ctypes.c_char * (stride * height)).from_address(
+                self.info.shmaddr
+            )
+            pixels = to_rgb(
+                memoryview(buffer).cast("B"),
+                width,
+                height,
+                stride,
+                channel_offsets(contents),
+            )
+        finally:
+            # Frees only the XImage struct; the data is our segment
+            contents.data = None
+            self.x11.XDestroyImage(image)
+        return RawImage(width, height, 3, pixels)
+
+    def close(self):
+        if self.display:
+            self._detach()
+            self.x11.XCloseDisplay(self.display)
+            self.display = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def parse_region(text):
+    """Parse X,Y,WIDTH,HEIGHT into a tuple of ints."""
+    try:
+        x, y, width, height = (int(part) for part in text.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{text!r} is not X,Y,WIDTH,HEIGHT")
+    return x, y, width, height
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python3 -m snipaster.xshm", description="Grab the screen via MIT-SHM."
+    )
+    parser.add_argument("--region", type=parse_region, help="X,Y,WIDTH,HEIGHT")
+    parser.add_argument("output", help="PNG file to write")
+    args = parser.parse_args(argv)
+    try:
+        with ShmGrabber() as grabber:
+            start = time.perf_counter()
+            raw = grabber.grab(*(args.region or ()))
+            grabbed = time.perf_counter()
+    except XShmError as e:
+        print(f"xshm: {e}", file=sys.stderr)
+        return 1
+    with open(args.output, "wb") as f:
+        f.write(png.encode(raw.width, raw.height, raw.channels, raw.pixels, level=1))
+    print(f"{raw.width}x{raw.height} grabbed in {(grabbed - start) * 1000:.1f}ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+import os
+
+import pytest
+
+from snipaster.config import DEFAULTS, ConfigError, load_config, validate
+
+
+def options(**overrides):
+    return dict(DEFAULTS, **overrides)
+
+
+def test_defaults_are_valid():
+    assert validate(options()) == DEFAULTS
+
+
+@pytest.mark.parametrize("hotkey", ["F1", "Print", "<Control><Shift>s", "<Super>4"])
+def test_hotkeys(hotkey):
+    assert validate(options(hotkey=hotkey))["hotkey"] == hotkey
+
+
+@pytest.mark.parametrize(
+    "bad",
+    [
+        {"hotkey": "Ctrl+F1"},
+        {"hotkey": ""},
+        {"encoder": "jpeg"},
+        {"shard": "week"},
+        {"archive": "gif"},
+        {"prefer_capture": "flameshot"},
+        {"prefer_clipboard": "xsel"},
+    ],
+)
+def test_invalid_options(bad):
+    with pytest.raises(ConfigError):
+        validate(options(**bad))
+
+
+def test_normalisation():
+    result = validate(
+        options(
+            listener=True,
+            prefer_capture="auto",
+            prefer_clipboard="xclip",
+            directory="~/shots",
+        )
+    )
+    assert result["daemon"] is True
+    assert result["prefer_capture"] is None
+    assert result["prefer_clipboard"] == "xclip"
+    assert result["directory"] == os.path.expanduser("~/shots")
+
+
+def test_load_config(tmp_path):
+    path = tmp_path / "snipaster.ini"
+    path.write_text(
+        "[snipaster]\n"
+        "hotkey = <Control>Print\n"
+        "save_dir = /tmp/shots\n"
+        "daemon = yes\n"
+        "retention_days = 30\n"
+        "retention_bytes = 2G\n"
+        "archive =\n"
+    )
+    loaded = load_config(str(path))
+    assert loaded["hotkey"] == "<Control>Print"
+    assert loaded["directory"] == "/tmp/shots"
+    assert loaded["daemon"] is True
+    assert loaded["retention_days"] == 30.0
+    assert loaded["retention_bytes"] == 2 << 30
+    assert loaded["archive"] is None
+
+
+@pytest.mark.parametrize(
+    "text",
+    ["hotkey = F1\n", "[snipaster]\ncolour = red\n", "[snipaster]\ndaemon = maybe\n"],
+)
+def test_bad_config_files(tmp_path, text):
+    path = tmp_path / "snipaster.ini"
+    path.write_text(text)
+    with pytest.raises(ConfigError):
+        load_config(str(path))
+
+
+def test_missing_config_file(tmp_path):
+    with pytest.raises(ConfigError):
+        load_config(str(tmp_path / "absent.ini"))
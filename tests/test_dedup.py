@@ -0,0 +1,64 @@
+import os
+import zlib
+
+from snipaster import png
+from snipaster.dedup import RecentHashes, capture_hash, link_duplicate
+
+
+def palette_png(palette, transparency=None):
+    header = (4).to_bytes(4, "big") * 2 + bytes([8, 3, 0, 0, 0])
+    scanlines = b"".join(b"\0" + bytes([0, 1, 0, 1]) for _ in range(4))
+    chunks = [png.chunk(b"IHDR", header), png.chunk(b"PLTE", palette)]
+    if transparency is not None:
+        chunks.append(png.chunk(b"tRNS", transparency))
+    chunks += [png.chunk(b"IDAT", zlib.compress(scanlines)), png.chunk(b"IEND", b"")]
+    return png.SIGNATURE + b"".join(chunks)
+
+
+def test_hash_ignores_compression_level():
+    data = png.encode(8, 8, 3, bytes(range(192)), level=1)
+    assert capture_hash(data) == capture_hash(png.recompress(data, 9))
+
+
+def test_hash_depends_on_pixels():
+    one = png.encode(2, 2, 3, bytes(12))
+    other = png.encode(2, 2, 3, bytes(11) + b"\1")
+    assert capture_hash(one) != capture_hash(other)
+
+
+def test_hash_covers_palette_and_transparency():
+    black_white = b"\0\0\0\xff\xff\xff"
+    red_white = b"\xff\0\0\xff\xff\xff"
+    assert capture_hash(palette_png(black_white)) == capture_hash(
+        palette_png(black_white)
+    )
+    assert capture_hash(palette_png(black_white)) != capture_hash(
+        palette_png(red_white)
+    )
+    assert capture_hash(palette_png(black_white)) != capture_hash(
+        palette_png(black_white, b"\0")
+    )
+
+
+def test_hash_of_other_formats_is_of_the_bytes():
+    assert capture_hash(b"qoif1234") == capture_hash(b"qoif1234")
+    assert capture_hash(b"qoif1234") != capture_hash(b"qoif1235")
+
+
+def test_recent_hashes_forget_missing_files(tmp_path):
+    saved = tmp_path / "a.png"
+    saved.write_bytes(b"x")
+    recent = RecentHashes(size=2)
+    recent.add("h1", str(saved))
+    assert recent.lookup("h1") == str(saved)
+    saved.unlink()
+    assert recent.lookup("h1") is None
+
+
+def test_link_duplicate_replaces_the_new_file(tmp_path):
+    existing = tmp_path / "screenshot-1.png"
+    existing.write_bytes(b"pixels")
+    path = tmp_path / "screenshot-2.png"
+    path.write_bytes(b"pixels")
+    assert link_duplicate(str(existing), str(path), on_disk=True) == str(path)
+    assert os.path.samefile(existing, path)
@@ -0,0 +1,32 @@
+import pytest
+
+from snipaster.config import DEFAULTS, validate
+from snipaster.deps import PhaseTimer
+from snipaster.install import install_steps
+from snipaster.plan import Plan
+
+SESSIONS = {
+    "x11": {"XDG_SESSION_TYPE": "x11", "XDG_CURRENT_DESKTOP": "XFCE"},
+    "gnome-wayland": {"XDG_SESSION_TYPE": "wayland", "XDG_CURRENT_DESKTOP": "GNOME"},
+}
+
+
+@pytest.mark.parametrize("session", sorted(SESSIONS))
+@pytest.mark.parametrize("listener", [False, True])
+def test_graph_builds_and_runs_in_order(monkeypatch, tmp_path, session, listener):
+    for name, value in SESSIONS[session].items():
+        monkeypatch.setenv(name, value)
+    options = validate(dict(DEFAULTS, listener=listener))
+    plan = Plan(dry_run=True, path=str(tmp_path / "state.json"))
+    graph = install_steps([], PhaseTimer(), options, plan=plan)
+
+    # Replace the real work with a record of the order the steps ran in
+    order = []
+    for step in graph.steps.values():
+        step.func = lambda name=step.name: order.append(name)
+    assert graph.run() is True
+    assert sorted(order) == sorted(graph.steps)
+    assert order.index("daemon") > order.index("manifest")
+    if listener and session == "x11":
+        # The listener grabs the key only once xbindkeys has released it
+        assert order.index("daemon") > order.index("keybinding")
@@ -0,0 +1,52 @@
+from snipaster.keybinding import PATH_BASE, plan, xbindkeys_keys
+
+COMMAND = "/home/u/snipaster_shot"
+
+
+def entry(name, command, binding="F1"):
+    return {"name": name, "command": command, "binding": binding}
+
+
+def test_plan_takes_the_first_free_slot():
+    paths = [f"{PATH_BASE}0/"]
+    entries = {paths[0]: entry("Terminal", "gnome-terminal", "<Super>t")}
+    slot, new_paths, values, stale = plan(paths, entries, COMMAND, "F1", "Snipaster")
+    assert slot == f"{PATH_BASE}1/"
+    assert new_paths == paths + [slot]
+    assert values == entry("Snipaster", COMMAND)
+    assert stale == []
+
+
+def test_plan_skips_slots_that_only_have_settings():
+    entries = {f"{PATH_BASE}0/": entry("Old", "old")}
+    slot, new_paths, _, _ = plan([], entries, COMMAND, "F1", "Snipaster")
+    assert slot == f"{PATH_BASE}1/"
+    assert new_paths == [slot]
+
+
+def test_plan_is_empty_when_already_registered():
+    paths = [f"{PATH_BASE}0/", f"{PATH_BASE}1/"]
+    entries = {
+        paths[0]: entry("Terminal", "gnome-terminal"),
+        paths[1]: entry("Snipaster", COMMAND),
+    }
+    assert plan(paths, entries, COMMAND, "F1", "Snipaster") == (paths[1], None, {}, [])
+
+
+def test_plan_reuses_our_slot_and_drops_duplicates():
+    paths = [f"{PATH_BASE}2/", f"{PATH_BASE}5/"]
+    entries = {
+        paths[0]: entry("Snipaster", COMMAND, "Print"),
+        paths[1]: entry("Screenshot", COMMAND),
+    }
+    slot, new_paths, values, stale = plan(paths, entries, COMMAND, "F1", "Snipaster")
+    assert slot == paths[0]
+    assert new_paths == [paths[0]]
+    assert values == {"binding": "F1"}
+    assert stale == [paths[1]]
+
+
+def test_xbindkeys_keys():
+    assert xbindkeys_keys("F1") == "F1"
+    assert xbindkeys_keys("<Control><Shift>s") == "Control+Shift + s"
+    assert xbindkeys_keys("<Super>Print") == "Mod4 + Print"
@@ -0,0 +1,102 @@
+import os
+
+import pytest
+
+from snipaster import png
+from snipaster.library import Library, parse_size
+from snipaster.plan import Plan
+
+
+@pytest.fixture
+def library(tmp_path):
+    library = Library(str(tmp_path / "library.sqlite3"))
+    yield library
+    library.close()
+
+
+def capture(directory, name, shade):
+    path = os.path.join(directory, name)
+    with open(path, "wb") as f:
+        f.write(png.encode(16, 16, 3, bytes([shade]) * 768))
+    return path
+
+
+def test_parse_size():
+    assert parse_size("500") == 500
+    assert parse_size("2K") == 2048
+    assert parse_size("1.5MiB") == 3 << 19
+    assert parse_size("2G") == 2 << 30
+
+
+def test_add_records_dimensions(library, tmp_path):
+    path = capture(str(tmp_path), "screenshot-a.png", 1)
+    library.add(path, created_ns=1)
+    count, total, oldest, newest = library.stats()
+    assert (count, total, oldest, newest) == (1, os.path.getsize(path), 1, 1)
+    assert library.recent(5) == [path]
+
+
+def test_scan_adds_new_files_and_drops_missing_ones(library, tmp_path):
+    shots = tmp_path / "shots"
+    (shots / "2026").mkdir(parents=True)
+    kept = capture(str(shots), "screenshot-a.png", 1)
+    nested = capture(str(shots / "2026"), "screenshot-b.png", 2)
+    capture(str(shots), ".snipaster-tmp.png", 3)
+    mtimes = {}
+    assert library.scan(str(shots), mtimes) == (2, 0)
+    assert library.paths() == {kept, nested}
+    assert set(mtimes) == {str(shots), str(shots / "2026")}
+
+    os.remove(nested)
+    assert library.scan(str(shots)) == (0, 1)
+    assert library.paths() == {kept}
+
+
+def test_scan_skipped_until_a_directory_changes(library, tmp_path):
+    shots = tmp_path / "shots"
+    shots.mkdir()
+    capture(str(shots), "screenshot-a.png", 1)
+    plan = Plan(path=str(tmp_path / "state.json"))
+    index = str(tmp_path / "library.sqlite3")
+    assert not plan.scan_in_sync(str(shots), index)
+
+    mtimes = {}
+    library.scan(str(shots), mtimes)
+    plan.record_scan(str(shots), mtimes)
+    assert plan.scan_in_sync(str(shots), index)
+    assert not plan.scan_in_sync(str(shots), str(tmp_path / "missing.sqlite3"))
+
+    (shots / "2026").mkdir()
+    # Coarse timestamps could hide the change within one tick
+    os.utime(shots, ns=(0, 0))
+    assert not plan.scan_in_sync(str(shots), index)
+
+
+def test_hard_links_count_once(library, tmp_path):
+    first = capture(str(tmp_path), "screenshot-a.png", 1)
+    links = [str(tmp_path / f"screenshot-a{i}.png") for i in range(3)]
+    for link in links:
+        os.link(first, link)
+    unique = capture(str(tmp_path), "screenshot-b.png", 2)
+    for created, path in enumerate([first, *links, unique]):
+        library.add(path, created_ns=created + 1)
+    size = os.path.getsize(first)
+    assert library.stats()[:2] == (5, size + os.path.getsize(unique))
+
+    # Evicting the oldest link frees nothing, so every link has to go
+    evicted = library.evict(max_bytes=os.path.getsize(unique))
+    assert evicted == [first, *links]
+    assert os.path.exists(unique)
+    assert library.paths() == {unique}
+
+
+def test_evict_by_age_counts_toward_the_byte_budget(library, tmp_path):
+    day = 86400 * 10**9
+    old = capture(str(tmp_path), "screenshot-a.png", 1)
+    mid = capture(str(tmp_path), "screenshot-b.png", 2)
+    new = capture(str(tmp_path), "screenshot-c.png", 3)
+    for created, path in ((1, old), (5, mid), (9, new)):
+        library.add(path, created_ns=created * day)
+    budget = os.path.getsize(mid) + os.path.getsize(new)
+    assert library.evict(max_age_days=5, max_bytes=budget, now_ns=9 * day) == [old]
+    assert library.paths() == {mid, new}
@@ -0,0 +1,50 @@
+import os
+
+from snipaster.naming import PREFIX, Allocator, publish, shard_directory
+
+
+def test_allocator_paths_are_unique_and_ordered(tmp_path):
+    allocator = Allocator()
+    paths = [allocator.next_path(str(tmp_path)) for _ in range(500)]
+    assert len(set(paths)) == len(paths)
+    assert all(os.path.basename(p).startswith(PREFIX) for p in paths)
+    assert all(p.endswith(".png") for p in paths)
+
+
+def test_allocator_orders_within_one_clock_tick(monkeypatch, tmp_path):
+    allocator = Allocator()
+    monkeypatch.setattr("time.time_ns", lambda: 1_700_000_000_123_456_789)
+    first = allocator.next_path(str(tmp_path))
+    second = allocator.next_path(str(tmp_path), ".webp")
+    assert first.endswith("-123456789.png")
+    assert second.endswith("-123456789-1.webp")
+
+
+def test_publish_moves_the_file_into_place(tmp_path):
+    tmp = tmp_path / ".scratch.png"
+    tmp.write_bytes(b"new")
+    target = str(tmp_path / "screenshot-a.png")
+    assert publish(str(tmp), target) == target
+    assert not tmp.exists()
+    with open(target, "rb") as f:
+        assert f.read() == b"new"
+
+
+def test_publish_never_overwrites(tmp_path):
+    taken = tmp_path / "screenshot-a.png"
+    taken.write_bytes(b"old")
+    tmp = tmp_path / ".scratch.png"
+    tmp.write_bytes(b"new")
+    final = publish(str(tmp), str(taken), Allocator())
+    assert final != str(taken)
+    assert taken.read_bytes() == b"old"
+    with open(final, "rb") as f:
+        assert f.read() == b"new"
+
+
+def test_shard_directory(tmp_path):
+    when = 1_700_000_000
+    assert shard_directory(str(tmp_path), "none", when) == str(tmp_path)
+    day = shard_directory(str(tmp_path), "day", when)
+    assert os.path.isdir(day)
+    assert os.path.relpath(day, tmp_path).count(os.sep) == 2
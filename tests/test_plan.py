@@ -0,0 +1,57 @@
+import os
+
+from snipaster.plan import Plan
+
+
+def test_sync_file_writes_only_changes(tmp_path):
+    target = str(tmp_path / "script")
+    plan = Plan(path=str(tmp_path / "state.json"))
+    assert plan.sync_file(target, "echo hi\n", 0o755) is True
+    assert os.stat(target).st_mode & 0o777 == 0o755
+    assert plan.sync_file(target, "echo hi\n", 0o755) is False
+    assert plan.changes == [f"write {target}"]
+
+
+def test_dry_run_changes_nothing(tmp_path):
+    target = tmp_path / "script"
+    plan = Plan(dry_run=True, path=str(tmp_path / "state.json"))
+    assert plan.sync_file(str(target), "echo hi\n") is True
+    assert not target.exists()
+    plan.save("inputs")
+    assert not (tmp_path / "state.json").exists()
+
+
+def test_file_already_holding_the_content_is_in_sync(tmp_path):
+    target = tmp_path / "script"
+    target.write_text("echo hi\n")
+    plan = Plan(path=str(tmp_path / "state.json"))
+    assert plan.sync_file(str(target), "echo hi\n") is False
+    assert plan.changes == []
+
+
+def test_remove_file(tmp_path):
+    target = tmp_path / "old"
+    target.write_text("x")
+    plan = Plan(path=str(tmp_path / "state.json"))
+    assert plan.remove_file(str(target)) is True
+    assert not target.exists()
+    assert plan.remove_file(str(target)) is False
+
+
+def test_converged_until_inputs_or_files_change(tmp_path):
+    state = str(tmp_path / "state.json")
+    target = tmp_path / "script"
+    plan = Plan(path=state)
+    plan.sync_file(str(target), "echo hi\n")
+    plan.save("inputs")
+
+    assert Plan(path=state).converged("inputs")
+    assert not Plan(path=state).converged("other inputs")
+    target.write_text("edited by hand\n")
+    assert not Plan(path=state).converged("inputs")
+
+
+def test_nothing_recorded_is_not_converged(tmp_path):
+    plan = Plan(path=str(tmp_path / "state.json"))
+    plan.save("inputs")
+    assert not Plan(path=str(tmp_path / "state.json")).converged("inputs")
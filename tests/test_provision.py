@@ -0,0 +1,30 @@
+import json
+
+import pytest
+
+from snipaster import provision
+
+
+@pytest.mark.parametrize(
+    "argv",
+    [["--bogus"], ["--plan", "--force"], ["--hotkey", "Ctrl+F1"], ["--shard", "year"]],
+)
+def test_usage_errors_are_json(capsys, argv):
+    assert provision.main(argv) == provision.EXIT_USAGE
+    result = json.loads(capsys.readouterr().out)
+    assert result["status"] == "error"
+    assert result["exit_code"] == provision.EXIT_USAGE
+
+
+def test_unexpected_errors_are_json(capsys, monkeypatch):
+    def fail(*args, **kwargs):
+        raise PermissionError("no access")
+
+    monkeypatch.setattr(provision, "provision", fail)
+    assert provision.main(["--plan"]) == provision.EXIT_FAILED
+    result = json.loads(capsys.readouterr().out)
+    assert result == {
+        "status": "error",
+        "exit_code": provision.EXIT_FAILED,
+        "error": "PermissionError: no access",
+    }
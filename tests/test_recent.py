@@ -0,0 +1,32 @@
+from snipaster import png
+from snipaster.recent import RecentCaptures
+
+
+def test_bounded_by_count():
+    cache = RecentCaptures(max_entries=2)
+    for name in "abc":
+        cache.add(name, b"png")
+    assert len(cache) == 2
+    assert cache.get(1)[0] == "c"
+    assert cache.get(2)[0] == "b"
+    assert cache.get(3) is None
+
+
+def test_bounded_by_bytes():
+    cache = RecentCaptures(max_bytes=10)
+    cache.add("a", b"x" * 6)
+    cache.add("b", b"x" * 6)
+    assert len(cache) == 1
+    assert cache.get(1)[0] == "b"
+
+
+def test_decoding_does_not_grow_the_cache():
+    data = png.encode(64, 64, 3, bytes(64 * 64 * 3))
+    cache = RecentCaptures(max_bytes=len(data))
+    cache.add("a", data)
+    _, source = cache.get(1)
+    assert len(source.raw.pixels) == 64 * 64 * 3
+    _, again = cache.get(1)
+    assert again is not source
+    assert not again.has_raw
+    assert again.png == data
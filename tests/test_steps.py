@@ -0,0 +1,107 @@
+import threading
+
+import pytest
+
+from snipaster.steps import StepGraph
+
+
+def timed_graph(timings, **deps):
+    """A graph whose steps already ran at the given (start, finish) times."""
+    graph = StepGraph()
+    for name, (start, finish, *resources) in timings.items():
+        step = graph.add(name, None, deps.get(name, ()), resources=resources)
+        step.started, step.finished, step.status = start, finish, "done"
+    return graph
+
+
+def names(steps):
+    return [step.name for step in steps]
+
+
+def test_add_rejects_an_unknown_dependency():
+    graph = StepGraph()
+    with pytest.raises(ValueError):
+        graph.add("after", lambda: None, after=("missing",))
+
+
+def test_run_waits_for_dependencies():
+    graph = StepGraph()
+    order = []
+    graph.add("probe", lambda: order.append("probe"))
+    graph.add("install", lambda: order.append("install"), after=("probe",))
+    graph.add("keys", lambda: order.append("keys"), after=("install",))
+    events = []
+    assert graph.run(lambda kind, step: events.append((kind, step.name))) is True
+    assert order == ["probe", "install", "keys"]
+    assert events[:2] == [("start", "probe"), ("done", "probe")]
+
+
+def test_critical_path_follows_the_latest_dependency():
+    graph = timed_graph(
+        {"probe": (0, 1), "apt": (1, 3), "script": (1, 2), "keys": (3, 4)},
+        apt=("probe",),
+        script=("probe",),
+        keys=("apt", "script"),
+    )
+    assert names(graph.critical_path()) == ["probe", "apt", "keys"]
+
+
+def test_critical_path_follows_shared_resources():
+    graph = timed_graph({"update": (0, 2, "apt"), "extra": (2, 5, "apt"), "x": (0, 1)})
+    assert names(graph.critical_path()) == ["update", "extra"]
+
+
+def test_critical_path_of_an_unrun_graph_is_empty():
+    graph = StepGraph()
+    graph.add("a", lambda: None)
+    assert graph.critical_path() == []
+
+
+def test_independent_steps_run_concurrently():
+    barrier = threading.Barrier(2, timeout=5)
+    graph = StepGraph()
+    graph.add("a", barrier.wait)
+    graph.add("b", barrier.wait)
+    assert graph.run() is True
+
+
+def test_steps_sharing_a_resource_never_overlap():
+    lock = threading.Lock()
+    overlaps = []
+
+    def hold():
+        if not lock.acquire(blocking=False):
+            overlaps.append(True)
+            return
+        try:
+            threading.Event().wait(0.02)
+        finally:
+            lock.release()
+
+    graph = StepGraph()
+    for name in ("update", "install", "extra"):
+        graph.add(name, hold, resources=("apt",))
+    assert graph.run() is True
+    assert overlaps == []
+
+
+def test_run_skips_dependents_of_a_failed_step():
+    graph = StepGraph()
+    graph.add("ok", lambda: "fine")
+
+    def broken():
+        raise RuntimeError("boom")
+
+    graph.add("broken", broken)
+    graph.add("after", lambda: None, after=("broken",))
+    assert graph.run() is False
+    results = graph.results()
+    assert results["ok"]["status"] == "done"
+    assert results["ok"]["detail"] == "fine"
+    assert results["broken"] == {
+        "status": "failed",
+        "seconds": results["broken"]["seconds"],
+        "error": "boom",
+    }
+    assert results["after"]["status"] == "skipped"
+    assert names(graph.failures()) == ["broken"]
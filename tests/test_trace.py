@@ -0,0 +1,58 @@
+import json
+
+from snipaster.trace import make_trace, parse_marks, read_traces, record, summarise
+
+
+def trace(capture, outcome="ok", **stages):
+    backend = {"session": "x11", "capture": capture, "clipboard": "xclip"}
+    return make_trace(backend, "daemon", stages, outcome, when=0)
+
+
+def test_summarise_groups_and_orders_stages():
+    traces = [trace("scrot", captured=10.0 * i, clipboard=20.0 * i) for i in (1, 2, 3)]
+    traces.append(trace("grim", captured=5.0))
+    rows = summarise(traces)
+    assert [(row["capture"], row["stage"]) for row in rows] == [
+        ("grim", "captured"),
+        ("scrot", "captured"),
+        ("scrot", "clipboard"),
+    ]
+    scrot = rows[1]
+    assert scrot["runs"] == 3
+    assert (scrot["p50_ms"], scrot["p95_ms"], scrot["p99_ms"]) == (20.0, 20.0, 20.0)
+    assert rows[2]["p50_ms"] == 40.0
+
+
+def test_summarise_leaves_out_failed_captures():
+    traces = [trace("scrot", captured=1.0), trace("scrot", "error", captured=9.0)]
+    rows = summarise(traces)
+    assert [row["runs"] for row in rows] == [1]
+
+
+def test_summarise_by_another_field():
+    rows = summarise([trace("scrot", captured=1.0)], by="via")
+    assert rows[0]["via"] == "daemon"
+
+
+def test_parse_marks():
+    start, stages = parse_marks(["start=100.5", "captured=100,75", "clipboard=101"])
+    assert start == 100.5
+    assert stages == {"captured": 250.0, "clipboard": 500.0}
+
+
+def test_record_rotates_into_two_files(tmp_path):
+    log = str(tmp_path / "trace.log")
+    for i in range(50):
+        record(trace("scrot", captured=float(i)), log, max_bytes=1000)
+    assert (tmp_path / "trace.log.1").stat().st_size <= 1000
+    assert (tmp_path / "trace.log").stat().st_size <= 1000
+    kept = [t["stages"]["captured"] for t in read_traces(log)]
+    assert kept == sorted(kept)
+    assert kept[-1] == 49.0
+
+
+def test_read_traces_skips_damaged_lines(tmp_path):
+    log = tmp_path / "trace.log"
+    good = json.dumps(trace("scrot", captured=1.0))
+    log.write_text(good + "\n{truncated\n[]\n")
+    assert len(read_traces(str(log))) == 1
@@ -0,0 +1,57 @@
+from snipaster.xbindkeys import BEGIN, END, LEGACY_MARKER, merge, remove, split
+
+USER = '# my bindings\n"xterm"\n  F2\n'
+
+
+def test_split_finds_the_managed_block():
+    lines = ["a", BEGIN, '"cmd"', "  F1", END, "b"]
+    assert split(lines) == (["a"], lines[1:5], ["b"])
+
+
+def test_split_unterminated_block_runs_to_the_end():
+    lines = ["a", BEGIN, '"cmd"']
+    assert split(lines) == (["a"], [BEGIN, '"cmd"'], [])
+
+
+def test_split_recognises_the_legacy_block():
+    lines = ["a", LEGACY_MARKER, '"/home/u/snipaster_shot"', "  F1", "b"]
+    assert split(lines) == (["a"], lines[1:4], ["b"])
+
+
+def test_split_without_a_block():
+    assert split(["a", "b"]) == (["a", "b"], None, [])
+
+
+def test_merge_appends_after_the_user_bindings():
+    merged = merge(USER, "/home/u/snipaster_shot", "F1")
+    assert merged.startswith(USER + "\n" + BEGIN + "\n")
+    assert merged.endswith('"/home/u/snipaster_shot"\n  F1\n' + END + "\n")
+
+
+def test_merge_replaces_the_block_in_place():
+    once = merge(USER, "/home/u/snipaster_shot", "F1")
+    assert merge(once, "/home/u/snipaster_shot", "F1") == once
+    again = merge(once, "/home/u/snipaster_shot", "F12")
+    assert again == once.replace("  F1\n", "  F12\n")
+
+
+def test_merge_replaces_the_legacy_block():
+    legacy = USER + LEGACY_MARKER + '\n"/old/snipaster_shot"\n  F1\n'
+    merged = merge(legacy, "/new/snipaster_shot", "F1")
+    assert LEGACY_MARKER not in merged
+    assert "/old/" not in merged
+    assert merged.count(BEGIN) == 1
+
+
+def test_merge_escapes_the_command():
+    merged = merge("", 'say "hi"', "F1")
+    assert '"say \\"hi\\""' in merged
+
+
+def test_remove_restores_the_file():
+    text = USER
+    for _ in range(3):
+        text = remove(merge(text, "/home/u/snipaster_shot", "F1"))
+    assert text == USER
+    assert remove(merge("", "/s", "F1")) == ""
+    assert remove(USER) == USER